@@ -4,47 +4,28 @@ Backfill Batch Relations
 Links existing Notion leads to their correct Batch record by matching
 each lead's creation time to the closest batch run date.
 
+Batches and leads are read from the local Notion mirror
+(logs/notion-mirror.sqlite), which is first brought up to date with
+one incremental query per database instead of pulling every page.
+PATCHes go through the shared NotionWriter: a few at a time under
+Notion's rate limit, with 429s retried.
+
 Usage:
     uv run backfill_batch_relations.py
 """
 
 import os
-import httpx
-from datetime import datetime, timezone
+from datetime import datetime
 from dotenv import load_dotenv
 
+from cogstack_leadgen.notion import NotionWriter
+from cogstack_leadgen.notion_mirror import NotionMirror
+
 load_dotenv()
 
 NOTION_API_KEY = os.environ["NOTION_API_KEY"]
 LEADS_DB_ID = os.environ["LEADS_DB_ID"]
 BATCHES_DB_ID = os.environ["BATCHES_DB_ID"]
-HEADERS = {
-    "Authorization": f"Bearer {NOTION_API_KEY}",
-    "Notion-Version": "2022-06-28",
-    "Content-Type": "application/json",
-}
-
-
-def get_all_pages(db_id: str, extra_body: dict = {}) -> list:
-    """Paginate through all results in a Notion database."""
-    results = []
-    cursor = None
-    while True:
-        body = {"page_size": 100, **extra_body}
-        if cursor:
-            body["start_cursor"] = cursor
-        r = httpx.post(
-            f"https://api.notion.com/v1/databases/{db_id}/query",
-            headers=HEADERS,
-            json=body,
-        )
-        r.raise_for_status()
-        data = r.json()
-        results.extend(data["results"])
-        if not data.get("has_more"):
-            break
-        cursor = data["next_cursor"]
-    return results
 
 
 def parse_dt(iso: str) -> datetime:
@@ -52,23 +33,29 @@ def parse_dt(iso: str) -> datetime:
 
 
 def main():
-    print("Fetching all batches...")
-    raw_batches = get_all_pages(BATCHES_DB_ID)
+    with NotionMirror() as mirror, NotionWriter(NOTION_API_KEY) as notion:
+        queued, skipped = backfill(notion, mirror)
+    if queued or skipped:
+        print(f"\nDone. {notion.stats['updated']}/{queued} linked, {skipped} skipped (ambiguous timing).")
+    if notion.stats["errors"]:
+        print(f"{notion.stats['errors']} PATCHes failed — re-run to retry them.")
+
+
+def backfill(notion: NotionWriter, mirror: NotionMirror) -> tuple[int, int]:
+    """Queue a Batch link for every unlinked lead; returns (queued, skipped)."""
+    print("Syncing batches and leads into the local Notion mirror...")
+    mirror.sync(notion, BATCHES_DB_ID)
+    mirror.sync(notion, LEADS_DB_ID)
 
     # Only keep real Hugo batches (skip test batches and malformed ones)
     batches = []
-    for b in raw_batches:
-        batch_id = b["properties"]["Batch ID"]["title"]
-        if not batch_id:
-            continue
-        bid = batch_id[0]["plain_text"]
-        run_date = b["properties"].get("Run Date", {}).get("date", {})
-        if not run_date or not run_date.get("start"):
+    for b in mirror.pages(BATCHES_DB_ID):
+        if not b.get("Batch ID") or not b.get("Run Date"):
             continue
         batches.append({
             "id": b["id"],
-            "batch_id": bid,
-            "run_date": parse_dt(run_date["start"]),
+            "batch_id": b["Batch ID"],
+            "run_date": parse_dt(b["Run Date"]),
         })
 
     batches.sort(key=lambda x: x["run_date"])
@@ -76,35 +63,28 @@ def main():
     for b in batches:
         print(f"  {b['batch_id']} — {b['run_date'].strftime('%Y-%m-%d %H:%M')} UTC")
 
-    print("\nFetching all leads...")
     # Only leads with empty Batch relation
-    raw_leads = get_all_pages(LEADS_DB_ID)
-
     leads_to_update = []
-    for lead in raw_leads:
-        batch_rel = lead["properties"].get("Batch", {}).get("relation", [])
-        if batch_rel:
+    for lead in mirror.pages(LEADS_DB_ID):
+        if lead.get("Batch"):
             continue  # already linked
-        name = lead["properties"]["Company Name"]["title"]
-        name = name[0]["plain_text"] if name else "(unnamed)"
-        created = parse_dt(lead["created_time"])
         leads_to_update.append({
             "id": lead["id"],
-            "name": name,
-            "created": created,
+            "name": lead.get("Company Name") or "(unnamed)",
+            "created": parse_dt(lead["created_time"]),
         })
 
     print(f"Found {len(leads_to_update)} leads without a Batch link.\n")
 
     if not leads_to_update:
         print("Nothing to backfill.")
-        return
+        return 0, 0
 
     # Match each lead to the closest batch by run date (nearest before or after)
     def closest_batch(lead_created: datetime) -> dict:
         return min(batches, key=lambda b: abs((b["run_date"] - lead_created).total_seconds()))
 
-    updated = 0
+    queued = 0
     skipped = 0
     for lead in leads_to_update:
         batch = closest_batch(lead["created"])
@@ -116,16 +96,17 @@ def main():
             skipped += 1
             continue
 
-        r = httpx.patch(
-            f"https://api.notion.com/v1/pages/{lead['id']}",
-            headers=HEADERS,
-            json={"properties": {"Batch": {"relation": [{"id": batch["id"]}]}}},
-        )
-        r.raise_for_status()
-        print(f"  LINKED {lead['name']} → {batch['batch_id']} ({diff_minutes:.0f}m apart)")
-        updated += 1
+        def done(page: dict | None, message=f"{lead['name']} → {batch['batch_id']} ({diff_minutes:.0f}m apart)"):
+            if page is None:
+                print(f"  FAILED {message}")
+                return
+            mirror.put(LEADS_DB_ID, page)
+            print(f"  LINKED {message}")
+
+        notion.update(lead["id"], {"Batch": {"relation": [{"id": batch["id"]}]}}, on_done=done)
+        queued += 1
 
-    print(f"\nDone. {updated} linked, {skipped} skipped (ambiguous timing).")
+    return queued, skipped
 
 
 if __name__ == "__main__":
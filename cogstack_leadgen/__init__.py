@@ -0,0 +1,27 @@
+# =============================================================
+# cogstack_leadgen — Shared core of the lead-generation scripts
+# Code that used to be copy-pasted across scripts/*.py lives
+# here once:
+#   http             pooled httpx client + the RETRY_DELAYS retry policy
+#   phone            SA phone normalisation / extraction
+#   webhook          B2C webhook POST
+#   whatsapp         Baileys lookup / send
+#   notion           rate-limited, concurrent Notion writer (429 pause, update coalescing)
+#   logs             console + logs/<prefix>-YYYY-MM-DD.log setup
+#   state            logs/outreach-state.sqlite outreach store (migrates the old .json)
+#   gumtree          Gumtree listing + ad page parsing
+#   dag              stage graph + logs/checkpoints/ for resumable runs
+#   identity         cross-source person index (exactly-once enrich / message / post / submit)
+#   http_cache, seen_index, llm_cache, lead_io, keyword_matcher, host_budget,
+#   review_store, sheets, sheet_index, whatsapp_cache, notion_mirror
+# =============================================================
+# Scripts are still run directly (uv run python scripts/x.py),
+# so each one puts the repo root on sys.path before importing:
+#   sys.path.insert(0, str(Path(__file__).parent.parent))
+#   from cogstack_leadgen.phone import normalise_phone
+# =============================================================
+
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+LOGS_DIR = PROJECT_ROOT / "logs"
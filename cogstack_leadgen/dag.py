@@ -0,0 +1,188 @@
+# =============================================================
+# dag.py — Stage graph with resumable checkpoints
+# A pipeline is declared as stages with dependencies; each stage
+# that succeeds is checkpointed to logs/checkpoints/<run_id>/
+# <stage>.json. Re-running the same run_id skips every stage
+# whose inputs are unchanged, so a failed webhook POST is retried
+# without re-scraping or re-classifying.
+# =============================================================
+# A stage's inputs are its params plus the outputs of the stages
+# it depends on. An output is the content of the stage's artifact
+# files (result keys listed in Stage.artifacts, e.g. "out") or,
+# with no artifacts, the result dict itself. A checkpoint whose
+# artifact files have gone missing doesn't count.
+# =============================================================
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+from cogstack_leadgen import LOGS_DIR
+
+log = logging.getLogger("cogstack_leadgen")
+
+CHECKPOINT_DIR = LOGS_DIR / "checkpoints"
+
+
+@dataclass
+class Stage:
+    """One step of a pipeline.
+
+    fn gets the results of its deps (stage name → result dict) and returns
+    its own result dict; "ok": False (or an exception) marks it failed.
+    params is everything else that changes its output (flags, limits).
+    """
+
+    name: str
+    fn: Callable[[dict[str, dict]], dict]
+    deps: tuple[str, ...] = ()
+    params: dict = field(default_factory=dict)
+    artifacts: tuple[str, ...] = ()
+
+
+def _digest(data) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _file_digest(path: str) -> str | None:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    except OSError:
+        return None
+
+
+def latest_run(checkpoint_dir: Path = CHECKPOINT_DIR) -> str | None:
+    """The most recently checkpointed run_id, or None."""
+    if not checkpoint_dir.exists():
+        return None
+    runs = [p for p in checkpoint_dir.iterdir() if p.is_dir()]
+    if not runs:
+        return None
+    return max(runs, key=lambda p: p.stat().st_mtime).name
+
+
+class Dag:
+    """Runs stages in dependency order against one run's checkpoints."""
+
+    def __init__(self, stages: list[Stage], run_id: str, checkpoint_dir: Path = CHECKPOINT_DIR):
+        self.stages = {s.name: s for s in stages}
+        for s in stages:
+            for dep in s.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"stage {s.name!r} depends on unknown stage {dep!r}")
+        self.dir = checkpoint_dir / run_id
+        self.order = self._topo_order()
+
+    def _topo_order(self) -> list[str]:
+        order: list[str] = []
+        visiting: set[str] = set()
+
+        def visit(name: str) -> None:
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"dependency cycle at stage {name!r}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _output_digest(self, stage: Stage, result: dict) -> str | None:
+        """Digest of what downstream stages consume; None if an artifact is missing."""
+        if not stage.artifacts:
+            return _digest(result)
+        digests = {}
+        for key in stage.artifacts:
+            path = result.get(key)
+            digests[key] = _file_digest(path) if path else None
+            if path and digests[key] is None:
+                return None
+        return _digest(digests)
+
+    def _load_checkpoint(self, name: str, fingerprint: str) -> dict | None:
+        path = self.dir / f"{name}.json"
+        try:
+            checkpoint = json.loads(path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return None
+        if checkpoint.get("fingerprint") != fingerprint:
+            return None
+        if self._output_digest(self.stages[name], checkpoint["result"]) != checkpoint.get("output"):
+            return None  # artifact deleted or edited since
+        return checkpoint
+
+    def _save_checkpoint(self, name: str, fingerprint: str, output: str, result: dict) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        path = self.dir / f"{name}.json"
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({
+            "stage": name,
+            "fingerprint": fingerprint,
+            "output": output,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "result": result,
+        }, indent=2, ensure_ascii=False, default=str))
+        os.replace(tmp, path)
+
+    def run(self) -> dict[str, dict]:
+        """
+        Run every stage; returns name → {"status", "result"} in stage order.
+        status is "ok", "cached" (checkpoint reused), "failed" or "blocked"
+        (a dependency didn't succeed). One branch failing doesn't stop
+        stages that don't depend on it.
+        """
+        report: dict[str, dict] = {}
+        outputs: dict[str, str] = {}
+        results: dict[str, dict] = {}
+
+        for name in self.order:
+            stage = self.stages[name]
+            if any(dep not in outputs for dep in stage.deps):
+                log.warning("[%s] Skipped — upstream stage failed", name)
+                report[name] = {"status": "blocked"}
+                continue
+
+            fingerprint = _digest({
+                "stage": name,
+                "params": stage.params,
+                "inputs": {dep: outputs[dep] for dep in stage.deps},
+            })
+            checkpoint = self._load_checkpoint(name, fingerprint)
+            if checkpoint is not None:
+                log.info("[%s] Inputs unchanged — reusing checkpoint from %s", name, checkpoint["finished_at"])
+                results[name] = checkpoint["result"]
+                outputs[name] = checkpoint["output"]
+                report[name] = {"status": "cached", "result": checkpoint["result"]}
+                continue
+
+            try:
+                result = stage.fn({dep: results[dep] for dep in stage.deps})
+            except Exception as e:
+                log.exception("[%s] Stage crashed: %s", name, e)
+                result = {"ok": False, "error": str(e)}
+            if not result.get("ok", True):
+                report[name] = {"status": "failed", "result": result}
+                continue
+
+            output = self._output_digest(stage, result)
+            if output is None:
+                log.error("[%s] Stage reported an artifact that doesn't exist", name)
+                report[name] = {"status": "failed", "result": {**result, "error": "artifact missing"}}
+                continue
+            self._save_checkpoint(name, fingerprint, output, result)
+            results[name] = result
+            outputs[name] = output
+            report[name] = {"status": "ok", "result": result}
+
+        return report
@@ -0,0 +1,464 @@
+# =============================================================
+# gumtree.py — Gumtree listing and ad page parsing
+# Shared by gumtree_scrapling.py (Fetcher) and
+# gumtree_scrapling_stealthy.py (StealthySession): both hand in
+# a Scrapling response, so the same selectors, block detection
+# and phone rules apply whichever fetcher got the page.
+# =============================================================
+# Ad pages are parsed once with lxml (extract_ad_fields);
+# scripts/parser_bench.py times the parsers against fixtures and
+# checks them against fixtures/gumtree/expected.json (the output
+# of the earlier Scrapling-selector parser).
+# Same output as the selector parser, with two exceptions:
+# JSON-LD blocks come from parsed <script> elements rather than a
+# regex over the raw body, so a type attribute that is not
+# double-quoted is now recognised and a commented-out block is
+# not. The body_text[5000:200000] phone scan is kept as the
+# last-resort fallback (~2 ms/page): it also reads phones from
+# attributes and inline app-state JSON, which no tree walk covers.
+# =============================================================
+
+import json
+import re
+import sys
+from datetime import datetime, timezone
+
+from cogstack_leadgen.phone import add_country_code, extract_phone
+
+# Gumtree-owned numbers injected site-wide (WhatsApp button, support links).
+# These appear in the rendered DOM on every ad page — not seller phones.
+_GUMTREE_NUMBERS = {"+27756035177", "27756035177", "0870220222", "+27870220222"}
+
+# ── Constants ─────────────────────────────────────────────────
+
+# NOTE: Gumtree removed the "Wanted Ads" top-level category (c9110) in 2025/2026.
+# All /s-wanted-ads/... paths now 301-redirect to /s-all-the-ads/v1b0p1 (losing the keyword).
+# Use buyer-intent keyword phrases (?q=) to surface people looking to BUY a tracker.
+# Category-level blocklist in extract_ad_links() further filters seller/job/car ads by URL.
+SEARCH_URLS = [
+    # Direct buyer-intent queries
+    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=need+car+tracker",
+    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=want+car+tracker",
+    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=car+tracker+wanted",
+    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=looking+for+tracker",
+    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=gps+tracker+needed",
+    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=vehicle+tracker+wanted",
+    # Theft/crime-related — people who just experienced theft are hot tracker prospects
+    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=car+stolen+tracker",
+    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=vehicle+stolen+need+tracker",
+    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=hijacked+car+tracker",
+    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=car+break+in+tracker",
+    # Vehicle security / anti-theft — adjacent intent
+    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=vehicle+security+tracking",
+    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=car+theft+prevention+tracker",
+    # Installation / service requests — people seeking tracker installation
+    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=tracker+installation+wanted",
+    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=install+car+tracker",
+]
+
+# Gumtree URL path segments that NEVER contain tracker buyer-intent ads.
+# Keep this list NARROW — the bridge script (gumtree_to_b2c.py) handles
+# buyer vs seller classification via LLM. Only block categories where
+# a tracker buyer ad is structurally impossible.
+# Rule: any URL segment containing "-jobs/" is a job ad — blocked in extract_ad_links().
+_BLOCKED_CATEGORIES = [
+    # Vehicles for sale (sellers listing cars/trucks, not tracker buyers)
+    "/a-cars-bakkies/",
+    "/a-heavy-trucks-buses/",
+    # Pets (pet trackers, not vehicle trackers)
+    "/a-other-pets/",
+    # Property / removals (never tracker-related)
+    "/a-removals-storage/",
+    "/a-property-",
+    # Wearables (smart rings, fitness bands — not vehicle trackers)
+    "/a-wearable-technology/",
+]
+
+BLOCK_SIGNALS = ["The request is blocked", "Access Denied", "cf-challenge"]
+
+GUMTREE_BASE = "https://www.gumtree.co.za"
+
+
+# ── Listing pages ─────────────────────────────────────────────
+
+def extract_ad_links(page) -> list[str]:
+    """
+    Extract individual ad URLs from a Gumtree listing page.
+    Accept:  URLs with /a- pattern (individual ads)
+    Reject:  /s-user/, /s-my-gumtree/
+    Dedupe via set, strip query params.
+    """
+    hrefs = page.css("a::attr(href)").getall()
+    seen = set()
+    links = []
+    for href in hrefs:
+        if not href:
+            continue
+        # Normalise to absolute URL
+        if href.startswith("/"):
+            href = GUMTREE_BASE + href
+        href = href.split("?")[0]  # strip query params
+        # Filter: only /a- pattern ad links
+        if "/a-" not in href:
+            continue
+        if "/s-user/" in href or "/s-my-gumtree/" in href:
+            continue
+        if not href.startswith(GUMTREE_BASE):
+            continue
+        if any(cat in href for cat in _BLOCKED_CATEGORIES):
+            continue
+        # Block all job listing categories (catches *-jobs/ patterns generically)
+        if "-jobs/" in href:
+            continue
+        if href not in seen:
+            seen.add(href)
+            links.append(href)
+    return links
+
+
+def _adid_from_url(url: str) -> str | None:
+    """Last numeric segment of an ad URL (fallback when data-adid is missing)."""
+    parts = [p for p in url.rstrip("/").split("/") if p]
+    if parts and re.match(r"^\d+$", parts[-1]):
+        return parts[-1]
+    return None
+
+
+def is_blocked(page) -> bool:
+    """Check whether the page is a bot-block or Cloudflare shell."""
+    try:
+        body_text = page.body.decode("utf-8", errors="ignore") if isinstance(page.body, bytes) else str(page.body)
+    except Exception:
+        return True
+    return _is_block_text(body_text)
+
+
+def _is_block_text(body_text: str) -> bool:
+    # Very short response = JS shell (curl-impersonate used to return 98 bytes)
+    if len(body_text) < 500:
+        return True
+    for signal in BLOCK_SIGNALS:
+        if signal in body_text:
+            return True
+    return False
+
+
+# ── Ad pages ──────────────────────────────────────────────────
+
+def _location_from_jsonld(raw: str) -> str | None:
+    """Location from one JSON-LD block, if it contains a Place."""
+    try:
+        data = json.loads(raw)
+        items = data if isinstance(data, list) else [data]
+        for item in items:
+            if item.get("@type") == "Place":
+                addr = item.get("address", {})
+                locality = addr.get("addressLocality", "")
+                region = addr.get("addressRegion", "")
+                # "Other" is Gumtree's placeholder when locality is unknown
+                parts = [p for p in [locality, region] if p and p.lower() != "other"]
+                if parts:
+                    return ", ".join(parts)
+    except Exception:
+        pass
+    return None
+
+
+def _extract_location_from_jsonld(body_text: str) -> str | None:
+    """
+    Parse JSON-LD Place schema embedded in page HTML.
+    Gumtree encodes location as addressLocality + addressRegion.
+    Returns e.g. "Cape Town" or "Johannesburg, Gauteng".
+    """
+    for m in re.finditer(
+        r'<script[^>]+type="application/ld\+json"[^>]*>(.*?)</script>',
+        body_text,
+        re.DOTALL,
+    ):
+        location = _location_from_jsonld(m.group(1))
+        if location:
+            return location
+    return None
+
+
+# Description containers in priority order. Gumtree changed HTML structure in
+# 2025/2026 (no more data-q attributes) so several generations are tried.
+_DESCRIPTION_MATCHERS = [
+    ("data-q", "ad-description"),
+    ("class", "description"),
+    ("class", "vip-ad-description"),
+    ("class", "ad-description"),
+]
+_LOCATION_MATCHERS = [("data-q", "ad-location"), ("class", "location")]
+_PRICE_MATCHERS = [("data-q", "ad-price"), ("class", "price")]
+
+
+# Field → group index for each (attribute, value) above, so an element is
+# matched with two dict lookups instead of a test per matcher.
+_MATCHER_INDEX: dict[tuple[str, str], list[tuple[str, int]]] = {}
+for _field, _matchers in (
+    ("descriptions", _DESCRIPTION_MATCHERS), ("locations", _LOCATION_MATCHERS), ("prices", _PRICE_MATCHERS),
+):
+    for _i, _matcher in enumerate(_matchers):
+        _MATCHER_INDEX.setdefault(_matcher, []).append((_field, _i))
+
+# Elements a field can come from by tag, and attributes one can come from
+# anywhere in the tree. Tag lookups use lxml's C-level tag filter; the
+# attribute lookup is a single compiled XPath whose predicate only names
+# attributes that actually occur in the raw HTML (data-* are usually absent).
+# (One XPath covering the tags too is slower: libxml2 evaluates every
+# predicate branch for every element.)
+_FIELD_TAGS = ("h1", "meta", "script", "a")
+_DATA_ATTRS = ("data-q", "data-phone", "data-adid")
+_attr_xpaths: dict[tuple, object] = {}
+_utf8_parser = None
+
+# The options Scrapling's Selector parses with: blank text and comments
+# dropped, so text on either side of a comment is a single text node.
+_PARSER_OPTIONS = dict(
+    recover=True, remove_blank_text=True, remove_comments=True, encoding="utf-8",
+    compact=True, huge_tree=True, default_doctype=True,
+)
+
+
+def _attr_xpath(attrs: tuple[str, ...]):
+    if attrs not in _attr_xpaths:
+        from lxml import etree
+        _attr_xpaths[attrs] = etree.XPath("descendant::*[" + " or ".join(f"@{a}" for a in attrs) + "]")
+    return _attr_xpaths[attrs]
+
+
+def _direct_texts(el) -> list[str]:
+    """Text nodes whose parent is el (CSS ::text semantics)."""
+    texts = [el.text] if el.text else []
+    texts.extend(child.tail for child in el if child.tail)
+    return texts
+
+
+def _all_texts(el) -> list[str]:
+    """Every text node inside el, its own included, in document order (Scrapling `el *::text`)."""
+    return [t for t in el.itertext() if t]
+
+
+def _group_texts(group: list) -> list[str]:
+    """_all_texts over matched elements, skipping ones nested in an earlier match (each text node once)."""
+    matched = set(group)
+    texts: list[str] = []
+    for el in group:
+        if not any(ancestor in matched for ancestor in el.iterancestors()):
+            texts.extend(_all_texts(el))
+    return texts
+
+
+def _first_text(elements: list, position) -> str | None:
+    """
+    First direct text node of any element, in document order (Scrapling
+    `sel::text` .get()). With nested matches a text node of an inner element
+    can precede the outer one's tails, so candidates are ordered by
+    position(element) — the element's document-order index.
+    """
+    if len(elements) == 1:
+        texts = _direct_texts(elements[0])
+        return texts[0] if texts else None
+    best = None
+    for el in elements:
+        if el.text:
+            key = (position(el), 0, 0)
+            if best is None or key < best[0]:
+                best = (key, el.text)
+        for child in el:
+            if child.tail:
+                # A tail follows the child's last descendant; among tails
+                # after the same descendant the deeper one comes first.
+                last = child
+                while len(last):
+                    last = last[-1]
+                key = (position(last), 1, -sum(1 for _ in child.iterancestors()))
+                if best is None or key < best[0]:
+                    best = (key, child.tail)
+    return best[1] if best else None
+
+
+def extract_ad_fields(body: bytes | str) -> dict:
+    """
+    Parse an ad page once and collect every raw field parse_ad_page needs:
+    title, description containers, meta description, JSON-LD blocks,
+    location/price elements, tel: hrefs, data-phone and data-adid.
+    Returns raw (unnormalised) values; empty dict if the HTML is unparseable.
+    """
+    global _utf8_parser
+    from lxml import etree  # ships with scrapling
+
+    # Plain etree parser: lxml.html's per-element class lookup costs more
+    # than the whole parse on a 250KB page.
+    if _utf8_parser is None:
+        _utf8_parser = etree.HTMLParser(**_PARSER_OPTIONS)
+    raw = body if isinstance(body, bytes) else body.strip().encode("utf-8")
+    try:
+        root = etree.fromstring(raw.replace(b"\x00", b""), _utf8_parser)
+    except Exception:
+        return {}
+    if root is None:
+        return {}
+
+    h1s: list = []
+    descriptions: list[list] = [[] for _ in _DESCRIPTION_MATCHERS]
+    locations: list[list] = [[] for _ in _LOCATION_MATCHERS]
+    prices: list[list] = [[] for _ in _PRICE_MATCHERS]
+    meta_description = None
+    jsonld: list[str] = []
+    tel_hrefs: list[str] = []
+    data_phone = None
+    data_adid = None
+
+    for el in root.iter(*_FIELD_TAGS):
+        tag = el.tag
+        if tag == "h1":
+            h1s.append(el)
+        elif tag == "meta":
+            if meta_description is None and el.get("name") == "description":
+                meta_description = el.get("content")
+        elif tag == "script":
+            if el.get("type") == "application/ld+json" and el.text:
+                jsonld.append(el.text)
+        else:
+            href = el.get("href")
+            if href and href.startswith("tel:"):
+                tel_hrefs.append(href)
+
+    marker = (lambda a: a.encode()) if isinstance(body, bytes) else (lambda a: a)
+    data_attrs = tuple(a for a in _DATA_ATTRS if marker(a) in body)
+    groups = {"descriptions": descriptions, "locations": locations, "prices": prices}
+
+    for el in _attr_xpath(("class",) + data_attrs)(root):  # document order
+        keys: set[tuple[str, str]] = set()
+        cls = el.get("class")
+        if cls and ("description" in cls or "location" in cls or "price" in cls):
+            keys.update(("class", token) for token in cls.split())  # cheap substring pre-check first
+        if data_attrs:
+            if data_phone is None:
+                data_phone = el.get("data-phone")
+            if data_adid is None:
+                data_adid = el.get("data-adid")
+            data_q = el.get("data-q")
+            if data_q is not None:
+                keys.add(("data-q", data_q))
+        for key in keys:
+            for field, i in _MATCHER_INDEX.get(key, ()):
+                groups[field][i].append(el)
+
+    order: dict = {}
+
+    def position(el) -> int:
+        if not order:
+            order.update((node, i) for i, node in enumerate(root.iter()))
+        return order[el]
+
+    return {
+        "title": _first_text(h1s, position),
+        "descriptions": [_group_texts(group) for group in descriptions],
+        "meta_description": meta_description,
+        "jsonld": jsonld,
+        "locations": [_first_text(group, position) for group in locations],
+        "prices": [_first_text(group, position) for group in prices],
+        "tel_hrefs": tel_hrefs,
+        "data_phone": data_phone,
+        "data_adid": data_adid,
+    }
+
+
+def parse_ad_page(page, url: str) -> dict | None:
+    """Extract lead fields from an individual Gumtree ad page."""
+    # Decode the body exactly once — block check, extraction and the phone
+    # fallback scan all reuse it.
+    try:
+        body_text = page.body.decode("utf-8", errors="ignore") if isinstance(page.body, bytes) else str(page.body)
+    except Exception:
+        body_text = ""
+
+    if _is_block_text(body_text):
+        print(f"[gumtree] block page detected: {url}", file=sys.stderr)
+        return None
+
+    return parse_ad_html(page.body, body_text, url)
+
+
+def parse_ad_html(body: bytes | str, body_text: str, url: str) -> dict:
+    """Build the lead dict for an ad page from its raw and decoded HTML."""
+    fields = extract_ad_fields(body)
+
+    # Title
+    title = fields.get("title")
+    if title:
+        title = title.strip()
+
+    # Description — first container generation with any text wins.
+    # Fall back to <meta name="description"> which is always present (truncated ~150 chars).
+    description = None
+    for parts in fields.get("descriptions", []):
+        if parts:
+            description = " ".join(t.strip() for t in parts if t.strip())
+            if description:
+                break
+    if not description:
+        description = fields.get("meta_description")
+        if description:
+            description = description.strip()
+
+    # Location — JSON-LD Place schema is the most reliable source on current Gumtree
+    location = None
+    for raw in fields.get("jsonld", []):
+        location = _location_from_jsonld(raw)
+        if location:
+            break
+    if not location:
+        for loc in fields.get("locations", []):
+            if loc and loc.strip() and loc.strip() != ",":
+                location = loc.strip()
+                break
+
+    # Price — like the selector loop this replaced, a blank-only match is
+    # left as read when nothing better follows
+    price = None
+    for raw_price in fields.get("prices", []):
+        price = raw_price
+        if price and price.strip():
+            price = price.strip()
+            break
+
+    # Phone
+    # Priority: rendered tel: links (filtered) > data-phone > regex in description > body scan
+    # NOTE: Gumtree injects its own numbers (+27756035177, 0870220222) into every page
+    # via JS-rendered DOM elements. Skip these — they are not seller phones.
+    phone = None
+    for tel_href in fields.get("tel_hrefs", []):
+        candidate = re.sub(r"[\s\-]", "", tel_href.replace("tel:", "").strip())
+        if candidate not in _GUMTREE_NUMBERS:
+            phone = add_country_code(candidate)
+            break
+    if not phone:
+        data_phone = fields.get("data_phone")
+        if data_phone:
+            phone = re.sub(r"[\s\-]", "", data_phone.strip())
+    if not phone:
+        phone = extract_phone(description)
+    if not phone and body_text:
+        # Seller phone is typically in description text at ~100K chars into the body.
+        # Scan up to 200K to capture it; avoid the related-ads section (~120K+).
+        phone = extract_phone(body_text[5000:200000])
+
+    # AdID — data-adid attribute first (even if empty), fall back to last numeric URL segment
+    adid = fields.get("data_adid")
+    if adid is None:
+        adid = _adid_from_url(url)
+
+    return {
+        "title": title,
+        "description": description,
+        "phone": phone,
+        "location": location,
+        "price": price,
+        "adid": adid,
+        "url": url,
+        "scraped_at": datetime.now(timezone.utc).isoformat(),
+    }
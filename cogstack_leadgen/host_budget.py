@@ -0,0 +1,64 @@
+# =============================================================
+# host_budget.py — Per-host politeness budget for threaded fetchers
+# Shared by gumtree_scrapling.py's FetchEngine and
+# hellopeter_scraper.py's concurrent review-page fetch, and by
+# notion.NotionWriter: caps requests in flight to one host and
+# spaces their starts (or, with space_after_finish, keeps a gap
+# after each request finishes, like a serial fetch loop's sleep).
+# =============================================================
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+
+class HostBudget:
+    """
+    Politeness budget for a single host, shared by all fetch workers.
+    Caps requests in flight and spaces request *starts* by at least
+    min_interval seconds plus up to jitter seconds of random delay.
+    space_after_finish also holds the next start back that long after
+    each request *finishes*, so one slot behaves like a serial loop that
+    sleeps between fetches.
+    """
+
+    def __init__(self, max_in_flight: int, min_interval: float, jitter: float, space_after_finish: bool = False):
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+        self._paused_until = 0.0
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self.space_after_finish = space_after_finish
+
+    def _gap(self) -> float:
+        return self.min_interval + random.random() * self.jitter
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every request start for seconds (e.g. a 429's Retry-After)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._next_start = max(self._next_start, self._paused_until)
+
+    @contextmanager
+    def slot(self):
+        """Block until a request to this host may start, then hold a slot."""
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    start = max(now, self._next_start)
+                    self._next_start = start + self._gap()
+                if start > now:
+                    time.sleep(start - now)
+                # A pause() while we slept also holds back starts reserved before it
+                if time.monotonic() >= self._paused_until:
+                    break
+            yield
+        finally:
+            if self.space_after_finish:
+                with self._lock:
+                    self._next_start = max(self._next_start, time.monotonic() + self._gap())
+            self._slots.release()
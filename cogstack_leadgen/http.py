@@ -0,0 +1,83 @@
+# =============================================================
+# http.py — Pooled HTTP client and the shared retry policy
+# One httpx.Client per process, so webhook POSTs, WhatsApp
+# lookups and Cartrack submissions reuse keep-alive connections
+# instead of a fresh TCP + TLS handshake per call.
+# =============================================================
+# Retry policy: up to MAX_RETRIES attempts in all; 5xx responses
+# and transport errors (timeouts, connection resets) are retried
+# after RETRY_DELAYS[attempt]; any other response is returned for
+# the caller to judge. 4xx is never retried — the request itself
+# is wrong.
+# =============================================================
+
+import atexit
+import logging
+import threading
+import time
+
+import httpx
+
+log = logging.getLogger("cogstack_leadgen")
+
+MAX_RETRIES = 3  # attempts in all, first one included
+RETRY_DELAYS = (2, 5, 15)  # seconds — wait after attempt i before the next
+
+DEFAULT_TIMEOUT = 30.0
+POOL_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0)
+
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> httpx.Client:
+    """The process-wide pooled client (thread-safe; closed at exit)."""
+    global _client
+    with _client_lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.Client(timeout=DEFAULT_TIMEOUT, limits=POOL_LIMITS)
+            atexit.register(_client.close)
+        return _client
+
+
+def request_with_retry(
+    method: str,
+    url: str,
+    *,
+    label: str = "HTTP",
+    attempts: int = MAX_RETRIES,
+    delays: tuple[float, ...] = RETRY_DELAYS,
+    **kwargs,
+) -> httpx.Response | None:
+    """Send a request on the shared client under the retry policy.
+
+    Makes up to `attempts` requests, waiting delays[i] after a failed
+    attempt i. Returns the first non-5xx response (the caller checks its
+    status), or None once every attempt has failed. kwargs go to
+    httpx.Client.request.
+    """
+    if len(delays) < attempts - 1:
+        raise ValueError(f"{attempts} attempts need {attempts - 1} retry delays, got {len(delays)}")
+    client = get_client()
+    for attempt in range(attempts):
+        last = attempt == attempts - 1
+        try:
+            response = client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            if last:
+                log.warning("%s request failed: %s", label, e)
+                break
+            log.warning("%s request failed: %s, retrying in %gs (attempt %d/%d)", label, e, delays[attempt], attempt + 1, attempts)
+            time.sleep(delays[attempt])
+            continue
+
+        if response.status_code < 500:
+            return response
+        if last:
+            log.warning("%s server error %d", label, response.status_code)
+            break
+        log.warning("%s server error %d, retrying in %gs (attempt %d/%d)", label, response.status_code, delays[attempt], attempt + 1, attempts)
+        time.sleep(delays[attempt])
+
+    log.error("%s failed after %d attempts", label, attempts)
+    return None
@@ -0,0 +1,158 @@
+# =============================================================
+# http_cache.py — Disk-backed HTTP response cache for scrapers
+# Wraps Fetcher.get calls in gumtree_scrapling.py and
+# hellopeter_scraper.py. Responses are keyed by URL and served
+# locally while fresh (per-call TTL); stale entries are
+# revalidated with If-None-Match / If-Modified-Since when the
+# server sent an ETag / Last-Modified. Bodies are content-hashed
+# so a refetch that returns identical bytes is counted as
+# "unchanged" rather than a new page.
+# =============================================================
+# Layout: logs/http-cache/<sha[:2]>/<sha>.body + <sha>.json
+# --offline replays the cache only (no network; misses raise
+# CacheMiss) — useful for testing parsers against a past run.
+# =============================================================
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_DIR = Path(__file__).parent.parent / "logs" / "http-cache"
+
+
+class CacheMiss(Exception):
+    """Raised in offline mode when a URL has no cached response."""
+
+
+class CachedResponse:
+    """Result of HttpCache.get.
+
+    body       raw response bytes
+    status     HTTP status of the original response
+    from_cache True if no full download happened (fresh hit or 304)
+    response   the live fetcher response when one was downloaded, else None
+    """
+
+    def __init__(self, body: bytes, status: int, from_cache: bool, response=None):
+        self.body = body
+        self.status = status
+        self.from_cache = from_cache
+        self.response = response
+
+
+def _as_bytes(body) -> bytes:
+    if isinstance(body, bytes):
+        return body
+    return str(body or "").encode("utf-8")
+
+
+def _header(headers, name: str) -> str | None:
+    if not headers:
+        return None
+    for key, value in dict(headers).items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+
+class HttpCache:
+    """URL-keyed response cache with TTLs, conditional revalidation and content hashing."""
+
+    def __init__(self, root: Path | str = DEFAULT_DIR, offline: bool = False):
+        self.root = Path(root)
+        self.offline = offline
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "revalidated": 0, "fetched": 0, "unchanged": 0}
+
+    # ── Storage ──────────────────────────────────────────────
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        folder = self.root / key[:2]
+        return folder / f"{key}.body", folder / f"{key}.json"
+
+    def _load(self, url: str) -> tuple[dict, bytes] | None:
+        body_path, meta_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            body = body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        return meta, body
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f"{path.suffix}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def _store(self, url: str, meta: dict, body: bytes | None = None) -> None:
+        body_path, meta_path = self._paths(url)
+        if body is not None:
+            self._write_atomic(body_path, body)
+        self._write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    # ── Public API ───────────────────────────────────────────
+
+    def get(self, url: str, fetch, ttl: float, cacheable=None) -> CachedResponse:
+        """
+        Return the response for url, from disk when possible.
+
+        fetch(url, headers) performs the real request and must return an
+        object with .status, .headers and .body. cacheable(body) can veto
+        storing a response (e.g. bot-block pages).
+        """
+        cached = self._load(url)
+        now = time.time()
+
+        if cached:
+            meta, body = cached
+            if self.offline or now - meta.get("validated_at", 0) < ttl:
+                self._count("hits")
+                return CachedResponse(body, meta.get("status", 200), from_cache=True)
+        elif self.offline:
+            raise CacheMiss(url)
+
+        conditional: dict[str, str] = {}
+        if cached:
+            if cached[0].get("etag"):
+                conditional["If-None-Match"] = cached[0]["etag"]
+            if cached[0].get("last_modified"):
+                conditional["If-Modified-Since"] = cached[0]["last_modified"]
+
+        resp = fetch(url, conditional)
+        status = getattr(resp, "status", 200)
+
+        if status == 304 and cached:
+            meta, body = cached
+            meta["validated_at"] = now
+            self._store(url, meta)
+            self._count("revalidated")
+            return CachedResponse(body, meta.get("status", 200), from_cache=True)
+
+        self._count("fetched")
+        body = _as_bytes(resp.body)
+        if status == 200 and (cacheable is None or cacheable(body)):
+            digest = hashlib.sha256(body).hexdigest()
+            unchanged = bool(cached) and cached[0].get("content_sha256") == digest
+            if unchanged:
+                self._count("unchanged")
+            headers = getattr(resp, "headers", None)
+            meta = {
+                "url": url,
+                "status": status,
+                "etag": _header(headers, "ETag"),
+                "last_modified": _header(headers, "Last-Modified"),
+                "content_sha256": digest,
+                "fetched_at": now if not unchanged else cached[0].get("fetched_at", now),
+                "validated_at": now,
+            }
+            self._store(url, meta, None if unchanged else body)
+        return CachedResponse(body, status, from_cache=False, response=resp)
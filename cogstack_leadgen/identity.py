@@ -0,0 +1,283 @@
+# =============================================================
+# identity.py — Cross-source identity index
+# One SQLite index that links every record we hold for a person —
+# Gumtree ads, Hellopeter reviews, Excel submissions, WhatsApp
+# replies — and remembers what has already been done for them:
+# WhatsApp name found, outreach sent, webhook posted, Cartrack
+# submitted. Each of those happens once per person, not once per
+# record, and a repeat is a primary-key lookup instead of a list
+# scan or a remote query.
+# =============================================================
+# Keys are (kind, normalised value): phone (+27…), email, url
+# (scheme/host lowercased, no query/fragment/trailing slash) and
+# name (scoped to its source: "hellopeter|jane smith", and only
+# for sources with no contact details — a bare name is too weak to
+# link anything else). Records that share any key are one
+# identity; a record whose keys hit two identities merges them.
+# Default location: logs/identity.sqlite
+# =============================================================
+
+import re
+import sqlite3
+import threading
+import unicodedata
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+from cogstack_leadgen.phone import normalise_phone
+
+DEFAULT_PATH = Path(__file__).parent.parent / "logs" / "identity.sqlite"
+
+# Actions recorded per identity
+ENRICHED = "whatsapp_name"     # detail: the WhatsApp profile name
+MESSAGED = "whatsapp_outreach"
+POSTED = "b2c_webhook"         # per source — see posted_action(); detail: batch_id
+REPLIED = "whatsapp_reply"     # detail: Yes / No / Maybe
+SUBMITTED = "cartrack"
+
+# Sources whose records carry no phone/email: the reviewer's name is the
+# only handle (what hellopeter_scraper.py always deduped on)
+NAME_KEYED_SOURCES = {"hellopeter"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS identities (
+    identity_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    merged_into INTEGER,
+    created_at  TEXT NOT NULL,
+    updated_at  TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS identity_keys (
+    kind        TEXT NOT NULL,
+    value       TEXT NOT NULL,
+    identity_id INTEGER NOT NULL,
+    source      TEXT,
+    PRIMARY KEY (kind, value)
+);
+CREATE INDEX IF NOT EXISTS idx_identity_keys_identity ON identity_keys (identity_id);
+CREATE TABLE IF NOT EXISTS identity_actions (
+    identity_id INTEGER NOT NULL,
+    action      TEXT NOT NULL,
+    detail      TEXT,
+    at          TEXT NOT NULL,
+    PRIMARY KEY (identity_id, action)
+);
+"""
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# ── Normalisers ──────────────────────────────────────────────
+
+def normalise_name(name: str | None) -> str | None:
+    """'  Jané  O'Brien ' → 'jane obrien'; None for empty / 'anonymous'."""
+    if not name:
+        return None
+    text = unicodedata.normalize("NFKD", str(name))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = _SPACES.sub(" ", _NON_WORD.sub("", text.casefold())).strip()
+    if not text or text in ("anonymous", "unknown", "there"):
+        return None
+    return text
+
+
+def normalise_email(email: str | None) -> str | None:
+    if not email:
+        return None
+    email = str(email).strip().lower()
+    if "@" not in email or email in ("n/a", "none", "null"):
+        return None
+    return email
+
+
+def normalise_url(url: str | None) -> str | None:
+    """Drop query, fragment and trailing slash; lowercase scheme and host."""
+    if not url:
+        return None
+    try:
+        parts = urlsplit(str(url).strip())
+    except ValueError:
+        return None
+    if not parts.netloc:
+        return None
+    host = parts.netloc.lower().removeprefix("www.")
+    return urlunsplit(("https", host, parts.path.rstrip("/"), "", ""))
+
+
+_NORMALISERS = {
+    "phone": normalise_phone,
+    "email": normalise_email,
+    "url": normalise_url,
+}
+
+
+def lead_keys(lead: dict, source: str) -> dict[str, str]:
+    """Identity keys for a lead dict (B2C webhook shape, or an outreach state entry)."""
+    keys = {
+        "phone": lead.get("phone"),
+        "email": lead.get("email"),
+        "url": lead.get("intent_source_url") or lead.get("url"),
+    }
+    if source in NAME_KEYED_SOURCES:
+        name = normalise_name(lead.get("full_name") or lead.get("display_name") or lead.get("name"))
+        if name:
+            keys["name"] = f"{source}|{name}"
+    return {kind: value for kind, value in keys.items() if value}
+
+
+def posted_action(source: str) -> str:
+    """A person is posted once per source: a WhatsApp Yes is news even if their Gumtree ad went in."""
+    return f"{POSTED}:{source}"
+
+
+# ── Index ─────────────────────────────────────────────────────
+
+class IdentityIndex:
+    """
+    Person-level index: keys → identity, identity → actions done.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path: Path | str = DEFAULT_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "matched": 0, "merged": 0}
+
+    def __enter__(self) -> "IdentityIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _normalise(keys: dict[str, str]) -> list[tuple[str, str]]:
+        pairs = []
+        for kind, value in keys.items():
+            norm = _NORMALISERS.get(kind, lambda v: str(v).strip() or None)(value)
+            if norm:
+                pairs.append((kind, norm))
+        return pairs
+
+    def _matches(self, pairs: list[tuple[str, str]]) -> set[int]:
+        ids = set()
+        for kind, value in pairs:
+            row = self._conn.execute(
+                "SELECT identity_id FROM identity_keys WHERE kind = ? AND value = ?", (kind, value)
+            ).fetchone()
+            if row:
+                ids.add(row[0])
+        return ids
+
+    def find(self, keys: dict[str, str]) -> int | None:
+        """The identity any of these keys belongs to, without creating or linking."""
+        pairs = self._normalise(keys)
+        with self._lock:
+            ids = self._matches(pairs)
+        return min(ids) if ids else None
+
+    def resolve(self, keys: dict[str, str], source: str | None = None) -> int | None:
+        """
+        Find-or-create the identity for a record and link all of its keys
+        to it. None if the record has no usable key.
+        """
+        pairs = self._normalise(keys)
+        if not pairs:
+            return None
+        now = _now()
+        with self._lock, self._conn:
+            ids = self._matches(pairs)
+            if not ids:
+                cur = self._conn.execute(
+                    "INSERT INTO identities (created_at, updated_at) VALUES (?, ?)", (now, now)
+                )
+                identity = cur.lastrowid
+                self.stats["created"] += 1
+            else:
+                identity = min(ids)
+                self.stats["matched"] += 1
+                for other in ids - {identity}:
+                    self._merge(other, into=identity)
+                self._conn.execute(
+                    "UPDATE identities SET updated_at = ? WHERE identity_id = ?", (now, identity)
+                )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO identity_keys (kind, value, identity_id, source) VALUES (?, ?, ?, ?)",
+                [(kind, value, identity, source) for kind, value in pairs],
+            )
+        return identity
+
+    def _merge(self, other: int, into: int) -> None:
+        self._conn.execute("UPDATE identity_keys SET identity_id = ? WHERE identity_id = ?", (into, other))
+        self._conn.execute(
+            """
+            INSERT OR IGNORE INTO identity_actions (identity_id, action, detail, at)
+            SELECT ?, action, detail, at FROM identity_actions WHERE identity_id = ?
+            """,
+            (into, other),
+        )
+        self._conn.execute("DELETE FROM identity_actions WHERE identity_id = ?", (other,))
+        # Kept as an alias so an id handed out before the merge still resolves
+        self._conn.execute(
+            "UPDATE identities SET merged_into = ? WHERE identity_id = ? OR merged_into = ?", (into, other, other)
+        )
+        self.stats["merged"] += 1
+
+    def _canonical(self, identity: int) -> int:
+        row = self._conn.execute(
+            "SELECT COALESCE(merged_into, identity_id) FROM identities WHERE identity_id = ?", (identity,)
+        ).fetchone()
+        return row[0] if row else identity
+
+    def canonical(self, identity: int) -> int:
+        """The id identity now goes by (itself, or the identity it was merged into)."""
+        with self._lock:
+            return self._canonical(identity)
+
+    def done(self, identity: int | None, action: str) -> bool:
+        """True if action was already recorded for this identity."""
+        if identity is None:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM identity_actions WHERE identity_id = ? AND action = ?",
+                (self._canonical(identity), action),
+            ).fetchone()
+        return row is not None
+
+    def detail(self, identity: int | None, action: str) -> str | None:
+        """The detail stored with an action (e.g. the WhatsApp name), or None."""
+        if identity is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT detail FROM identity_actions WHERE identity_id = ? AND action = ?",
+                (self._canonical(identity), action),
+            ).fetchone()
+        return row[0] if row else None
+
+    def record(self, identity: int | None, action: str, detail: str | None = None) -> None:
+        """Record that action was done for this identity (first record wins)."""
+        if identity is None:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO identity_actions (identity_id, action, detail, at) VALUES (?, ?, ?, ?)",
+                (self._canonical(identity), action, detail, _now()),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM identities WHERE merged_into IS NULL").fetchone()[0]
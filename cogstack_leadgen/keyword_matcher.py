@@ -0,0 +1,156 @@
+# =============================================================
+# keyword_matcher.py — Single-pass keyword matching with word boundaries
+# One compiled regex per keyword list, shared by
+# gumtree_to_b2c.pre_filter, hellopeter_scraper.score_churn_intent
+# and whatsapp_responses.classify_response.
+# =============================================================
+# Keyword syntax:
+#   "no"          whole word/phrase — matches "no", not "know" / "not"
+#   "cancel*"     stem — matches "cancel", "cancelled", "cancelling"
+#   "price:"      boundaries only apply next to word characters, so
+#                 punctuation at either end matches as written
+# Matching is case-insensitive and any whitespace run matches a
+# space. At any position the longest keyword wins, so
+# "not interested" is one hit rather than "interested".
+#
+# The keywords are compiled into a prefix trie (one alternation
+# per shared prefix), so the regex engine tests each text position
+# against a handful of first characters instead of every keyword.
+# scripts/matcher_bench.py compares it with the old `kw in text`
+# loops on the memory/ lead files.
+# =============================================================
+
+import re
+from typing import Iterable, NamedTuple
+
+
+class Hit(NamedTuple):
+    keyword: str
+    start: int
+    end: int
+
+
+# Trie leaf markers — how a keyword ending at this node must end in the text
+_WORD_END = "\x00"  # literal ends in a word char: next char must not be one
+_STEM_END = "\x01"  # "*" keyword: swallow the rest of the word
+_OPEN_END = "\x02"  # literal ends in punctuation: no boundary check
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def _literal(keyword: str) -> str:
+    return " ".join(keyword.rstrip("*").lower().split())
+
+
+def _trie_pattern(keywords: list[str]) -> str:
+    root: dict = {}
+    for keyword in keywords:
+        literal = _literal(keyword)
+        node = root
+        for char in literal:
+            node = node.setdefault(char, {})
+        if keyword.endswith("*"):
+            node[_STEM_END] = True
+        elif _is_word_char(literal[-1]):
+            node[_WORD_END] = True
+        else:
+            node[_OPEN_END] = True
+
+    def build(node: dict) -> str:
+        # Children before leaf markers: the engine tries the longer keyword
+        # first and only falls back to the shorter one if it fails.
+        alternatives = [
+            (r"\s+" if char == " " else re.escape(char)) + build(child)
+            for char, child in sorted(node.items())
+            if char not in (_WORD_END, _STEM_END, _OPEN_END)
+        ]
+        if _STEM_END in node:
+            alternatives.append(r"\w*")
+        if _WORD_END in node:
+            alternatives.append(r"(?!\w)")
+        if _OPEN_END in node:
+            alternatives.append("")
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return "(?:" + "|".join(alternatives) + ")"
+
+    return build(root)
+
+
+class KeywordMatcher:
+    """Finds every keyword from a fixed list in one regex pass over the text."""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = list(dict.fromkeys(k for k in keywords if _literal(k)))
+        word_start = [k for k in self.keywords if _is_word_char(_literal(k)[0])]
+        other_start = [k for k in self.keywords if not _is_word_char(_literal(k)[0])]
+
+        branches, lookaheads = [], []
+        if word_start:
+            trie = _trie_pattern(word_start)
+            branches.append(rf"(?<!\w)({trie})")
+            lookaheads.append(rf"(?<!\w)(?=({trie}))")
+        if other_start:
+            trie = _trie_pattern(other_start)
+            branches.append(f"({trie})")
+            lookaheads.append(f"(?=({trie}))")
+        pattern = "|".join(branches) or r"(?!x)x()"
+        overlapping = "|".join(lookaheads) or r"(?!x)x()"
+
+        self._regex = re.compile(pattern)
+        self._overlapping = re.compile(overlapping)
+        # Fallback for the rare text whose lowercase form changes length
+        # (so match offsets would not line up with the original).
+        self._regex_i = re.compile(pattern, re.IGNORECASE)
+        self._overlapping_i = re.compile(overlapping, re.IGNORECASE)
+
+        self._exact = {}
+        for keyword in self.keywords:
+            if not keyword.endswith("*") or _literal(keyword) not in self._exact:
+                self._exact[_literal(keyword)] = keyword
+        self._stems = sorted(
+            (k for k in self.keywords if k.endswith("*")), key=lambda k: -len(_literal(k))
+        )
+
+    def _keyword_for(self, matched: str) -> str:
+        normalised = " ".join(matched.lower().split())
+        keyword = self._exact.get(normalised)
+        if keyword is not None:
+            return keyword
+        for stem in self._stems:
+            if normalised.startswith(_literal(stem)):
+                return stem
+        return normalised
+
+    def finditer(self, text: str, overlapping: bool = False):
+        """
+        Yield Hits in text order.
+        Default: non-overlapping, longest keyword wins. overlapping=True
+        reports the longest keyword starting at every position, so nested
+        phrases ("car was stolen" and "stolen") are both reported.
+        """
+        text = text or ""
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            regex = self._overlapping if overlapping else self._regex
+            subject = lowered
+        else:
+            regex = self._overlapping_i if overlapping else self._regex_i
+            subject = text
+        for match in regex.finditer(subject):
+            group = match.lastindex
+            start, end = match.start(group), match.end(group)
+            yield Hit(self._keyword_for(subject[start:end]), start, end)
+
+    def find_all(self, text: str, overlapping: bool = False) -> list[Hit]:
+        return list(self.finditer(text, overlapping))
+
+    def search(self, text: str) -> Hit | None:
+        """First (leftmost) hit, or None."""
+        return next(self.finditer(text), None)
+
+    def matched(self, text: str, overlapping: bool = False) -> list[str]:
+        """Distinct keywords found, in order of first appearance."""
+        return list(dict.fromkeys(hit.keyword for hit in self.finditer(text, overlapping)))
@@ -0,0 +1,85 @@
+# =============================================================
+# lead_io.py — Lead file readers/writers shared by the scrapers
+# NDJSON (one JSON object per line) lets a scraper write each
+# lead the moment it is parsed: memory stays flat on large runs
+# and a crash mid-run keeps every line flushed so far.
+# =============================================================
+# read_leads() accepts either format, so downstream scripts
+# (gumtree_to_b2c.py) don't care which one the scraper wrote.
+# write_ndjson() replaces a streamed file in one step once the
+# final order is known (e.g. ranked by score).
+# =============================================================
+
+import json
+import os
+from pathlib import Path
+
+
+class NdjsonWriter:
+    """Append-and-flush writer: one lead per line, flushed after every write."""
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, "w", encoding="utf-8")
+        self.count = 0
+
+    def __enter__(self) -> "NdjsonWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def write(self, record: dict) -> None:
+        self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._f.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        if not self._f.closed:
+            self._f.close()
+
+
+def write_ndjson(path: Path | str, records) -> None:
+    """Write records as NDJSON, atomically replacing path (readers never see a half-written file)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f"{path.suffix}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+def iter_leads(path: Path | str):
+    """
+    Yield leads from a JSON array file or an NDJSON file.
+    Unparseable NDJSON lines (e.g. a last line cut off when the scraper
+    was killed mid-write) are skipped.
+    """
+    with open(path, encoding="utf-8") as f:
+        first = ""
+        while not first:
+            char = f.read(1)
+            if not char:
+                return
+            first = char.strip()
+        f.seek(0)
+        if first == "[":
+            data = json.load(f)
+            if not isinstance(data, list):
+                raise ValueError(f"Expected JSON array, got {type(data).__name__}")
+            yield from data
+            return
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def read_leads(path: Path | str) -> list[dict]:
+    return list(iter_leads(path))
@@ -0,0 +1,113 @@
+# =============================================================
+# llm_cache.py — Persistent cache of LLM ad classifications
+# SQLite table of content hash → parsed enrichment JSON, used by
+# gumtree_to_b2c.py so an ad re-scraped on a later day (or a
+# --dry-run re-run) is not sent to the model again.
+# =============================================================
+# Key: sha256 over (prompt version, model, title, truncated
+# description, location) — bump the prompt version in the caller
+# whenever the prompt or output schema changes.
+# Default location: logs/llm-cache.sqlite
+# Eviction: least-recently-used rows are dropped once the stored
+# JSON exceeds max_bytes.
+# =============================================================
+
+import hashlib
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+DEFAULT_PATH = Path(__file__).parent.parent / "logs" / "llm-cache.sqlite"
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key        TEXT PRIMARY KEY,
+    value      TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    last_used  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used);
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def cache_key(prompt_version: str, model: str, title: str, description: str, location: str) -> str:
+    payload = json.dumps([prompt_version, model, title, description, location], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LlmCache:
+    """Content-addressed store of parsed LLM enrichments with LRU size eviction."""
+
+    def __init__(self, path: Path | str = DEFAULT_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+    def __enter__(self) -> "LlmCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (_now(), key))
+            self.stats["hits"] += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: dict) -> None:
+        data = json.dumps(value, ensure_ascii=False)
+        now = _now()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO llm_cache (key, value, size, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    value = excluded.value,
+                    size = excluded.size,
+                    last_used = excluded.last_used
+                """,
+                (key, data, len(data.encode("utf-8")), now, now),
+            )
+            self.stats["stored"] += 1
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least-recently-used rows until the total size fits max_bytes. Caller holds the lock."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM llm_cache ORDER BY last_used"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            total -= size
+            self.stats["evicted"] += 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
@@ -0,0 +1,46 @@
+# =============================================================
+# logs.py — Console + daily file logging for the scripts
+# Console (stderr) at INFO, logs/<prefix>-YYYY-MM-DD.log at DEBUG.
+# The same handlers go on the "cogstack_leadgen" logger, so
+# messages from the shared modules (retries, webhook, WhatsApp)
+# land in the calling script's console and log file.
+# A logger that already has handlers is left alone, so stages run
+# in-process by b2c_run.py don't double up the library's output.
+# =============================================================
+
+import logging
+import sys
+from datetime import datetime
+
+from cogstack_leadgen import LOGS_DIR
+
+LIBRARY_LOGGER = "cogstack_leadgen"
+
+_FILE_FORMAT = "%(asctime)s [%(name)s] %(levelname)s: %(message)s"
+
+
+def setup_logging(log: logging.Logger, file_prefix: str, timestamps: bool = False) -> None:
+    """Configure console + file logging on log and the library logger.
+
+    timestamps=True adds the time to console lines (the cron-run
+    WhatsApp / Cartrack scripts); the scrapers keep them short.
+    """
+    console = logging.StreamHandler(sys.stderr)
+    console.setLevel(logging.INFO)
+    if timestamps:
+        console.setFormatter(logging.Formatter(_FILE_FORMAT, datefmt="%Y-%m-%d %H:%M:%S"))
+    else:
+        console.setFormatter(logging.Formatter("[%(name)s] %(levelname)s: %(message)s"))
+
+    LOGS_DIR.mkdir(exist_ok=True)
+    today = datetime.now().strftime("%Y-%m-%d")
+    fh = logging.FileHandler(LOGS_DIR / f"{file_prefix}-{today}.log", encoding="utf-8")
+    fh.setLevel(logging.DEBUG)
+    fh.setFormatter(logging.Formatter(_FILE_FORMAT))
+
+    for logger in (log, logging.getLogger(LIBRARY_LOGGER)):
+        if logger.handlers:
+            continue
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(console)
+        logger.addHandler(fh)
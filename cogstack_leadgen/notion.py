@@ -0,0 +1,232 @@
+# =============================================================
+# notion.py — Shared Notion API writer
+# One queue for every page create / update a script makes,
+# drained by a few worker threads under Notion's ~3 requests/s
+# limit (HostBudget), so a batch of writes overlaps its round
+# trips instead of paying them one after another.
+# =============================================================
+# 429s: the Retry-After wait pauses *all* workers, then the write
+# is retried (up to RATE_LIMIT_RETRIES times); 5xx and transport
+# errors follow the shared RETRY_DELAYS policy.
+# Coalescing: an update to a page that already has an update
+# queued (not yet started) is merged into it — later property
+# values win — so the page is PATCHed once.
+# Results: create() / update() return a Future resolving to the
+# page JSON, or None if the write failed (already logged).
+# =============================================================
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+
+from cogstack_leadgen.host_budget import HostBudget
+from cogstack_leadgen.http import request_with_retry
+
+log = logging.getLogger("cogstack_leadgen")
+
+NOTION_BASE_URL = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+
+NOTION_RATE = 3.0          # requests/s — Notion's documented average
+NOTION_CONCURRENCY = 3
+RATE_LIMIT_RETRIES = 5
+DEFAULT_RETRY_AFTER = 1.0  # seconds, when a 429 has no Retry-After header
+
+
+def notion_headers(api_key: str | None = None) -> dict:
+    return {
+        "Authorization": f"Bearer {api_key or os.environ.get('NOTION_API_KEY', '')}",
+        "Content-Type": "application/json",
+        "Notion-Version": NOTION_VERSION,
+    }
+
+
+def _retry_after(response) -> float:
+    try:
+        return max(0.0, float(response.headers.get("retry-after", DEFAULT_RETRY_AFTER)))
+    except ValueError:
+        return DEFAULT_RETRY_AFTER
+
+
+@dataclass
+class _Write:
+    method: str
+    path: str
+    body: dict
+    label: str
+    page_id: str | None = None
+    future: Future = field(default_factory=Future)
+    callbacks: list[Callable[[dict | None], None]] = field(default_factory=list)
+
+
+class NotionWriter:
+    """
+    Rate-limited, concurrent Notion page writer. Use as a context manager
+    (or call close()) so queued writes finish before the script exits.
+    """
+
+    def __init__(self, api_key: str | None = None, rate: float = NOTION_RATE,
+                 concurrency: int = NOTION_CONCURRENCY, base_url: str = NOTION_BASE_URL):
+        self.base_url = base_url
+        self.headers = notion_headers(api_key)
+        self.budget = HostBudget(max_in_flight=max(1, concurrency), min_interval=1.0 / rate, jitter=0.0)
+        self._queue: queue.Queue[_Write | None] = queue.Queue()
+        self._pending_updates: dict[str, _Write] = {}
+        self._lock = threading.Lock()
+        self._started: float | None = None
+        self._closed = False
+        self.stats = {
+            "created": 0, "updated": 0, "queried": 0, "coalesced": 0,
+            "rate_limited": 0, "errors": 0, "requests": 0, "max_queue_depth": 0,
+        }
+        self._workers = [
+            threading.Thread(target=self._work, name=f"notion-writer-{i}", daemon=True)
+            for i in range(max(1, concurrency))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def __enter__(self) -> "NotionWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ── Requests ─────────────────────────────────────────────
+
+    def request(self, method: str, path: str, body: dict | None = None, label: str = "Notion") -> dict | None:
+        """One Notion call under the rate budget, retrying 429s; the JSON body or None."""
+        for _ in range(RATE_LIMIT_RETRIES + 1):
+            with self.budget.slot():
+                with self._lock:
+                    if self._started is None:
+                        self._started = time.monotonic()
+                    self.stats["requests"] += 1
+                response = request_with_retry(
+                    method, f"{self.base_url}{path}", label=label, headers=self.headers, json=body,
+                )
+            if response is None:
+                return None
+            if response.status_code == 429:
+                wait = _retry_after(response)
+                with self._lock:
+                    self.stats["rate_limited"] += 1
+                log.warning("%s rate-limited — pausing Notion writes %gs", label, wait)
+                self.budget.pause(wait)
+                continue
+            if response.status_code == 200:
+                return response.json()
+            log.error("%s failed %d: %s", label, response.status_code, response.text[:300])
+            return None
+        log.error("%s still rate-limited after %d retries", label, RATE_LIMIT_RETRIES)
+        return None
+
+    def query(self, db_id: str, body: dict | None = None) -> Iterator[dict]:
+        """Every page of a database query (follows next_cursor), fetched under the same budget."""
+        body = {"page_size": 100, **(body or {})}
+        while True:
+            data = self.request("POST", f"/databases/{db_id}/query", body, label="Notion query")
+            if data is None:
+                raise RuntimeError(f"Notion query of {db_id} failed")
+            with self._lock:
+                self.stats["queried"] += len(data["results"])
+            yield from data["results"]
+            if not data.get("has_more"):
+                return
+            body = {**body, "start_cursor": data["next_cursor"]}
+
+    # ── Queued writes ────────────────────────────────────────
+
+    def _enqueue(self, write: _Write) -> None:
+        self._queue.put(write)
+        with self._lock:
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self._queue.qsize())
+
+    def create(self, db_id: str, properties: dict,
+               on_done: Callable[[dict | None], None] | None = None) -> Future:
+        """Queue a page create in database db_id."""
+        write = _Write("POST", "/pages", {"parent": {"database_id": db_id}, "properties": properties},
+                       label="Notion create")
+        if on_done:
+            write.callbacks.append(on_done)
+        self._enqueue(write)
+        return write.future
+
+    def update(self, page_id: str, properties: dict,
+               on_done: Callable[[dict | None], None] | None = None) -> Future:
+        """Queue a PATCH of page_id's properties, merged into one already queued for it."""
+        with self._lock:
+            queued = self._pending_updates.get(page_id)
+            if queued is not None:
+                queued.body["properties"].update(properties)
+                if on_done:
+                    queued.callbacks.append(on_done)
+                self.stats["coalesced"] += 1
+                return queued.future
+            write = _Write("PATCH", f"/pages/{page_id}", {"properties": dict(properties)},
+                           label=f"Notion update {page_id}", page_id=page_id)
+            if on_done:
+                write.callbacks.append(on_done)
+            self._pending_updates[page_id] = write
+        self._enqueue(write)
+        return write.future
+
+    def _work(self) -> None:
+        while (write := self._queue.get()) is not None:
+            if write.page_id is not None:
+                with self._lock:
+                    # Started: a later update to this page gets a write of its own
+                    self._pending_updates.pop(write.page_id, None)
+            try:
+                result = self.request(write.method, write.path, write.body, label=write.label)
+            except Exception as e:
+                log.exception("%s crashed: %s", write.label, e)
+                result = None
+            with self._lock:
+                if result is None:
+                    self.stats["errors"] += 1
+                else:
+                    self.stats["created" if write.method == "POST" else "updated"] += 1
+            for callback in write.callbacks:
+                try:
+                    callback(result)
+                except Exception as e:
+                    log.exception("%s callback crashed: %s", write.label, e)
+            write.future.set_result(result)
+
+    # ── Reporting ────────────────────────────────────────────
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def report(self) -> dict:
+        """Counts plus throughput (requests/s since the first request) and current queue depth."""
+        with self._lock:
+            elapsed = time.monotonic() - self._started if self._started is not None else 0.0
+            stats = dict(self.stats)
+        stats["queue_depth"] = self.queue_depth
+        stats["per_s"] = round(stats["requests"] / elapsed, 2) if elapsed > 0 else 0.0
+        return stats
+
+    def close(self) -> None:
+        """Finish every queued write, stop the workers and log the totals."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        if self.stats["requests"]:
+            r = self.report()
+            log.info(
+                "Notion: %d created, %d updated (%d coalesced), %d errors, %d rate-limited — %.1f req/s, peak queue %d",
+                r["created"], r["updated"], r["coalesced"], r["errors"], r["rate_limited"], r["per_s"],
+                r["max_queue_depth"],
+            )
@@ -0,0 +1,272 @@
+# =============================================================
+# notion_mirror.py — Local SQLite mirror of the Notion databases
+# One row per page of the B2C Leads, B2C Batches and
+# Claire-Prospects databases (or any database synced into it),
+# kept current by an incremental sync: one query for the pages
+# edited since the last sync, instead of a per-lead dedup query
+# or a full pull of every page on each run.
+# =============================================================
+# Sync: pages with last_edited_time on or after the stored cursor,
+# oldest first. Notion rounds last_edited_time to the minute, so
+# the cursor's minute is fetched again — harmless, rows are
+# upserted. Pages moved to the trash never show up in a query, so
+# only a full sync (notion_sync.py --full) drops them.
+# Rows keep the raw page properties plus a flattened copy
+# ({"Status": "Pending QA", "Batch": [page ids], …}) for queries
+# and reporting; "Intent Source URL" has its own indexed column.
+# Default location: logs/notion-mirror.sqlite
+# Reset: delete the file (the next sync is a full one).
+# =============================================================
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable
+
+from cogstack_leadgen import LOGS_DIR, PROJECT_ROOT
+from cogstack_leadgen.notion import NotionWriter
+
+log = logging.getLogger("cogstack_leadgen")
+
+DEFAULT_PATH = LOGS_DIR / "notion-mirror.sqlite"
+NOTION_CONFIG = PROJECT_ROOT / "notion_config.json"
+
+# Mirror name → (env var, notion_config.json key) holding its database id
+MIRRORED_DATABASES = {
+    "b2c_leads": ("B2C_LEADS_DB_ID", "b2c_leads_database_id"),
+    "b2c_batches": ("B2C_BATCHES_DB_ID", "b2c_batches_database_id"),
+    "claire_prospects": ("CLAIRE_PROSPECTS_DB_ID", "claire_prospects_db_id"),
+}
+
+SOURCE_URL_PROPERTY = "Intent Source URL"
+
+# Rows written per transaction during a sync
+SYNC_CHUNK = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id               TEXT PRIMARY KEY,
+    database_id      TEXT NOT NULL,
+    created_time     TEXT NOT NULL,
+    last_edited_time TEXT NOT NULL,
+    title            TEXT,
+    source_url       TEXT,
+    props            TEXT NOT NULL,
+    properties       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pages_source_url ON pages (database_id, source_url);
+CREATE TABLE IF NOT EXISTS synced_databases (
+    database_id TEXT PRIMARY KEY,
+    cursor      TEXT,
+    synced_at   TEXT NOT NULL
+);
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def database_ids(names: Iterable[str] | None = None) -> dict[str, str]:
+    """Mirror name → database id for every configured database (env var first, then notion_config.json)."""
+    config = json.loads(NOTION_CONFIG.read_text()) if NOTION_CONFIG.exists() else {}
+    ids = {}
+    for name in names or MIRRORED_DATABASES:
+        env_var, config_key = MIRRORED_DATABASES[name]
+        db_id = os.environ.get(env_var) or config.get(config_key)
+        if db_id:
+            ids[name] = db_id
+    return ids
+
+
+def plain(prop: dict):
+    """A Notion property value as a plain value: text, select name, date start, relation ids, …"""
+    kind = prop.get("type")
+    value = prop.get(kind)
+    if kind in ("title", "rich_text"):
+        return "".join(t.get("plain_text", "") for t in value) or None
+    if kind in ("select", "status"):
+        return value["name"] if value else None
+    if kind == "multi_select":
+        return [option["name"] for option in value]
+    if kind == "date":
+        return value["start"] if value else None
+    if kind in ("relation", "people"):
+        return [item["id"] for item in value]
+    if kind in ("formula", "rollup"):
+        return value.get(value.get("type")) if value else None
+    return value  # number, url, email, phone_number, checkbox, created_time, …
+
+
+def flatten(properties: dict) -> dict:
+    return {name: plain(prop) for name, prop in properties.items()}
+
+
+class NotionMirror:
+    """Mirrored Notion pages keyed by page id. Safe to share between threads."""
+
+    def __init__(self, path: Path | str = DEFAULT_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "NotionMirror":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ── Sync ─────────────────────────────────────────────────
+
+    def cursor(self, db_id: str) -> str | None:
+        """last_edited_time of the newest page seen by the last sync (None: never synced)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT cursor FROM synced_databases WHERE database_id = ?", (db_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def synced_at(self, db_id: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT synced_at FROM synced_databases WHERE database_id = ?", (db_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def sync(self, notion: NotionWriter, db_id: str, full: bool = False) -> int:
+        """
+        Fetch the pages edited since the last sync (every page if full or
+        never synced) and upsert them. A full sync also drops rows for pages
+        no longer in the database. Returns how many pages were fetched;
+        raises RuntimeError if a Notion query fails (rows fetched so far
+        are kept, the cursor isn't moved).
+        """
+        cursor = None if full else self.cursor(db_id)
+        body: dict = {"sorts": [{"timestamp": "last_edited_time", "direction": "ascending"}]}
+        if cursor:
+            body["filter"] = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": cursor}}
+
+        seen: set[str] = set()
+        chunk: list[dict] = []
+        for page in notion.query(db_id, body):
+            seen.add(page["id"])
+            cursor = max(cursor or "", page["last_edited_time"])
+            chunk.append(page)
+            if len(chunk) >= SYNC_CHUNK:
+                self._upsert(db_id, chunk)
+                chunk = []
+        self._upsert(db_id, chunk)
+
+        with self._lock, self._conn:
+            if full:
+                existing = {pid for (pid,) in self._conn.execute(
+                    "SELECT id FROM pages WHERE database_id = ?", (db_id,)
+                )}
+                gone = existing - seen
+                self._conn.executemany("DELETE FROM pages WHERE id = ?", ((pid,) for pid in gone))
+                if gone:
+                    log.info("Notion mirror: %d pages no longer in %s — removed", len(gone), db_id)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO synced_databases (database_id, cursor, synced_at) VALUES (?, ?, ?)",
+                (db_id, cursor, _now()),
+            )
+        log.info("Notion mirror: %s %s — %d pages fetched", "full sync of" if full else "synced", db_id, len(seen))
+        return len(seen)
+
+    def _upsert(self, db_id: str, pages: list[dict]) -> None:
+        rows = []
+        for page in pages:
+            props = flatten(page["properties"])
+            title = next((props[n] for n, p in page["properties"].items() if p.get("type") == "title"), None)
+            rows.append((
+                page["id"], db_id, page["created_time"], page["last_edited_time"], title,
+                props.get(SOURCE_URL_PROPERTY), json.dumps(props), json.dumps(page["properties"]),
+            ))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pages "
+                "(id, database_id, created_time, last_edited_time, title, source_url, props, properties) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def put(self, db_id: str, page: dict) -> None:
+        """Record a page just created / updated through the API (a trashed page is removed)."""
+        if page.get("archived") or page.get("in_trash"):
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM pages WHERE id = ?", (page["id"],))
+            return
+        self._upsert(db_id, [page])
+
+    # ── Queries ──────────────────────────────────────────────
+
+    def pages(self, db_id: str) -> list[dict]:
+        """Every mirrored page of a database: flattened properties plus id, created_time, last_edited_time."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, created_time, last_edited_time, props FROM pages WHERE database_id = ? "
+                "ORDER BY created_time",
+                (db_id,),
+            ).fetchall()
+        return [
+            {"id": pid, "created_time": created, "last_edited_time": edited, **json.loads(props)}
+            for pid, created, edited, props in rows
+        ]
+
+    def find(self, db_id: str, prop: str, value) -> list[dict]:
+        """Pages whose flattened property prop equals value."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, created_time, last_edited_time, props FROM pages "
+                "WHERE database_id = ? AND json_extract(props, '$.' || json_quote(?)) = ?",
+                (db_id, prop, value),
+            ).fetchall()
+        return [
+            {"id": pid, "created_time": created, "last_edited_time": edited, **json.loads(props)}
+            for pid, created, edited, props in rows
+        ]
+
+    def known_source_urls(self, db_id: str, urls: Iterable[str]) -> set[str]:
+        """The subset of urls already recorded as a page's Intent Source URL."""
+        urls = list({u for u in urls if u})
+        known: set[str] = set()
+        with self._lock:
+            for i in range(0, len(urls), 500):
+                part = urls[i:i + 500]
+                known.update(url for (url,) in self._conn.execute(
+                    f"SELECT source_url FROM pages WHERE database_id = ? "
+                    f"AND source_url IN ({', '.join('?' * len(part))})",
+                    (db_id, *part),
+                ))
+        return known
+
+    def count_by(self, db_id: str, prop: str) -> dict:
+        """Property value → number of pages (for reporting, e.g. leads by Status)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT json_extract(props, '$.' || json_quote(?)) AS value, COUNT(*) FROM pages "
+                "WHERE database_id = ? GROUP BY value ORDER BY COUNT(*) DESC",
+                (prop, db_id),
+            ).fetchall()
+        return {value if value is not None else "(none)": count for value, count in rows}
+
+    def count(self, db_id: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM pages WHERE database_id = ?", (db_id,)
+            ).fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
@@ -0,0 +1,63 @@
+# =============================================================
+# phone.py — South African phone number normalisation
+# Every stage keys leads on the +27XXXXXXXXX form: the scrapers
+# extract it, WhatsApp outreach dedupes on it, Cartrack wants the
+# local 0XXXXXXXXX form back.
+# =============================================================
+
+import logging
+import re
+
+log = logging.getLogger("cogstack_leadgen")
+
+# Mobile (06x-08x) numbers in +27 / 27 / 0 form, optional space or dash separators
+PHONE_RE = re.compile(r"(?:\+27|27|0)[6-8]\d[\s\-]?\d{3}[\s\-]?\d{4}")
+
+_SEPARATORS = re.compile(r"[\s\-]")
+
+
+def add_country_code(number: str) -> str:
+    """0XXXXXXXXX / 27XXXXXXXXX → +27XXXXXXXXX; anything else unchanged."""
+    if number.startswith("0"):
+        return "+27" + number[1:]
+    if number.startswith("27"):
+        return "+" + number
+    return number
+
+
+def normalise_phone(raw) -> str | None:
+    """Normalise any SA phone format to +27XXXXXXXXX.
+
+    Handles openpyxl reading phone as integer (drops leading zero).
+    """
+    if raw is None:
+        return None
+    # Handle integer from openpyxl (e.g., 827712303 → "0827712303")
+    if isinstance(raw, (int, float)):
+        raw = str(int(raw)).zfill(10)
+    phone = _SEPARATORS.sub("", str(raw).strip())
+    if phone.startswith("+27"):
+        return phone
+    if phone.startswith("27") and len(phone) == 11:
+        return f"+{phone}"
+    if phone.startswith("0") and len(phone) == 10:
+        return f"+27{phone[1:]}"
+    log.debug("Unrecognised phone format: %r", raw)
+    return None
+
+
+def extract_phone(text: str | None) -> str | None:
+    """Extract and normalise the first SA phone number in text."""
+    if not text:
+        return None
+    match = PHONE_RE.search(text)
+    if not match:
+        return None
+    return add_country_code(_SEPARATORS.sub("", match.group(0)))
+
+
+def to_local_phone(phone: str) -> str:
+    """Convert +27XXXXXXXXX → 0XXXXXXXXX."""
+    if phone.startswith("+27"):
+        return "0" + phone[3:]
+    return phone
@@ -0,0 +1,148 @@
+# =============================================================
+# review_store.py — Local store of Hellopeter reviews + sync marks
+# SQLite table of every review hellopeter_scraper.py has fetched,
+# plus a high-water mark per competitor slug (newest review the
+# store is complete up to) and how far back from it the store is
+# complete (covered_from). --incremental runs page the API only
+# until the mark when that coverage spans the --days window, then
+# score the window from the store; otherwise they fetch the whole
+# window again.
+# =============================================================
+# Default location: logs/hellopeter-reviews.sqlite
+# Reset (force a full re-sync): delete the file, or run the
+# scraper without --incremental — a full run still refreshes the
+# store and its marks.
+# =============================================================
+
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+from cogstack_leadgen import LOGS_DIR
+
+DEFAULT_PATH = LOGS_DIR / "hellopeter-reviews.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    review_id  TEXT PRIMARY KEY,
+    slug       TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    data       TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reviews_slug_created ON reviews (slug, created_at);
+CREATE TABLE IF NOT EXISTS sync_marks (
+    slug       TEXT PRIMARY KEY,
+    review_id    TEXT NOT NULL,
+    created_at   TEXT NOT NULL,
+    synced_at    TEXT NOT NULL,
+    covered_from TEXT
+);
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def review_key(review: dict) -> str:
+    """Stable id for a review: the API id, else its permalink (which ends in the id)."""
+    key = review.get("id") or review.get("permalink")
+    if key:
+        return str(key)
+    return f"{review.get('author', '')}|{review.get('created_at', '')}"
+
+
+class ReviewStore:
+    """Hellopeter reviews keyed by review id, with per-slug high-water marks."""
+
+    def __init__(self, path: Path | str = DEFAULT_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sync_marks)")}
+        if "covered_from" not in columns:
+            # Marks from before covered_from: coverage unknown, the next incremental run fetches in full
+            with self._conn:
+                self._conn.execute("ALTER TABLE sync_marks ADD COLUMN covered_from TEXT")
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "ReviewStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def add(self, slug: str, reviews: list[dict]) -> int:
+        """Insert or refresh reviews; returns how many review ids were new (a repeat counts once)."""
+        now = _now()
+        new = 0
+        with self._lock, self._conn:
+            for review in reviews:
+                key = review_key(review)
+                data = json.dumps(review, ensure_ascii=False)
+                cur = self._conn.execute(
+                    """
+                    INSERT INTO reviews (review_id, slug, created_at, data, first_seen, last_seen)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(review_id) DO NOTHING
+                    """,
+                    (key, slug, review.get("created_at") or "", data, now, now),
+                )
+                if cur.rowcount:
+                    new += 1
+                else:
+                    self._conn.execute(
+                        "UPDATE reviews SET data = ?, last_seen = ? WHERE review_id = ?", (data, now, key)
+                    )
+        return new
+
+    def mark(self, slug: str) -> tuple[str, str, str | None] | None:
+        """
+        (review_id, created_at, covered_from) of the slug's high-water mark,
+        or None. The store holds every review from covered_from up to the
+        mark (covered_from None: unknown).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT review_id, created_at, covered_from FROM sync_marks WHERE slug = ?", (slug,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def set_mark(self, slug: str, review: dict, covered_from: str | None = None) -> None:
+        """Record review as the newest one the store is complete up to, back to covered_from."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO sync_marks (slug, review_id, created_at, synced_at, covered_from)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(slug) DO UPDATE SET
+                    review_id = excluded.review_id,
+                    created_at = excluded.created_at,
+                    synced_at = excluded.synced_at,
+                    covered_from = excluded.covered_from
+                """,
+                (slug, review_key(review), review.get("created_at") or "", _now(), covered_from),
+            )
+
+    def reviews(self, slug: str, since: str = "") -> list[dict]:
+        """The slug's stored reviews with created_at >= since, newest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM reviews WHERE slug = ? AND created_at >= ? ORDER BY created_at DESC",
+                (slug, since),
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
@@ -0,0 +1,115 @@
+# =============================================================
+# seen_index.py — Persistent cross-run index of scraped Gumtree ads
+# SQLite table of url/adid → first_seen/last_seen, shared by
+# gumtree_scrapling.py and gumtree_scrapling_stealthy.py so the
+# daily cron only fetches ads it has never seen before.
+# =============================================================
+# An ad is recorded when it is scraped, but only skipped once it
+# is handled (handled_at set): rejected by gumtree_to_b2c.py, or
+# part of a batch the webhook accepted. An ad whose classify or
+# POST failed is scraped again on the next run, not lost.
+# Default location: logs/gumtree-seen.sqlite
+# Reset (force a full re-scrape): delete the file, or run the
+# scraper with --no-seen.
+# =============================================================
+
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable
+
+DEFAULT_PATH = Path(__file__).parent.parent / "logs" / "gumtree-seen.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen_ads (
+    url        TEXT PRIMARY KEY,
+    adid       TEXT,
+    first_seen TEXT NOT NULL,
+    last_seen  TEXT NOT NULL,
+    handled_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_seen_ads_adid ON seen_ads (adid);
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class SeenIndex:
+    """
+    On-disk index of Gumtree ads already scraped in a previous run.
+    Safe to share between the scraper's discovery and worker threads.
+    """
+
+    def __init__(self, path: Path | str = DEFAULT_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(seen_ads)")}
+        if "handled_at" not in columns:
+            # Index from before handled_at: its ads were skipped as soon as scraped — keep skipping them
+            with self._conn:
+                self._conn.execute("ALTER TABLE seen_ads ADD COLUMN handled_at TEXT")
+                self._conn.execute("UPDATE seen_ads SET handled_at = last_seen")
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "SeenIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def check_url(self, url: str) -> bool:
+        """Return True if url was handled in a previous run; bumps its last_seen."""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE seen_ads SET last_seen = ? WHERE url = ? AND handled_at IS NOT NULL", (_now(), url)
+            )
+            return cur.rowcount > 0
+
+    def has_adid(self, adid: str | None) -> bool:
+        """Return True if an ad with this adid was handled before (under any URL)."""
+        if not adid:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM seen_ads WHERE adid = ? AND handled_at IS NOT NULL LIMIT 1", (adid,)
+            ).fetchone()
+        return row is not None
+
+    def record(self, ad: dict) -> None:
+        """Insert or refresh an ad after it has been scraped (not yet handled)."""
+        now = _now()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO seen_ads (url, adid, first_seen, last_seen)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    adid = COALESCE(excluded.adid, seen_ads.adid),
+                    last_seen = excluded.last_seen
+                """,
+                (ad["url"], ad.get("adid"), now, now),
+            )
+
+    def mark_handled(self, urls: Iterable[str]) -> int:
+        """Mark scraped ads as handled so later runs skip them; returns how many rows changed."""
+        now = _now()
+        with self._lock, self._conn:
+            cur = self._conn.executemany(
+                "UPDATE seen_ads SET handled_at = ? WHERE url = ? AND handled_at IS NULL",
+                ((now, url) for url in urls if url),
+            )
+            return cur.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM seen_ads").fetchone()[0]
@@ -0,0 +1,105 @@
+# =============================================================
+# sheet_index.py — Which lead-sheet rows have already been handled
+# SQLite table of row content hashes (see sheets.row_hash) that
+# whatsapp_outreach.py has finished with — sent, already messaged,
+# marked "sent" in the sheet, unusable phone — plus the content
+# digest of every file read to the end with nothing left over.
+# An unchanged file is skipped without opening it; an edited one
+# only costs the rows that changed.
+# =============================================================
+# Default location: logs/lead-sheets.sqlite
+# Reset (re-read every row): delete the file.
+# =============================================================
+
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+from cogstack_leadgen import LOGS_DIR
+from cogstack_leadgen.sheets import file_digest
+
+DEFAULT_PATH = LOGS_DIR / "lead-sheets.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheet_rows (
+    row_hash   TEXT PRIMARY KEY,
+    outcome    TEXT NOT NULL,
+    handled_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sheet_files (
+    path         TEXT PRIMARY KEY,
+    digest       TEXT NOT NULL,
+    completed_at TEXT NOT NULL
+);
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class SheetIndex:
+    """
+    Handled rows and fully-handled files. read_only=True (dry runs) still
+    skips what earlier runs handled but records nothing.
+    """
+
+    def __init__(self, path: Path | str = DEFAULT_PATH, read_only: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.read_only = read_only
+
+    def __enter__(self) -> "SheetIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def handled(self, row_hash: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM sheet_rows WHERE row_hash = ?", (row_hash,)
+            ).fetchone()
+        return row is not None
+
+    def mark(self, row_hash: str, outcome: str) -> None:
+        """Record a row as finished with (outcome: sent / skipped / messaged / bad_phone)."""
+        if self.read_only:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sheet_rows (row_hash, outcome, handled_at) VALUES (?, ?, ?)",
+                (row_hash, outcome, _now()),
+            )
+
+    def unchanged(self, path: Path | str) -> bool:
+        """True if the file's content is exactly what a previous run finished."""
+        key = str(Path(path).resolve())
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM sheet_files WHERE path = ?", (key,)
+            ).fetchone()
+        return row is not None and row[0] == file_digest(path)
+
+    def complete(self, path: Path | str) -> None:
+        """Record that every row of this file's current content was handled."""
+        if self.read_only:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sheet_files (path, digest, completed_at) VALUES (?, ?, ?)",
+                (str(Path(path).resolve()), file_digest(path), _now()),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sheet_rows").fetchone()[0]
@@ -0,0 +1,104 @@
+# =============================================================
+# sheets.py — Streaming lead-sheet reader (XLSX / CSV)
+# Yields one row at a time as a dict keyed by lead field (name,
+# phone, email, …), found by header name rather than column
+# position, so Claire's submission files, the top-N exports in
+# memory/ and CSV copies of either all read the same way and a
+# large file is never held in memory.
+# =============================================================
+# Header matching is case- and whitespace-insensitive. A header
+# that appears twice maps to its rightmost column:
+# CarTrackSubmissions.xlsx has a stale numeric "Status" in L and
+# the live "status" in P.
+# =============================================================
+
+import csv
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Iterator
+
+import openpyxl
+
+# Lead field → header names it can appear under
+FIELD_HEADERS = {
+    "name": ("lead name", "name", "full name", "contact name"),
+    "phone": ("telephone", "phone", "phone number", "mobile", "cell", "cellphone"),
+    "email": ("email address", "email", "e-mail"),
+    "business": ("business", "business name", "company"),
+    # Claire's sheets: a lead-source label in CarTrackSubmissions.xlsx,
+    # the business name in CarTrackSubmission2.xlsx (the caller decides)
+    "source": ("source platform",),
+    "interest": ("expressed interest", "interest"),
+    "motivation": ("motivation", "story"),
+    "status": ("status",),
+}
+
+_SPACES = re.compile(r"\s+")
+
+
+def _header_key(value) -> str:
+    return _SPACES.sub(" ", str(value or "")).strip().casefold()
+
+
+def map_header(header: tuple | list) -> dict[str, int]:
+    """Lead field → column index for one header row (unmatched fields are absent)."""
+    by_header = {_header_key(h): i for i, h in enumerate(header) if _header_key(h)}
+    columns = {}
+    for field, names in FIELD_HEADERS.items():
+        for name in names:
+            if name in by_header:
+                columns[field] = by_header[name]
+                break
+    return columns
+
+
+def row_hash(row: dict) -> str:
+    """Content hash of a mapped row (position-independent: inserting rows above doesn't change it)."""
+    data = {k: v for k, v in row.items() if not k.startswith("_")}
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def file_digest(path: Path | str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _rows(path: Path) -> Iterator[tuple[str, Iterator[tuple]]]:
+    """(sheet name, row iterator) for every sheet; a CSV is one sheet."""
+    if path.suffix.lower() == ".csv":
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            yield path.stem, (tuple(r) for r in csv.reader(f))
+        return
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            yield ws.title, ws.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def iter_sheet_rows(path: Path | str) -> Iterator[dict]:
+    """
+    Yield every non-empty data row of every sheet as {field: value, ...}
+    plus "_sheet" and "_row" (1-based, as shown in Excel). Sheets without a
+    phone column are skipped. Values are passed through as read — phone
+    may be an int from openpyxl; normalise it downstream.
+    """
+    path = Path(path)
+    for sheet, rows in _rows(path):
+        header = next(rows, None)
+        columns = map_header(header or ())
+        if "phone" not in columns:
+            continue
+        for n, row in enumerate(rows, start=2):
+            if not any(row):
+                continue
+            record = {
+                field: row[i] if i < len(row) else None
+                for field, i in columns.items()
+            }
+            record["_sheet"] = sheet
+            record["_row"] = n
+            yield record
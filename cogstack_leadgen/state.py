@@ -0,0 +1,178 @@
+# =============================================================
+# state.py — WhatsApp outreach state store
+# One row per contacted phone, written by whatsapp_outreach.py and
+# updated by whatsapp_responses.py and cartrack_submit.py. Each
+# send / reply / submission is a single-row transaction, so a lead
+# costs one indexed lookup instead of a scan and rewrite of the
+# whole list, cron jobs that overlap wait on the SQLite lock
+# instead of overwriting each other, and a crash loses at most the
+# lead in flight.
+# =============================================================
+# Default location: logs/outreach-state.sqlite
+# Migration: the first open of an empty store imports the old
+# logs/outreach-state.json and renames it to
+# outreach-state.json.migrated.
+# Rows keep the full entry as JSON (display_name, notion_page_id,
+# response_text, …); status, sent_at and cartrack_submitted are
+# mirrored into indexed columns for the queries the scripts run.
+# =============================================================
+
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+from cogstack_leadgen import LOGS_DIR
+
+log = logging.getLogger("cogstack_leadgen")
+
+DEFAULT_PATH = LOGS_DIR / "outreach-state.sqlite"
+STATE_FILE = LOGS_DIR / "outreach-state.json"   # legacy, migrated on first open
+
+# Seconds a script waits for another one's write to finish
+BUSY_TIMEOUT = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outreach (
+    phone              TEXT PRIMARY KEY,
+    status             TEXT NOT NULL,
+    sent_at            TEXT NOT NULL DEFAULT '',
+    cartrack_submitted INTEGER NOT NULL DEFAULT 0,
+    data               TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outreach_status ON outreach (status, cartrack_submitted);
+"""
+
+# Entry fields mirrored into their own column → the column value for an
+# entry without the field (the columns are NOT NULL)
+_COLUMNS = {"status": "pending", "sent_at": "", "cartrack_submitted": 0}
+
+
+def _columns(entry: dict) -> dict:
+    """Column values for the mirrored fields in entry; a field set to None gets the column default."""
+    cols = {col: default if entry[col] is None else entry[col] for col, default in _COLUMNS.items() if col in entry}
+    if "cartrack_submitted" in cols:
+        cols["cartrack_submitted"] = int(bool(cols["cartrack_submitted"]))
+    return cols
+
+
+class OutreachStore:
+    """Outreach entries keyed by E.164 phone. Safe to share between threads."""
+
+    def __init__(self, path: Path | str = DEFAULT_PATH, legacy_path: Path | None = STATE_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        if legacy_path is not None:
+            self.migrate(Path(legacy_path))
+
+    def __enter__(self) -> "OutreachStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def migrate(self, json_path: Path) -> int:
+        """
+        Import a legacy outreach-state.json into an empty store and rename
+        it to *.migrated. Returns how many entries were imported.
+        """
+        if not json_path.exists():
+            return 0
+        with self._lock:
+            # IMMEDIATE: two scripts starting together can't both import
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._conn.execute("SELECT 1 FROM outreach LIMIT 1").fetchone():
+                    self._conn.rollback()
+                    log.warning("Outreach store %s already has entries — not importing %s", self.path, json_path)
+                    return 0
+                imported = 0
+                for i, entry in enumerate(json.loads(json_path.read_text())):
+                    if not isinstance(entry, dict) or not entry.get("phone"):
+                        log.warning("Outreach state entry %d in %s has no phone — skipped: %.200r", i, json_path, entry)
+                        continue
+                    imported += self._insert(entry)
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        json_path.rename(json_path.with_name(json_path.name + ".migrated"))
+        log.info("Migrated %d outreach entries from %s to %s", imported, json_path, self.path)
+        return imported
+
+    def _insert(self, entry: dict) -> bool:
+        cols = {"phone": entry["phone"], **_COLUMNS, **_columns(entry)}
+        cur = self._conn.execute(
+            f"INSERT OR IGNORE INTO outreach ({', '.join(cols)}, data) VALUES ({', '.join('?' * len(cols))}, ?)",
+            (*cols.values(), json.dumps(entry)),
+        )
+        return cur.rowcount > 0
+
+    def add(self, entry: dict) -> bool:
+        """Insert a new entry; False if the phone is already in the store."""
+        with self._lock, self._conn:
+            return self._insert(entry)
+
+    def has(self, phone: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM outreach WHERE phone = ?", (phone,)).fetchone()
+        return row is not None
+
+    def get(self, phone: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM outreach WHERE phone = ?", (phone,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, phone: str, **fields) -> bool:
+        """
+        Merge fields into one entry in a single statement (a field set to
+        None is removed; its indexed column goes back to the default).
+        False if the phone isn't in the store.
+        """
+        cols = _columns(fields)
+        sets = "".join(f", {col} = ?" for col in cols)
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                f"UPDATE outreach SET data = json_patch(data, ?){sets} WHERE phone = ?",
+                (json.dumps(fields), *cols.values(), phone),
+            )
+        return cur.rowcount > 0
+
+    def by_status(self, *statuses: str, cartrack_submitted: bool | None = None) -> list[dict]:
+        """Entries with any of these statuses, oldest send first."""
+        sql = f"SELECT data FROM outreach WHERE status IN ({', '.join('?' * len(statuses))})"
+        params: list = list(statuses)
+        if cartrack_submitted is not None:
+            sql += " AND cartrack_submitted = ?"
+            params.append(int(cartrack_submitted))
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY sent_at", params).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def without(self, field: str) -> list[dict]:
+        """Entries with no value for field (e.g. a Notion record still to create), oldest send first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM outreach WHERE json_extract(data, '$.' || ?) IS NULL ORDER BY sent_at",
+                (field,),
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def counts(self) -> dict[str, int]:
+        """status → number of entries."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM outreach GROUP BY status").fetchall()
+        return dict(rows)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outreach").fetchone()[0]
@@ -0,0 +1,181 @@
+# =============================================================
+# webhook.py — POST lead batches to the n8n B2C webhook
+# Shared by gumtree_to_b2c.py, hellopeter_scraper.py,
+# whatsapp_responses.py and b2c_run.py. Env: B2C_WEBHOOK_URL and
+# B2C_WEBHOOK_TOKEN (falls back to WEBHOOK_TOKEN), read at call
+# time so the calling script's load_dotenv() has already run.
+# =============================================================
+# post_new_leads() drops people already posted from the same
+# source (identity.py) and repeats of an Intent Source URL
+# within the batch before the POST, then syncs the local
+# Notion mirror (notion_mirror.py) once and drops leads whose
+# Intent Source URL is already in B2C Leads. The payload is then
+# flagged "dedup": "mirror" and the n8n node skips its per-lead
+# Notion query. Without NOTION_API_KEY / a B2C Leads database id,
+# or if the sync fails, n8n dedups as before.
+# =============================================================
+
+import logging
+import os
+
+from cogstack_leadgen.http import request_with_retry
+from cogstack_leadgen.identity import IdentityIndex, lead_keys, posted_action
+from cogstack_leadgen.notion import NotionWriter
+from cogstack_leadgen.notion_mirror import NotionMirror, database_ids
+
+log = logging.getLogger("cogstack_leadgen")
+
+WEBHOOK_TIMEOUT = 60.0
+
+
+def webhook_config() -> tuple[str | None, str | None]:
+    """(url, token) from the environment."""
+    return (
+        os.environ.get("B2C_WEBHOOK_URL"),
+        os.environ.get("B2C_WEBHOOK_TOKEN") or os.environ.get("WEBHOOK_TOKEN"),
+    )
+
+
+def post_to_webhook(leads: list[dict], batch_id: str, mirror_deduped: bool = False) -> dict | None:
+    """POST the B2C batch to the n8n webhook. Returns response JSON or None.
+
+    Retries on 5xx and timeout errors with exponential backoff.
+    4xx errors fail immediately (client error — don't retry).
+    mirror_deduped tells n8n the leads were checked against the Notion
+    mirror, so it skips its own per-lead dedup query.
+    """
+    url, token = webhook_config()
+    if not url:
+        log.error("B2C_WEBHOOK_URL not set in .env")
+        return None
+    if not token:
+        log.error("B2C_WEBHOOK_TOKEN not set in .env")
+        return None
+
+    payload = {
+        "batch_id": batch_id,
+        "segment": "B2C",
+        "leads": leads,
+    }
+    if mirror_deduped:
+        payload["dedup"] = "mirror"
+    response = request_with_retry(
+        "POST",
+        url,
+        label="Webhook",
+        json=payload,
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=WEBHOOK_TIMEOUT,
+    )
+    if response is None:
+        return None
+    log.info("Webhook response: %d", response.status_code)
+    if response.status_code != 200:
+        log.error("Webhook error %d: %s", response.status_code, response.text[:500])
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return {}  # accepted, but n8n answered without a JSON body
+
+
+def known_in_notion(leads: list[dict], mirror: NotionMirror | None = None) -> set[str] | None:
+    """
+    Intent Source URLs of these leads already in the B2C Leads database,
+    after one incremental mirror sync. None if the mirror can't be used.
+    """
+    urls = [lead["intent_source_url"] for lead in leads if lead.get("intent_source_url")]
+    if not urls:
+        return set()  # nothing n8n could dedup on either
+    api_key = os.environ.get("NOTION_API_KEY")
+    db_id = database_ids(["b2c_leads"]).get("b2c_leads")
+    if not api_key or not db_id:
+        log.debug("Notion mirror not configured — n8n dedups against Notion")
+        return None
+    own_mirror = mirror is None
+    mirror = NotionMirror() if own_mirror else mirror
+    try:
+        with NotionWriter(api_key) as notion:
+            mirror.sync(notion, db_id)
+        return mirror.known_source_urls(db_id, urls)
+    except RuntimeError as e:
+        log.warning("Notion mirror sync failed (%s) — n8n dedups against Notion", e)
+        return None
+    finally:
+        if own_mirror:
+            mirror.close()
+
+
+def post_new_leads(
+    leads: list[dict],
+    batch_id: str,
+    source: str,
+    index: IdentityIndex | None = None,
+    mirror: NotionMirror | None = None,
+) -> dict | None:
+    """POST only the leads whose person hasn't been posted from this source yet
+    and whose Intent Source URL isn't in Notion already.
+
+    Returns {"response", "posted", "skipped", "in_notion"} — response is None
+    when every lead was a repeat and nothing was sent — or None if the POST
+    failed. The leads are recorded as posted only once n8n has accepted the
+    batch; those found in Notion are recorded straight away.
+    """
+    own_index = index is None
+    index = IdentityIndex() if own_index else index
+    action = posted_action(source)
+    try:
+        fresh: list[dict] = []
+        identities: list[int | None] = []  # parallel to fresh
+        seen: set[int] = set()  # canonical identities already in this batch
+        urls: set[str] = set()  # Intent Source URLs already in this batch
+        skipped = 0
+        for lead in leads:
+            url = lead.get("intent_source_url")
+            if url and url in urls:
+                skipped += 1  # same post twice in this batch
+                continue
+            merges = index.stats["merged"]
+            identity = index.resolve(lead_keys(lead, source), source)
+            if index.stats["merged"] != merges:
+                # resolve folded an identity into an older one, maybe one already in this batch
+                seen = {index.canonical(i) for i in seen}
+            if identity is not None and (identity in seen or index.done(identity, action)):
+                skipped += 1
+                continue
+            fresh.append(lead)
+            identities.append(identity)
+            if identity is not None:
+                seen.add(identity)
+            if url:
+                urls.add(url)
+        if skipped:
+            log.info("%d %s leads already posted — skipped", skipped, source)
+
+        known = known_in_notion(fresh, mirror) if fresh else None
+        in_notion = 0
+        if known is not None:
+            kept: list[tuple[dict, int | None]] = []
+            for lead, identity in zip(fresh, identities):
+                if lead.get("intent_source_url") in known:
+                    in_notion += 1
+                    if identity is not None:
+                        index.record(identity, action, "notion")
+                    continue
+                kept.append((lead, identity))
+            fresh = [lead for lead, _ in kept]
+            identities = [identity for _, identity in kept]
+            if in_notion:
+                log.info("%d %s leads already in Notion — skipped", in_notion, source)
+        if not fresh:
+            return {"response": None, "posted": 0, "skipped": skipped, "in_notion": in_notion}
+
+        response = post_to_webhook(fresh, batch_id, mirror_deduped=known is not None)
+        if response is None:
+            return None
+        for identity in identities:
+            index.record(identity, action, batch_id)
+        return {"response": response, "posted": len(fresh), "skipped": skipped, "in_notion": in_notion}
+    finally:
+        if own_index:
+            index.close()
@@ -0,0 +1,174 @@
+# =============================================================
+# whatsapp.py — Client for the Baileys WhatsApp service (Phone 3)
+# /lookup resolves a number to its WhatsApp profile name,
+# /send delivers an outreach message. Default service URL comes
+# from WHATSAPP_LOOKUP_URL (http://127.0.0.1:3456).
+# WhatsAppLookup wraps /lookup with the persistent result cache
+# (whatsapp_cache.py) and bounded concurrency for batch runs.
+# =============================================================
+
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, TypeVar
+
+import httpx
+
+from cogstack_leadgen.http import get_client, request_with_retry
+from cogstack_leadgen.whatsapp_cache import WhatsAppLookupCache
+
+log = logging.getLogger("cogstack_leadgen")
+
+T = TypeVar("T")
+
+DEFAULT_LOOKUP_URL = "http://127.0.0.1:3456"
+
+LOOKUP_TIMEOUT = 15.0
+LOOKUP_ATTEMPTS = 2  # Baileys can be slow after idle — one retry
+LOOKUP_RETRY_DELAYS = (3,)
+LOOKUP_CONCURRENCY = 3  # one phone behind Baileys — keep it gentle
+SEND_TIMEOUT = 90.0  # server adds 30–60s jitter before sending
+
+
+def lookup_url() -> str:
+    return os.environ.get("WHATSAPP_LOOKUP_URL", DEFAULT_LOOKUP_URL)
+
+
+def lookup_profile(phone: str, base_url: str | None = None) -> tuple[bool, str | None] | None:
+    """Ask /lookup about a number: (on WhatsApp?, profile name), or None if
+    the service didn't answer with a 200 JSON body (so callers can tell
+    "not on WhatsApp" from "don't know")."""
+    response = request_with_retry(
+        "POST",
+        f"{base_url or lookup_url()}/lookup",
+        label=f"WhatsApp lookup {phone}",
+        attempts=LOOKUP_ATTEMPTS,
+        delays=LOOKUP_RETRY_DELAYS,
+        json={"phone": phone},
+        timeout=LOOKUP_TIMEOUT,
+    )
+    if response is None:
+        return None
+    if response.status_code != 200:
+        # 4xx (bad request, auth, service not ready) says nothing about the number
+        log.warning("WhatsApp lookup %s: HTTP %d — %s", phone, response.status_code, response.text[:200])
+        return None
+    try:
+        data = response.json()
+    except ValueError:
+        log.warning("WhatsApp lookup %s: non-JSON response (%d)", phone, response.status_code)
+        return None
+    if not (data.get("exists") and data.get("name")):
+        log.debug("WhatsApp lookup %s: exists=%s name=%s", phone, data.get("exists"), data.get("name"))
+    return bool(data.get("exists")), data.get("name") or None
+
+
+def whatsapp_lookup(phone: str, base_url: str | None = None) -> str | None:
+    """Look up the WhatsApp profile name for a phone number.
+
+    Returns the profile name, or None if the number is not on WhatsApp,
+    has no name, or the service is unavailable.
+    """
+    result = lookup_profile(phone, base_url)
+    return result[1] if result else None
+
+
+class WhatsAppLookup:
+    """
+    Cached, concurrent /lookup client. Numbers answered within the cache
+    TTL (including "not on WhatsApp") aren't asked again; the rest run
+    up to `concurrency` at a time, so one slow lookup doesn't hold up
+    the numbers behind it. The same number in flight twice is asked once.
+    """
+
+    def __init__(self, base_url: str | None = None, cache: WhatsAppLookupCache | None = None,
+                 concurrency: int = LOOKUP_CONCURRENCY):
+        self.base_url = base_url or lookup_url()
+        self.cache = cache
+        self.concurrency = max(1, concurrency)
+        self._inflight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"cached": 0, "looked_up": 0, "found": 0, "missing": 0, "errors": 0}
+
+    def lookup(self, phone: str) -> str | None:
+        """Profile name for phone, or None (not on WhatsApp / no name / service down)."""
+        cached = self.cache.get(phone) if self.cache is not None else None
+        if cached is not None:
+            with self._lock:
+                self.stats["cached"] += 1
+            return cached[1]
+        result = lookup_profile(phone, self.base_url)
+        with self._lock:
+            self.stats["looked_up"] += 1
+            if result is None:
+                self.stats["errors"] += 1
+            else:
+                self.stats["found" if result[1] else "missing"] += 1
+        if result is None:
+            return None
+        if self.cache is not None:
+            self.cache.put(phone, *result)
+        return result[1]
+
+    def _submit(self, pool: ThreadPoolExecutor, phone: str) -> Future:
+        with self._lock:
+            future = self._inflight.get(phone)
+            if future is not None:
+                return future
+            future = self._inflight[phone] = pool.submit(self.lookup, phone)
+        # Outside the lock: the callback runs inline if the lookup already finished
+        future.add_done_callback(lambda _, p=phone: self._forget(p))
+        return future
+
+    def _forget(self, phone: str) -> None:
+        with self._lock:
+            self._inflight.pop(phone, None)
+
+    def lookup_iter(self, items: Iterable[T], phone: Callable[[T], str | None] = lambda item: item,
+                    ahead: int | None = None) -> Iterator[tuple[T, str | None]]:
+        """
+        Yield (item, profile name or None) in input order, keeping up to
+        `ahead` (default 2 × concurrency) lookups in flight. Works on a
+        stream: items are pulled only as far ahead as that. phone(item)
+        returning None skips the lookup for that item.
+        """
+        ahead = ahead or self.concurrency * 2
+        window: deque[tuple[T, Future | None]] = deque()
+        pool = ThreadPoolExecutor(self.concurrency, thread_name_prefix="wa-lookup")
+        try:
+            for item in items:
+                number = phone(item)
+                window.append((item, self._submit(pool, number) if number else None))
+                if len(window) >= ahead:
+                    item, future = window.popleft()
+                    yield item, future.result() if future else None
+            while window:
+                item, future = window.popleft()
+                yield item, future.result() if future else None
+        finally:
+            # Consumer stopped early (--max): drop lookups not yet started
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def send_whatsapp(phone: str, message: str, base_url: str | None = None) -> bool:
+    """Send a WhatsApp message via the /send endpoint. Returns True on success.
+
+    Never retried: a timed-out send may still have been delivered.
+    """
+    try:
+        resp = get_client().post(
+            f"{base_url or lookup_url()}/send",
+            json={"phone": phone, "message": message},
+            timeout=SEND_TIMEOUT,
+        )
+        data = resp.json()
+    except (httpx.HTTPError, ValueError) as e:
+        log.warning("Send HTTP error for %s: %s", phone, e)
+        return False
+    if data.get("sent"):
+        log.info("Sent to %s", phone)
+        return True
+    log.warning("Send failed for %s: %s", phone, data.get("error", "unknown"))
+    return False
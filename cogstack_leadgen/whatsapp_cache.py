@@ -0,0 +1,86 @@
+# =============================================================
+# whatsapp_cache.py — Persistent cache of WhatsApp /lookup results
+# SQLite table of phone → (on WhatsApp?, profile name), shared by
+# gumtree_to_b2c.py and whatsapp_outreach.py through
+# whatsapp.WhatsAppLookup, so a number is asked about once per TTL
+# rather than once per run. "Not on WhatsApp" is cached too.
+# =============================================================
+# TTLs: a profile name is kept FOUND_TTL; "not on WhatsApp" or
+# "no name" only MISSING_TTL, since people join / set a name.
+# Service errors are never cached.
+# Default location: logs/whatsapp-lookups.sqlite
+# Reset: delete the file.
+# =============================================================
+
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+DEFAULT_PATH = Path(__file__).parent.parent / "logs" / "whatsapp-lookups.sqlite"
+
+FOUND_TTL = timedelta(days=30)
+MISSING_TTL = timedelta(days=7)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS whatsapp_lookups (
+    phone      TEXT PRIMARY KEY,
+    exists_    INTEGER NOT NULL,
+    name       TEXT,
+    checked_at TEXT NOT NULL
+);
+"""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class WhatsAppLookupCache:
+    """phone → (exists, name) with separate TTLs for found and missing names."""
+
+    def __init__(self, path: Path | str = DEFAULT_PATH,
+                 found_ttl: timedelta = FOUND_TTL, missing_ttl: timedelta = MISSING_TTL):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.found_ttl = found_ttl
+        self.missing_ttl = missing_ttl
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "WhatsAppLookupCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get(self, phone: str) -> tuple[bool, str | None] | None:
+        """(exists, name) if checked within its TTL, else None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT exists_, name, checked_at FROM whatsapp_lookups WHERE phone = ?", (phone,)
+            ).fetchone()
+        if row is None:
+            return None
+        exists, name, checked_at = row
+        ttl = self.found_ttl if name else self.missing_ttl
+        if _now() - datetime.fromisoformat(checked_at) > ttl:
+            return None
+        return bool(exists), name
+
+    def put(self, phone: str, exists: bool, name: str | None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO whatsapp_lookups (phone, exists_, name, checked_at) VALUES (?, ?, ?, ?)",
+                (phone, int(exists), name, _now().isoformat()),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM whatsapp_lookups").fetchone()[0]
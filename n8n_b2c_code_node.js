@@ -13,9 +13,38 @@ const NOTION_VERSION = '2022-06-28';
 const BASE_URL = 'https://api.notion.com/v1';
 const SEGMENT = 'B2C';
 
+// Notion allows ~3 requests/s: leads are processed CONCURRENCY at a time,
+// request starts are spaced MIN_INTERVAL_MS apart, 429s wait Retry-After,
+// 5xx / network errors are retried after RETRY_DELAYS_MS.
+const CONCURRENCY = 3;
+const MIN_INTERVAL_MS = 340;
+const RETRY_DELAYS_MS = [2000, 5000, 15000];
+const MAX_RATE_LIMIT_RETRIES = 5;
+
 // Capture `this` at the top level where it is valid in n8n Code nodes
 const helpers = this.helpers;
 
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Shared request pacing: each call reserves the next start slot
+let nextStartAt = 0;
+async function waitForSlot() {
+  const now = Date.now();
+  const start = Math.max(now, nextStartAt);
+  nextStartAt = start + MIN_INTERVAL_MS;
+  if (start > now) await sleep(start - now);
+}
+
+function errorStatus(e) {
+  return (e.response && e.response.status) || e.httpCode || e.statusCode;
+}
+
+function retryAfterMs(e) {
+  const headers = (e.response && e.response.headers) || {};
+  const seconds = parseFloat(headers['retry-after']);
+  return Number.isFinite(seconds) ? seconds * 1000 : 1000;
+}
+
 // Helper: Notion API call using n8n's built-in this.helpers.httpRequest()
 async function notionRequest(method, path, body) {
   const options = {
@@ -31,7 +60,40 @@ async function notionRequest(method, path, body) {
   if (body !== undefined) {
     options.body = body;
   }
-  return await helpers.httpRequest(options);
+  let failures = 0;
+  let rateLimited = 0;
+  while (true) {
+    await waitForSlot();
+    try {
+      return await helpers.httpRequest(options);
+    } catch (e) {
+      const status = Number(errorStatus(e));
+      if (status === 429 && rateLimited < MAX_RATE_LIMIT_RETRIES) {
+        rateLimited++;
+        const wait = retryAfterMs(e);
+        nextStartAt = Math.max(nextStartAt, Date.now() + wait); // pause every worker
+        continue;
+      }
+      const retryable = !status || status >= 500;
+      if (retryable && failures < RETRY_DELAYS_MS.length) {
+        await sleep(RETRY_DELAYS_MS[failures++]);
+        continue;
+      }
+      throw e;
+    }
+  }
+}
+
+// Run fn over items with at most `limit` in flight
+async function forEachConcurrent(items, limit, fn) {
+  let next = 0;
+  async function worker() {
+    while (next < items.length) {
+      const item = items[next++];
+      await fn(item);
+    }
+  }
+  await Promise.all(Array.from({ length: Math.min(limit, items.length) }, worker));
 }
 
 // Get the incoming data — n8n webhook delivers payload under .body
@@ -47,10 +109,17 @@ if (body.segment && body.segment !== SEGMENT) {
 
 const batchId = body.batch_id;
 const leads = body.leads;
+// The Python side already checked these leads against its local Notion mirror
+// (cogstack_leadgen/notion_mirror.py) — no per-lead dedup query needed
+const mirrorDeduped = body.dedup === 'mirror';
 let created = 0;
 let duplicates = 0;
 let errors = [];
 let batchPageId = null;
+// intent_source_urls already taken by a lead in this batch. Leads run CONCURRENCY at
+// a time, so two with the same URL could both miss the Notion query and both be
+// created; the first to claim a URL (synchronously, before any await) wins.
+const claimedUrls = new Set();
 
 // --- Step 1: Create B2C Batch Record ---
 try {
@@ -68,12 +137,19 @@ try {
   errors.push(`Batch creation error: ${e.message}`);
 }
 
-// --- Step 2: Process each B2C lead ---
-for (const lead of leads) {
+// --- Step 2: Process each B2C lead (CONCURRENCY at a time) ---
+await forEachConcurrent(leads, CONCURRENCY, async (lead) => {
   try {
     // B2C dedup: by intent_source_url only
     // Same post URL = same lead (duplicate). Same person posting again = new URL = new lead.
     if (lead.intent_source_url) {
+      if (claimedUrls.has(lead.intent_source_url)) {
+        duplicates++;
+        return;
+      }
+      claimedUrls.add(lead.intent_source_url);
+    }
+    if (lead.intent_source_url && !mirrorDeduped) {
       const searchData = await notionRequest('POST', `/databases/${B2C_LEADS_DB_ID}/query`, {
         filter: {
           property: 'Intent Source URL',
@@ -84,7 +160,7 @@ for (const lead of leads) {
 
       if (searchData.results && searchData.results.length > 0) {
         duplicates++;
-        continue;
+        return;
       }
     }
 
@@ -163,7 +239,7 @@ for (const lead of leads) {
   } catch (e) {
     errors.push(`Error processing ${lead.full_name}: ${e.message}`);
   }
-}
+});
 
 // --- Step 3: Update B2C batch record ---
 try {
@@ -191,6 +267,7 @@ return [{
     leads_found: leads.length,
     leads_created: created,
     duplicates_skipped: duplicates,
+    dedup: mirrorDeduped ? 'mirror' : 'query',
     errors: errors,
   }
 }];
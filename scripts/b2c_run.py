@@ -1,11 +1,25 @@
 #!/usr/bin/env python3
 # =============================================================
 # b2c_run.py — Unified B2C Pipeline Runner
-# Runs both B2C lead sources sequentially:
-#   1. Gumtree scrape → bridge (filter + LLM + WhatsApp → webhook)
+# Runs both B2C lead sources concurrently, one thread each:
+#   1. Gumtree scrape → classify (filter + LLM + WhatsApp) → webhook
 #   2. Hellopeter scrape → webhook
 #
-# Each pipeline is isolated: one failure doesn't block the other.
+# Each stage that succeeds is checkpointed under
+# logs/checkpoints/<run_id>/ (see cogstack_leadgen/dag.py).
+# --resume re-runs a run_id and skips every stage whose inputs are
+# unchanged, so a failed webhook POST is retried on its own.
+# Gumtree ads are marked handled in the seen index only once the
+# webhook has them, so a failed run doesn't lose them either.
+#
+# Each pipeline is isolated: one failure doesn't block the other,
+# and one still running after --pipeline-timeout is reported as
+# "timeout" while the other's result is kept. A timed-out pipeline
+# never POSTs: its webhook stage checks the deadline first and
+# fails (not checkpointed) instead, so --resume can send it.
+# Stages are imported and called in-process (scraped ads reach the
+# bridge as Python objects); --subprocess runs each one as its own
+# `uv run python` process instead.
 # Writes a structured JSON run log to logs/b2c-run-YYYY-MM-DD.json.
 # =============================================================
 # Usage:
@@ -15,43 +29,44 @@
 #   uv run python scripts/b2c_run.py --hellopeter-only   # skip Gumtree
 #   uv run python scripts/b2c_run.py --whatsapp          # enable WhatsApp name lookup
 #   uv run python scripts/b2c_run.py --whatsapp --whatsapp-url http://127.0.0.1:3457
+#   uv run python scripts/b2c_run.py --subprocess        # one process per stage
+#   uv run python scripts/b2c_run.py --sequential        # Gumtree, then Hellopeter
+#   uv run python scripts/b2c_run.py --pipeline-timeout 900
+#   uv run python scripts/b2c_run.py --resume            # retry the latest run's failed stages
+#   uv run python scripts/b2c_run.py --resume B2C-RUN-2026-03-29-040000
 # =============================================================
 # Cron example (twice daily at 06:00 + 18:00 SAST = 04:00 + 16:00 UTC):
 #   0 4,16 * * * cd /opt/projects/cartrack-leadgen && uv run python scripts/b2c_run.py --whatsapp >> logs/cron-b2c.log 2>&1
 # =============================================================
 
 import argparse
+import importlib
 import json
 import logging
+import queue
 import subprocess
 import sys
+import threading
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cogstack_leadgen.dag import CHECKPOINT_DIR, Dag, Stage, latest_run
+from cogstack_leadgen.lead_io import read_leads
+from cogstack_leadgen.logs import setup_logging as _setup_logging
+from cogstack_leadgen.seen_index import SeenIndex
+from cogstack_leadgen.webhook import post_new_leads
+
 # ── Logging ──────────────────────────────────────────────────
 
 log = logging.getLogger("b2c_run")
 
 
 def setup_logging() -> None:
-    """Configure console + file logging."""
-    log.setLevel(logging.DEBUG)
-
-    console = logging.StreamHandler(sys.stderr)
-    console.setLevel(logging.INFO)
-    console.setFormatter(logging.Formatter(
-        "%(asctime)s [%(name)s] %(levelname)s: %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    ))
-    log.addHandler(console)
-
-    log_dir = Path(__file__).parent.parent / "logs"
-    log_dir.mkdir(exist_ok=True)
-    today = datetime.now().strftime("%Y-%m-%d")
-    fh = logging.FileHandler(log_dir / f"b2c-run-{today}.log", encoding="utf-8")
-    fh.setLevel(logging.DEBUG)
-    fh.setFormatter(logging.Formatter("%(asctime)s [%(name)s] %(levelname)s: %(message)s"))
-    log.addHandler(fh)
+    """Configure console + file logging (logs/b2c-run-YYYY-MM-DD.log)."""
+    _setup_logging(log, "b2c-run", timestamps=True)
 
 
 # ── Constants ─────────────────────────────────────────────────
@@ -60,11 +75,20 @@ PROJECT_ROOT = Path(__file__).parent.parent
 GUMTREE_SCRAPER = "scripts/gumtree_scrapling.py"
 GUMTREE_BRIDGE  = "scripts/gumtree_to_b2c.py"
 HELLOPETER      = "scripts/hellopeter_scraper.py"
+STEP_TIMEOUT    = 600  # 10 min hard limit per subprocess step
+PIPELINE_TIMEOUT = 1200  # default wall-clock budget per pipeline (both Gumtree steps)
 
 
 # ── Pipeline runners ──────────────────────────────────────────
 
-def _run_subprocess(cmd: list[str], label: str) -> tuple[bool, dict]:
+def _step_timeout(deadline: float | None) -> float:
+    """STEP_TIMEOUT, cut short by what is left of the pipeline's deadline."""
+    if deadline is None:
+        return STEP_TIMEOUT
+    return max(1.0, min(STEP_TIMEOUT, deadline - time.monotonic()))
+
+
+def _run_subprocess(cmd: list[str], label: str, timeout: float = STEP_TIMEOUT) -> tuple[bool, dict]:
     """Run a subprocess, capture stdout (JSON result) + stderr (logs).
 
     Returns (success, result_dict).
@@ -76,7 +100,7 @@ def _run_subprocess(cmd: list[str], label: str) -> tuple[bool, dict]:
             cwd=str(PROJECT_ROOT),
             capture_output=True,
             text=True,
-            timeout=600,  # 10 min hard limit per step
+            timeout=timeout,
         )
         # Log stderr (the script's own progress output) at DEBUG
         for line in proc.stderr.strip().splitlines():
@@ -85,7 +109,11 @@ def _run_subprocess(cmd: list[str], label: str) -> tuple[bool, dict]:
         if proc.returncode != 0:
             log.error("[%s] Process exited with code %d", label, proc.returncode)
             log.error("[%s] stderr tail: %s", label, proc.stderr[-500:])
-            return False, {"error": f"exit code {proc.returncode}", "stderr_tail": proc.stderr[-200:]}
+            try:
+                # Stages report their own failure reason as JSON before exiting 1
+                return False, json.loads(proc.stdout.strip())
+            except json.JSONDecodeError:
+                return False, {"error": f"exit code {proc.returncode}", "stderr_tail": proc.stderr[-200:]}
 
         # Parse stdout as JSON (all our scripts emit JSON to stdout)
         stdout = proc.stdout.strip()
@@ -101,81 +129,267 @@ def _run_subprocess(cmd: list[str], label: str) -> tuple[bool, dict]:
             return True, {"raw_stdout": stdout[:200]}
 
     except subprocess.TimeoutExpired:
-        log.error("[%s] Timed out after 600s", label)
+        log.error("[%s] Timed out after %ds", label, timeout)
         return False, {"error": "subprocess timeout"}
     except Exception as e:
         log.error("[%s] Unexpected error: %s", label, e)
         return False, {"error": str(e)}
 
 
+def _run_in_process(module: str, argv: list[str], label: str, **kwargs) -> tuple[bool, dict]:
+    """Import a stage script and call its run() in this process.
+
+    argv is parsed by the script's own parse_args, so both modes share one
+    flag list; kwargs go to run() (in-memory leads). Same (success,
+    result_dict) contract as _run_subprocess.
+    """
+    log.info("[%s] Running in-process: %s %s", label, module, " ".join(argv))
+    try:
+        stage = importlib.import_module(module)
+        if hasattr(stage, "setup_logging"):
+            stage.setup_logging()
+        result = stage.run(stage.parse_args(argv), **kwargs)
+    except Exception as e:
+        log.exception("[%s] Unexpected error: %s", label, e)
+        return False, {"error": str(e)}
+    return result.get("ok", True), result
+
+
+def _post_leads(
+    source: str, leads_path: str | None, dry_run: bool, deadline: float | None = None, mark_seen: bool = False,
+) -> dict:
+    """
+    Webhook stage: POST a lead file written by an earlier stage as one B2C batch.
+    Past the pipeline's deadline (time.monotonic) nothing is POSTed: run_pipelines
+    has already reported the pipeline as timed out, and an in-process thread
+    can't be stopped, so the stage fails here instead. mark_seen: once the
+    webhook has the batch, mark its ads handled in the Gumtree seen index.
+    """
+    leads = read_leads(leads_path) if leads_path else []
+    batch_id = f"B2C-BATCH-{datetime.now().strftime('%Y-%m-%d')}-{source.upper()}-001"
+    if not leads:
+        log.info("[%s-webhook] No leads to POST", source)
+        return {"ok": True, "count": 0, "posted": False}
+    if dry_run:
+        log.info("[%s-webhook] --dry-run: %d leads would be POSTed as %s (skipped)", source, len(leads), batch_id)
+        return {"ok": True, "count": len(leads), "posted": False, "dry_run": True}
+    if deadline is not None and time.monotonic() >= deadline:
+        log.error("[%s-webhook] Pipeline deadline passed — %d leads not POSTed; re-run with --resume", source, len(leads))
+        return {"ok": False, "count": len(leads), "posted": False, "batch_id": batch_id, "error": "pipeline timed out"}
+
+    log.info("[%s-webhook] POSTing %d leads as batch %s", source, len(leads), batch_id)
+    result = post_new_leads(leads, batch_id, source)
+    if result is None:
+        log.error("[%s-webhook] Webhook POST failed — re-run with --resume to retry", source)
+        return {"ok": False, "count": len(leads), "posted": False, "batch_id": batch_id, "error": "webhook POST failed"}
+    if mark_seen:
+        with SeenIndex() as seen:
+            seen.mark_handled(lead.get("intent_source_url") for lead in leads)
+    if result["response"] is not None:
+        log.info("[%s-webhook] Webhook result: %s", source, json.dumps(result["response"]))
+    return {
+        "ok": True, "count": len(leads), "posted": result["posted"] > 0, "batch_id": batch_id,
+        "new": result["posted"], "already_posted": result["skipped"],
+        "already_in_notion": result["in_notion"], "webhook_response": result["response"],
+    }
+
+
+def _pipeline_status(stages: dict[str, dict], labels: dict[str, str]) -> str:
+    """"ok", or "<label>_failed" for the first stage that didn't succeed."""
+    for name, stage in stages.items():
+        if stage["status"] not in ("ok", "cached"):
+            return f"{labels[name]}_failed"
+    return "ok"
+
+
 def run_gumtree(
+    run_id: str,
     dry_run: bool = False,
     whatsapp: bool = False,
     whatsapp_url: str | None = None,
     max_ads: int = 20,
+    in_process: bool = True,
+    deadline: float | None = None,
 ) -> dict:
-    """Run the full Gumtree pipeline: scrape → bridge."""
-    result = {"pipeline": "gumtree", "started_at": datetime.now(timezone.utc).isoformat()}
-
-    # ── Step 1: Scrape ──
-    scrape_cmd = ["uv", "run", "python", GUMTREE_SCRAPER, "--max", str(max_ads)]
-    ok, scrape_result = _run_subprocess(scrape_cmd, "gumtree-scraper")
-    result["scrape"] = scrape_result
-
-    if not ok:
-        log.error("[gumtree] Scrape step failed — aborting Gumtree pipeline")
-        result["status"] = "scrape_failed"
-        result["finished_at"] = datetime.now(timezone.utc).isoformat()
-        return result
-
-    out_file = scrape_result.get("out", "")
-    log.info("[gumtree] Scraped %d ads → %s", scrape_result.get("count", "?"), out_file)
+    """Run the Gumtree pipeline: scrape → classify → webhook.
 
-    # ── Step 2: Bridge ──
-    bridge_cmd = ["uv", "run", "python", GUMTREE_BRIDGE]
-    if out_file:
-        bridge_cmd += ["--input", out_file]
-    if dry_run:
-        bridge_cmd.append("--dry-run")
-    if whatsapp:
-        bridge_cmd.append("--whatsapp")
-    if whatsapp_url:
-        bridge_cmd += ["--whatsapp-url", whatsapp_url]
-
-    ok, bridge_result = _run_subprocess(bridge_cmd, "gumtree-bridge")
-    result["bridge"] = bridge_result
-    result["status"] = "ok" if ok else "bridge_failed"
+    In-process, the scraped ads go straight to the bridge as Python objects;
+    the NDJSON file is still written and is what --subprocess mode and a
+    resumed classify stage read. deadline (time.monotonic) caps each
+    subprocess step's timeout; once it has passed the webhook stage
+    doesn't POST.
+    """
+    result = {"pipeline": "gumtree", "started_at": datetime.now(timezone.utc).isoformat()}
+    handoff: dict = {}  # in-process scrape → classify
+
+    def scrape(_inputs: dict) -> dict:
+        # --ndjson: leads stream to disk as they're parsed and stdout stays a small summary
+        argv = ["--max", str(max_ads), "--ndjson"]
+        if in_process:
+            ok, scrape_result = _run_in_process("gumtree_scrapling", argv, "gumtree-scraper", keep_leads=True)
+            handoff["ads"] = scrape_result.pop("leads", None)
+        else:
+            ok, scrape_result = _run_subprocess(
+                ["uv", "run", "python", GUMTREE_SCRAPER, *argv], "gumtree-scraper", _step_timeout(deadline)
+            )
+        if ok:
+            log.info("[gumtree] Scraped %s ads → %s", scrape_result.get("count", "?"), scrape_result.get("out", ""))
+        return {**scrape_result, "ok": ok}
+
+    def classify(inputs: dict) -> dict:
+        argv = ["--no-post", "--out", str(CHECKPOINT_DIR / run_id / "gumtree-qualified.json")]
+        if inputs["gumtree-scrape"].get("out"):
+            argv += ["--input", inputs["gumtree-scrape"]["out"]]
+        if dry_run:
+            argv.append("--dry-run")
+        if whatsapp:
+            argv.append("--whatsapp")
+        if whatsapp_url:
+            argv += ["--whatsapp-url", whatsapp_url]
+
+        if in_process:
+            ok, bridge_result = _run_in_process("gumtree_to_b2c", argv, "gumtree-bridge", ads=handoff.pop("ads", None))
+        else:
+            ok, bridge_result = _run_subprocess(
+                ["uv", "run", "python", GUMTREE_BRIDGE, *argv], "gumtree-bridge", _step_timeout(deadline)
+            )
+        log.info("[gumtree] Classified: %s qualified", bridge_result.get("qualified", "?"))
+        return {**bridge_result, "ok": ok}
+
+    stages = Dag([
+        Stage("gumtree-scrape", scrape, params={"max_ads": max_ads}, artifacts=("out",)),
+        Stage(
+            "gumtree-classify", classify, deps=("gumtree-scrape",),
+            params={"dry_run": dry_run, "whatsapp": whatsapp, "whatsapp_url": whatsapp_url},
+            artifacts=("out",),
+        ),
+        Stage(
+            "gumtree-webhook",
+            lambda inputs: _post_leads(
+                "gumtree", inputs["gumtree-classify"].get("out"), dry_run, deadline, mark_seen=True,
+            ),
+            deps=("gumtree-classify",), params={"dry_run": dry_run},
+        ),
+    ], run_id).run()
+
+    result["stages"] = {name: stage["status"] for name, stage in stages.items()}
+    result["scrape"] = stages["gumtree-scrape"].get("result", {})
+    result["bridge"] = stages["gumtree-classify"].get("result", {})
+    result["webhook"] = stages["gumtree-webhook"].get("result", {})
+    result["status"] = _pipeline_status(
+        stages, {"gumtree-scrape": "scrape", "gumtree-classify": "bridge", "gumtree-webhook": "webhook"}
+    )
     result["finished_at"] = datetime.now(timezone.utc).isoformat()
 
     log.info(
-        "[gumtree] Bridge done: %d qualified, posted=%s",
-        bridge_result.get("qualified", "?"),
-        bridge_result.get("posted", False),
+        "[gumtree] Done: %s qualified, posted=%s, status=%s",
+        result["bridge"].get("qualified", "?"), result["webhook"].get("posted", False), result["status"],
     )
     return result
 
 
 def run_hellopeter(
+    run_id: str,
     dry_run: bool = False,
     max_leads: int = 50,
     days: int = 90,
+    in_process: bool = True,
+    deadline: float | None = None,
 ) -> dict:
-    """Run the full Hellopeter pipeline: scrape → webhook."""
+    """Run the Hellopeter pipeline: scrape → webhook (no POST once deadline has passed)."""
     result = {"pipeline": "hellopeter", "started_at": datetime.now(timezone.utc).isoformat()}
 
-    cmd = ["uv", "run", "python", HELLOPETER, "--max", str(max_leads), "--days", str(days)]
-    if not dry_run:
-        cmd.append("--post")
-
-    ok, run_result = _run_subprocess(cmd, "hellopeter")
-    result["run"] = run_result
-    result["status"] = "ok" if ok else "failed"
+    def scrape(_inputs: dict) -> dict:
+        # --incremental: only pages newer than the last sync are fetched; the window is scored from the review store
+        argv = ["--max", str(max_leads), "--days", str(days), "--ndjson", "--incremental"]
+        if in_process:
+            ok, run_result = _run_in_process("hellopeter_scraper", argv, "hellopeter")
+        else:
+            ok, run_result = _run_subprocess(
+                ["uv", "run", "python", HELLOPETER, *argv], "hellopeter", _step_timeout(deadline)
+            )
+        return {**run_result, "ok": ok}
+
+    stages = Dag([
+        Stage("hellopeter-scrape", scrape, params={"max_leads": max_leads, "days": days}, artifacts=("out",)),
+        Stage(
+            "hellopeter-webhook",
+            lambda inputs: _post_leads("hellopeter", inputs["hellopeter-scrape"].get("out"), dry_run, deadline),
+            deps=("hellopeter-scrape",), params={"dry_run": dry_run},
+        ),
+    ], run_id).run()
+
+    result["stages"] = {name: stage["status"] for name, stage in stages.items()}
+    result["run"] = stages["hellopeter-scrape"].get("result", {})
+    result["webhook"] = stages["hellopeter-webhook"].get("result", {})
+    result["status"] = _pipeline_status(stages, {"hellopeter-scrape": "scrape", "hellopeter-webhook": "webhook"})
     result["finished_at"] = datetime.now(timezone.utc).isoformat()
 
-    log.info("[hellopeter] Done: %d leads, status=%s", run_result.get("count", "?"), result["status"])
+    log.info("[hellopeter] Done: %s leads, status=%s", result["run"].get("count", "?"), result["status"])
     return result
 
 
+def run_pipelines(pipelines: dict, timeout: float, parallel: bool = True) -> dict[str, dict]:
+    """
+    Run each pipeline — name → fn(deadline) returning its result dict — in
+    its own thread and collect the results as they finish.
+    parallel=False starts the next pipeline only when the previous one is done.
+
+    A pipeline still running `timeout` seconds after it started is reported
+    with status "timeout" and the run moves on. Subprocess steps are killed
+    by their own deadline-capped timeout; an in-process stage can't be
+    interrupted, so its (daemon) thread is abandoned and its late result
+    dropped. fn gets the deadline so its webhook stage can skip the POST
+    once it has passed — a timed-out pipeline sends nothing.
+    """
+    done: queue.Queue = queue.Queue()
+    results: dict[str, dict] = {}
+    running: dict[str, tuple[float, float]] = {}  # name → (started, deadline)
+    pending = list(pipelines.items())
+
+    def worker(name: str, fn, deadline: float) -> None:
+        try:
+            result = fn(deadline)
+        except Exception as e:
+            log.exception("[%s] Pipeline crashed: %s", name, e)
+            result = {"pipeline": name, "status": "crashed", "error": str(e)}
+        done.put((name, result))
+
+    while pending or running:
+        while pending and (parallel or not running):
+            name, fn = pending.pop(0)
+            started = time.monotonic()
+            running[name] = (started, started + timeout)
+            threading.Thread(
+                target=worker, args=(name, fn, started + timeout), name=f"pipeline-{name}", daemon=True
+            ).start()
+
+        wait = max(0.0, min(deadline for _, deadline in running.values()) - time.monotonic())
+        try:
+            name, result = done.get(timeout=wait)
+        except queue.Empty:
+            now = time.monotonic()
+            for name, (started, deadline) in list(running.items()):
+                if deadline <= now:
+                    log.error("[%s] Pipeline timed out after %gs", name, timeout)
+                    results[name] = {
+                        "pipeline": name,
+                        "status": "timeout",
+                        "error": f"no result after {timeout:g}s",
+                        "duration_s": round(now - started, 1),
+                    }
+                    del running[name]
+            continue
+
+        if name not in running:
+            continue  # finished after its timeout was already reported
+        started, _ = running.pop(name)
+        result["duration_s"] = round(time.monotonic() - started, 1)
+        results[name] = result
+
+    return {name: results[name] for name in pipelines}
+
+
 # ── CLI ───────────────────────────────────────────────────────
 
 def parse_args() -> argparse.Namespace:
@@ -190,6 +404,22 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--max-ads", type=int, default=20, help="Max Gumtree ads to scrape (default: 20)")
     parser.add_argument("--max-leads", type=int, default=50, help="Max Hellopeter leads to collect (default: 50)")
     parser.add_argument("--days", type=int, default=90, help="Hellopeter: reviews from last N days (default: 90)")
+    parser.add_argument(
+        "--pipeline-timeout", type=float, default=PIPELINE_TIMEOUT,
+        help=f"Seconds before a pipeline is reported as timed out (default: {PIPELINE_TIMEOUT})",
+    )
+    parser.add_argument(
+        "--sequential", action="store_true",
+        help="Run Gumtree then Hellopeter instead of both at once",
+    )
+    parser.add_argument(
+        "--resume", nargs="?", const="latest", default=None, metavar="RUN_ID",
+        help="Re-run a checkpointed run (default: the latest), skipping stages whose inputs are unchanged",
+    )
+    parser.add_argument(
+        "--subprocess", action="store_true",
+        help="Run each stage as a separate `uv run python` process instead of importing it (isolation fallback)",
+    )
     return parser.parse_args()
 
 
@@ -200,8 +430,16 @@ def main() -> None:
     args = parse_args()
 
     run_id = f"B2C-RUN-{datetime.now().strftime('%Y-%m-%d-%H%M%S')}"
+    if args.resume:
+        resume_id = latest_run() if args.resume == "latest" else args.resume
+        if resume_id is None or not (CHECKPOINT_DIR / resume_id).is_dir():
+            log.error("No checkpoints to resume under %s", CHECKPOINT_DIR / (resume_id or ""))
+            print(json.dumps({"ok": False, "error": f"no checkpoints for {args.resume}"}))
+            sys.exit(1)
+        run_id = resume_id
+
     log.info("=" * 60)
-    log.info("B2C Pipeline Run: %s", run_id)
+    log.info("B2C Pipeline Run: %s%s", run_id, " (resumed)" if args.resume else "")
     if args.dry_run:
         log.info("DRY RUN — no data will be POSTed to webhook")
     log.info("=" * 60)
@@ -210,41 +448,50 @@ def main() -> None:
         "run_id": run_id,
         "started_at": datetime.now(timezone.utc).isoformat(),
         "dry_run": args.dry_run,
+        "resumed": bool(args.resume),
+        "mode": "subprocess" if args.subprocess else "in-process",
+        "parallel": not args.sequential,
+        "pipeline_timeout_s": args.pipeline_timeout,
         "pipelines": {},
     }
 
-    any_success = False
-
-    # ── Gumtree pipeline ──
+    pipelines: dict = {}
     if not args.hellopeter_only:
-        log.info("")
-        log.info("── Gumtree Pipeline ─────────────────────────────────")
-        gumtree_result = run_gumtree(
+        pipelines["gumtree"] = lambda deadline: run_gumtree(
+            run_id,
             dry_run=args.dry_run,
             whatsapp=args.whatsapp,
             whatsapp_url=args.whatsapp_url,
             max_ads=args.max_ads,
+            in_process=not args.subprocess,
+            deadline=deadline,
         )
-        summary["pipelines"]["gumtree"] = gumtree_result
-        if gumtree_result.get("status") == "ok":
-            any_success = True
-        else:
-            log.warning("Gumtree pipeline finished with status: %s", gumtree_result.get("status"))
-
-    # ── Hellopeter pipeline ──
     if not args.gumtree_only:
-        log.info("")
-        log.info("── Hellopeter Pipeline ──────────────────────────────")
-        hellopeter_result = run_hellopeter(
+        pipelines["hellopeter"] = lambda deadline: run_hellopeter(
+            run_id,
             dry_run=args.dry_run,
             max_leads=args.max_leads,
             days=args.days,
+            in_process=not args.subprocess,
+            deadline=deadline,
         )
-        summary["pipelines"]["hellopeter"] = hellopeter_result
-        if hellopeter_result.get("status") == "ok":
+
+    log.info("")
+    log.info(
+        "── Pipelines: %s (%s, timeout %.0fs) ──",
+        ", ".join(pipelines), "sequential" if args.sequential else "parallel", args.pipeline_timeout,
+    )
+    started = time.monotonic()
+    results = run_pipelines(pipelines, timeout=args.pipeline_timeout, parallel=not args.sequential)
+    summary["duration_s"] = round(time.monotonic() - started, 1)
+
+    any_success = False
+    for name, result in results.items():
+        summary["pipelines"][name] = result
+        if result.get("status") == "ok":
             any_success = True
         else:
-            log.warning("Hellopeter pipeline finished with status: %s", hellopeter_result.get("status"))
+            log.warning("%s pipeline finished with status: %s", name.capitalize(), result.get("status"))
 
     # ── Summary ──
     summary["finished_at"] = datetime.now(timezone.utc).isoformat()
@@ -252,7 +499,7 @@ def main() -> None:
 
     log.info("")
     log.info("=" * 60)
-    log.info("Run complete: %s | overall=%s", run_id, summary["overall_status"])
+    log.info("Run complete: %s | overall=%s | %.0fs", run_id, summary["overall_status"], summary["duration_s"])
     log.info("=" * 60)
 
     # Write JSON run log
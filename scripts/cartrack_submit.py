@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 # =============================================================
 # cartrack_submit.py — Submit Yes / No-Reply leads to Cartrack CRM
-# Reads outreach-state.json, finds leads with status 'yes' or
-# 'no_reply' (after 7 days), and POSTs them to the Cartrack
-# JSON-RPC endpoint.
+# Reads the outreach store (logs/outreach-state.sqlite), finds
+# leads with status 'yes' or 'no_reply' (after 7 days), and POSTs
+# them to the Cartrack JSON-RPC endpoint.
 # =============================================================
 # Usage:
 #   uv run python scripts/cartrack_submit.py --dry-run   # preview, no POST
@@ -19,9 +19,16 @@ import time
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
 
-import httpx
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cogstack_leadgen.http import request_with_retry
+from cogstack_leadgen.identity import SUBMITTED, IdentityIndex, lead_keys
+from cogstack_leadgen.logs import setup_logging as _setup_logging
+from cogstack_leadgen.phone import to_local_phone
+from cogstack_leadgen.state import OutreachStore
+
 load_dotenv()
 
 # ── Logging ──────────────────────────────────────────────────
@@ -30,22 +37,7 @@ log = logging.getLogger("cartrack_submit")
 
 
 def setup_logging() -> None:
-    log.setLevel(logging.DEBUG)
-    console = logging.StreamHandler(sys.stderr)
-    console.setLevel(logging.INFO)
-    console.setFormatter(logging.Formatter(
-        "%(asctime)s [%(name)s] %(levelname)s: %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    ))
-    log.addHandler(console)
-
-    log_dir = Path(__file__).parent.parent / "logs"
-    log_dir.mkdir(exist_ok=True)
-    today = datetime.now().strftime("%Y-%m-%d")
-    fh = logging.FileHandler(log_dir / f"cartrack-submit-{today}.log", encoding="utf-8")
-    fh.setLevel(logging.DEBUG)
-    fh.setFormatter(logging.Formatter("%(asctime)s [%(name)s] %(levelname)s: %(message)s"))
-    log.addHandler(fh)
+    _setup_logging(log, "cartrack-submit", timestamps=True)
 
 
 # ── Constants ─────────────────────────────────────────────────
@@ -59,18 +51,6 @@ EXTERNAL_SOURCE_ID = "10001"
 
 NO_REPLY_DAYS = 7  # submit no-reply leads after 7 days
 
-PROJECT_ROOT = Path(__file__).parent.parent
-STATE_FILE = PROJECT_ROOT / "logs" / "outreach-state.json"
-
-
-# ── Phone format ──────────────────────────────────────────────
-
-def to_local_phone(phone: str) -> str:
-    """Convert +27XXXXXXXXX → 0XXXXXXXXX for Cartrack payload."""
-    if phone.startswith("+27"):
-        return "0" + phone[3:]
-    return phone
-
 
 # ── Payload builder ───────────────────────────────────────────
 
@@ -121,42 +101,18 @@ def build_payload(lead: dict) -> dict:
 
 def submit_lead(payload: dict) -> bool:
     """POST a single lead to Cartrack CRM. Returns True on success."""
-    for attempt in range(3):
-        try:
-            resp = httpx.post(
-                CARTRACK_URL,
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=30.0,
-            )
-            log.debug("Cartrack response %d: %s", resp.status_code, resp.text[:200])
-            if resp.status_code == 200:
-                log.info("✅ Submitted %s (%s)", payload["name"], payload["phone"])
-                return True
-            if resp.status_code >= 500:
-                time.sleep([2, 5, 15][attempt])
-                continue
-            log.error("Cartrack error %d: %s", resp.status_code, resp.text[:300])
-            return False
-        except (httpx.HTTPError, httpx.TimeoutException) as e:
-            log.warning("Request failed: %s, retrying...", e)
-            time.sleep([2, 5, 15][attempt])
-    log.error("Failed after 3 retries for %s", payload["phone"])
+    resp = request_with_retry("POST", CARTRACK_URL, label="Cartrack", json=payload, timeout=30.0)
+    if resp is None:
+        log.error("Giving up on %s", payload["phone"])
+        return False
+    log.debug("Cartrack response %d: %s", resp.status_code, resp.text[:200])
+    if resp.status_code == 200:
+        log.info("✅ Submitted %s (%s)", payload["name"], payload["phone"])
+        return True
+    log.error("Cartrack error %d: %s", resp.status_code, resp.text[:300])
     return False
 
 
-# ── State helpers ─────────────────────────────────────────────
-
-def load_state() -> list[dict]:
-    if STATE_FILE.exists():
-        return json.loads(STATE_FILE.read_text())
-    return []
-
-
-def save_state(state: list[dict]) -> None:
-    STATE_FILE.write_text(json.dumps(state, indent=2))
-
-
 # ── CLI ───────────────────────────────────────────────────────
 
 def parse_args() -> argparse.Namespace:
@@ -172,19 +128,16 @@ def main():
     setup_logging()
     args = parse_args()
 
-    state = load_state()
-    if not state:
-        log.error("No state file found at %s", STATE_FILE)
+    store = OutreachStore()
+    if not len(store):
+        log.error("No outreach state in %s", store.path)
         sys.exit(1)
 
     now = datetime.now(timezone.utc)
     cutoff = now - timedelta(days=NO_REPLY_DAYS)
 
     to_submit = []
-    for entry in state:
-        if entry.get("cartrack_submitted"):
-            continue
-
+    for entry in store.by_status("yes", "no_reply", cartrack_submitted=False):
         status = entry.get("status", "")
 
         if status == "yes":
@@ -209,12 +162,27 @@ def main():
 
     if not to_submit:
         log.info("Nothing to submit.")
+        store.close()
         print(json.dumps({"ok": True, "submitted": 0}))
         return
 
-    submitted, errors = 0, 0
+    submitted, errors, duplicates = 0, 0, 0
+    identities = IdentityIndex()
 
     for entry in to_submit:
+        # Same person already submitted under another state entry (other phone / email)
+        identity = identities.resolve(lead_keys(entry, "outreach"), "outreach")
+        if identities.done(identity, SUBMITTED):
+            log.info("%s already submitted to Cartrack — skipping", entry["phone"])
+            duplicates += 1
+            if not args.dry_run:
+                store.update(
+                    entry["phone"],
+                    cartrack_submitted=True,
+                    cartrack_submitted_at=identities.detail(identity, SUBMITTED) or now.isoformat(),
+                )
+            continue
+
         payload = build_payload(entry)
 
         if args.dry_run:
@@ -225,16 +193,20 @@ def main():
 
         ok = submit_lead(payload)
         if ok:
-            entry["cartrack_submitted"] = True
-            entry["cartrack_submitted_at"] = now.isoformat()
-            save_state(state)
+            identities.record(identity, SUBMITTED, now.isoformat())
+            store.update(entry["phone"], cartrack_submitted=True, cartrack_submitted_at=now.isoformat())
             submitted += 1
         else:
             errors += 1
 
         time.sleep(1)  # brief pause between submissions
 
-    print(json.dumps({"ok": errors == 0, "submitted": submitted, "errors": errors, "dry_run": args.dry_run}))
+    identities.close()
+    store.close()
+    print(json.dumps({
+        "ok": errors == 0, "submitted": submitted, "errors": errors,
+        "duplicates": duplicates, "dry_run": args.dry_run,
+    }))
 
 
 if __name__ == "__main__":
@@ -11,6 +11,10 @@
 # Usage:
 #   uv run python scripts/gumtree_scrapling.py
 #   uv run python scripts/gumtree_scrapling.py --max 20 --out /tmp/gumtree.json
+#   uv run python scripts/gumtree_scrapling.py --max 200 --concurrency 2 --min-interval 0.3   # faster than the default, explicitly
+#   uv run python scripts/gumtree_scrapling.py --no-seen      # ignore the cross-run seen index
+#   uv run python scripts/gumtree_scrapling.py --offline --no-seen   # replay from the HTTP cache
+#   uv run python scripts/gumtree_scrapling.py --max 500 --ndjson    # stream leads, one per line
 #
 # Requires:
 #   uv pip install "scrapling[fetchers]>=0.4.2"
@@ -21,297 +25,323 @@
 
 import argparse
 import json
-import random
-import re
+import queue
 import sys
-import time
-from datetime import datetime, timezone
+import threading
+from datetime import datetime
 from pathlib import Path
-
-# Gumtree-owned numbers injected site-wide (WhatsApp button, support links).
-# These appear in the rendered DOM on every ad page — not seller phones.
-_GUMTREE_NUMBERS = {"+27756035177", "27756035177", "0870220222", "+27870220222"}
+from urllib.parse import urlparse
 
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cogstack_leadgen.gumtree import (
+    SEARCH_URLS,
+    _is_block_text,
+    extract_ad_links,
+    is_blocked,
+    parse_ad_page,
+)
+from cogstack_leadgen.host_budget import HostBudget
+from cogstack_leadgen.http_cache import DEFAULT_DIR as HTTP_CACHE_DIR, HttpCache
+from cogstack_leadgen.lead_io import NdjsonWriter
+from cogstack_leadgen.seen_index import DEFAULT_PATH as SEEN_INDEX_PATH, SeenIndex
+
 load_dotenv()
 
 # ── Constants ─────────────────────────────────────────────────
 
-# NOTE: Gumtree removed the "Wanted Ads" top-level category (c9110) in 2025/2026.
-# All /s-wanted-ads/... paths now 301-redirect to /s-all-the-ads/v1b0p1 (losing the keyword).
-# Use buyer-intent keyword phrases (?q=) to surface people looking to BUY a tracker.
-# Category-level blocklist in extract_ad_links() further filters seller/job/car ads by URL.
-SEARCH_URLS = [
-    # Direct buyer-intent queries
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=need+car+tracker",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=want+car+tracker",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=car+tracker+wanted",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=looking+for+tracker",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=gps+tracker+needed",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=vehicle+tracker+wanted",
-    # Theft/crime-related — people who just experienced theft are hot tracker prospects
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=car+stolen+tracker",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=vehicle+stolen+need+tracker",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=hijacked+car+tracker",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=car+break+in+tracker",
-    # Vehicle security / anti-theft — adjacent intent
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=vehicle+security+tracking",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=car+theft+prevention+tracker",
-    # Installation / service requests — people seeking tracker installation
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=tracker+installation+wanted",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=install+car+tracker",
-]
-
-# Gumtree URL path segments that NEVER contain tracker buyer-intent ads.
-# Keep this list NARROW — the bridge script (gumtree_to_b2c.py) handles
-# buyer vs seller classification via LLM. Only block categories where
-# a tracker buyer ad is structurally impossible.
-# Rule: any URL segment containing "-jobs/" is a job ad — blocked in extract_ad_links().
-_BLOCKED_CATEGORIES = [
-    # Vehicles for sale (sellers listing cars/trucks, not tracker buyers)
-    "/a-cars-bakkies/",
-    "/a-heavy-trucks-buses/",
-    # Pets (pet trackers, not vehicle trackers)
-    "/a-other-pets/",
-    # Property / removals (never tracker-related)
-    "/a-removals-storage/",
-    "/a-property-",
-    # Wearables (smart rings, fitness bands — not vehicle trackers)
-    "/a-wearable-technology/",
-]
-
-BLOCK_SIGNALS = ["The request is blocked", "Access Denied", "cf-challenge"]
-
-PHONE_RE = re.compile(r"(?:\+27|27|0)[6-8]\d[\s\-]?\d{3}[\s\-]?\d{4}")
-
-GUMTREE_BASE = "https://www.gumtree.co.za"
-
-
-# ── Helpers ───────────────────────────────────────────────────
-
-def extract_phone(text: str | None) -> str | None:
-    """Extract and normalise a SA phone number from text."""
-    if not text:
-        return None
-    match = PHONE_RE.search(text)
-    if not match:
-        return None
-    # Normalise: strip spaces and dashes
-    number = re.sub(r"[\s\-]", "", match.group(0))
-    # Ensure +27 prefix
-    if number.startswith("0"):
-        number = "+27" + number[1:]
-    elif number.startswith("27"):
-        number = "+" + number
-    return number
+# Default politeness budget: one page at a time with a 0.5–1.2s gap after
+# each one finishes — the rate of the original serial scraper. Gumtree
+# already blocks scrapers; raise these only explicitly (--concurrency,
+# --min-interval, --jitter).
+FETCH_CONCURRENCY = 1
+FETCH_MIN_INTERVAL = 0.5
+FETCH_JITTER = 0.7
 
+# Listing pages are few and cheap to parse — two discovery threads keep
+# the ad queue full without hogging the per-host budget.
+LISTING_WORKERS = 2
 
-def extract_ad_links(page) -> list[str]:
-    """
-    Extract individual ad URLs from a Gumtree listing page.
-    Accept:  URLs with /a- pattern (individual ads)
-    Reject:  /s-user/, /s-my-gumtree/
-    Dedupe via set, strip query params.
-    """
-    hrefs = page.css("a::attr(href)").getall()
-    seen = set()
-    links = []
-    for href in hrefs:
-        if not href:
-            continue
-        # Normalise to absolute URL
-        if href.startswith("/"):
-            href = GUMTREE_BASE + href
-        href = href.split("?")[0]  # strip query params
-        # Filter: only /a- pattern ad links
-        if "/a-" not in href:
-            continue
-        if "/s-user/" in href or "/s-my-gumtree/" in href:
-            continue
-        if not href.startswith(GUMTREE_BASE):
-            continue
-        if any(cat in href for cat in _BLOCKED_CATEGORIES):
-            continue
-        # Block all job listing categories (catches *-jobs/ patterns generically)
-        if "-jobs/" in href:
-            continue
-        if href not in seen:
-            seen.add(href)
-            links.append(href)
-    return links
-
-
-def extract_adid(page, url: str) -> str | None:
+# HTTP cache freshness. Listing pages change between the twice-daily runs;
+# an ad page's content rarely changes once posted.
+LISTING_TTL = 30 * 60
+AD_TTL = 7 * 24 * 3600
+
+
+# ── Fetch engine ──────────────────────────────────────────────
+
+class CachedPage:
+    """A page replayed from HttpCache: raw body, with Scrapling selectors built on demand."""
+
+    def __init__(self, body: bytes, url: str, selector_cls):
+        self.body = body
+        self.url = url
+        self._selector_cls = selector_cls
+        self._selector = None
+
+    def css(self, query: str):
+        if self._selector is None:
+            self._selector = self._selector_cls(content=self.body, url=self.url)
+        return self._selector.css(query)
+
+
+class FetchEngine:
     """
-    Try data-adid attribute first, fall back to last numeric URL segment.
+    Bounded-concurrency wrapper around Fetcher.get.
+    Every request goes through the HostBudget for its host, so listing
+    and ad fetches share one politeness budget per site; the gap is kept
+    after each request finishes, not just between starts. With an
+    HttpCache, fresh cached pages are returned without touching the
+    budget at all.
     """
-    # Try data-adid attribute
-    adid_els = page.css("[data-adid]::attr(data-adid)").getall()
-    if adid_els:
-        return adid_els[0]
-    # Fall back to last numeric segment of URL
-    parts = [p for p in url.rstrip("/").split("/") if p]
-    if parts and re.match(r"^\d+$", parts[-1]):
-        return parts[-1]
-    return None
-
-
-def is_blocked(page) -> bool:
-    """Check whether the page is a bot-block or Cloudflare shell."""
+
+    def __init__(
+        self,
+        fetcher,
+        max_in_flight: int = FETCH_CONCURRENCY,
+        min_interval: float = FETCH_MIN_INTERVAL,
+        jitter: float = FETCH_JITTER,
+        cache: HttpCache | None = None,
+        selector_cls=None,
+    ):
+        self._fetcher = fetcher
+        self.max_in_flight = max(1, max_in_flight)
+        self._min_interval = min_interval
+        self._jitter = jitter
+        self._cache = cache
+        self._selector_cls = selector_cls
+        self._budgets: dict[str, HostBudget] = {}
+        self._lock = threading.Lock()
+
+    def _budget_for(self, url: str) -> HostBudget:
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._budgets:
+                self._budgets[host] = HostBudget(
+                    self.max_in_flight, self._min_interval, self._jitter, space_after_finish=True,
+                )
+            return self._budgets[host]
+
+    def _fetch(self, url: str, headers: dict):
+        kwargs = {"headers": headers} if headers else {}
+        with self._budget_for(url).slot():
+            return self._fetcher.get(url, stealthy_headers=True, retries=3, timeout=30, **kwargs)
+
+    def get(self, url: str, ttl: float = 0):
+        if self._cache is None:
+            return self._fetch(url, {})
+        result = self._cache.get(
+            url,
+            self._fetch,
+            ttl,
+            cacheable=lambda body: not _is_block_text(body.decode("utf-8", errors="ignore")),
+        )
+        if result.response is not None:
+            return result.response
+        return CachedPage(result.body, url, self._selector_cls)
+
+
+def fetch_ad(engine: FetchEngine, ad_url: str) -> dict | None:
+    """Fetch and parse one ad page. Runs on a worker thread."""
+    print(f"[gumtree] Fetching ad: {ad_url}", file=sys.stderr)
     try:
-        body_text = page.body.decode("utf-8", errors="ignore") if isinstance(page.body, bytes) else str(page.body)
-    except Exception:
-        return True
-    # Very short response = JS shell (curl-impersonate used to return 98 bytes)
-    if len(body_text) < 500:
+        ad_page = engine.get(ad_url, ttl=AD_TTL)
+    except Exception as e:
+        print(f"[gumtree] fetch failed for {ad_url}: {e}", file=sys.stderr)
+        return None
+    return parse_ad_page(ad_page, ad_url)
+
+
+class UrlQueue:
+    """Thread-safe FIFO of ad URLs that silently drops URLs already queued."""
+
+    def __init__(self):
+        self._queue: queue.Queue = queue.Queue()
+        self._seen: set[str] = set()
+        self._lock = threading.Lock()
+
+    def put(self, url: str) -> bool:
+        with self._lock:
+            if url in self._seen:
+                return False
+            self._seen.add(url)
+        self._queue.put(url)
         return True
-    for signal in BLOCK_SIGNALS:
-        if signal in body_text:
-            return True
-    return False
 
+    def get(self) -> str | None:
+        return self._queue.get()
+
+    def backlog(self) -> int:
+        return self._queue.qsize()
+
+    def close(self, consumers: int) -> None:
+        """Wake every consumer with an end-of-stream marker."""
+        for _ in range(consumers):
+            self._queue.put(None)
+
+
+_WORKER_DONE = object()
 
-def _extract_location_from_jsonld(body_text: str) -> str | None:
+
+def scrape_ads(
+    engine: FetchEngine,
+    max_ads: int,
+    seen: SeenIndex | None = None,
+    stats: dict | None = None,
+):
     """
-    Parse JSON-LD Place schema embedded in page HTML.
-    Gumtree encodes location as addressLocality + addressRegion.
-    Returns e.g. "Cape Town" or "Johannesburg, Gauteng".
+    Producer/consumer scrape pipeline. Yields parsed ads as soon as they
+    arrive, deduplicated by adid.
+
+    With a SeenIndex, ads handled in a previous run are skipped before any
+    request is made (by URL) or after parsing (by adid, for reposts), and
+    every yielded ad is recorded as scraped — gumtree_to_b2c.py / b2c_run.py
+    mark it handled once it is rejected or POSTed. Skips are counted in
+    stats["skipped_seen"].
+
+    Discovery threads walk SEARCH_URLS and feed a shared UrlQueue while ad
+    workers drain it, so ad fetching starts with the first listing page.
+    Once max_ads unique ads have been yielded (or the caller stops
+    iterating) every stage is told to stop and no further pages are fetched.
     """
-    for m in re.finditer(
-        r'<script[^>]+type="application/ld\+json"[^>]*>(.*?)</script>',
-        body_text,
-        re.DOTALL,
-    ):
+    concurrency = engine.max_in_flight
+    urls = UrlQueue()
+    parsed: queue.Queue = queue.Queue()
+    stop = threading.Event()
+    listings = iter(SEARCH_URLS)
+    listings_lock = threading.Lock()
+    stats_lock = threading.Lock()  # discovery threads and the consumer loop both count skips
+    if stats is None:
+        stats = {}
+    stats.setdefault("skipped_seen", 0)
+
+    def discover() -> None:
+        while not stop.is_set():
+            # Back-pressure: don't spend the host budget on more listing
+            # pages while the workers still have a queue of ads to fetch.
+            if urls.backlog() >= concurrency * 2:
+                stop.wait(0.1)
+                continue
+            with listings_lock:
+                search_url = next(listings, None)
+            if search_url is None:
+                return
+
+            print(f"[gumtree] Fetching listing: {search_url}", file=sys.stderr)
+            try:
+                listing_page = engine.get(search_url, ttl=LISTING_TTL)
+            except Exception as e:
+                print(f"[gumtree] FAILED listing page: {e}", file=sys.stderr)
+                continue
+
+            if is_blocked(listing_page):
+                print(f"[gumtree] BLOCKED on listing page", file=sys.stderr)
+                continue
+
+            ad_links = extract_ad_links(listing_page)
+            print(f"[gumtree] Found {len(ad_links)} ad links", file=sys.stderr)
+            if not ad_links:
+                print(f"[gumtree] Found 0 ad links on {search_url}", file=sys.stderr)
+                continue
+
+            for ad_url in ad_links:
+                if stop.is_set():
+                    return
+                if seen is not None and seen.check_url(ad_url):
+                    with stats_lock:
+                        stats["skipped_seen"] += 1
+                    continue
+                urls.put(ad_url)
+
+    def drain() -> None:
         try:
-            data = json.loads(m.group(1))
-            items = data if isinstance(data, list) else [data]
-            for item in items:
-                if item.get("@type") == "Place":
-                    addr = item.get("address", {})
-                    locality = addr.get("addressLocality", "")
-                    region = addr.get("addressRegion", "")
-                    # "Other" is Gumtree's placeholder when locality is unknown
-                    parts = [p for p in [locality, region] if p and p.lower() != "other"]
-                    if parts:
-                        return ", ".join(parts)
-        except Exception:
-            pass
-    return None
-
-
-def parse_ad_page(page, url: str) -> dict | None:
-    """Extract lead fields from an individual Gumtree ad page."""
-    if is_blocked(page):
-        print(f"[gumtree] block page detected: {url}", file=sys.stderr)
-        return None
+            while not stop.is_set():
+                ad_url = urls.get()
+                if ad_url is None or stop.is_set():
+                    break
+                parsed.put(fetch_ad(engine, ad_url))
+        finally:
+            parsed.put(_WORKER_DONE)
+
+    producers = [threading.Thread(target=discover, daemon=True) for _ in range(LISTING_WORKERS)]
+    consumers = [threading.Thread(target=drain, daemon=True) for _ in range(concurrency)]
+    for t in producers + consumers:
+        t.start()
+
+    def close_when_discovered() -> None:
+        for t in producers:
+            t.join()
+        urls.close(len(consumers))
+
+    threading.Thread(target=close_when_discovered, daemon=True).start()
 
-    # Get raw body once — reused for JSON-LD, phone scan, etc.
+    seen_adids: set[str] = set()
+    yielded = 0
+    finished = 0
     try:
-        body_text = page.body.decode("utf-8", errors="ignore") if isinstance(page.body, bytes) else str(page.body)
-    except Exception:
-        body_text = ""
-
-    # Title
-    title = page.css("h1::text").get()
-    if title:
-        title = title.strip()
-
-    # Description
-    # Gumtree changed HTML structure in 2025/2026 — no more data-q attributes.
-    # Try multiple selectors with *::text (captures nested <p>/<span> content).
-    # Fall back to <meta name="description"> which is always present (truncated ~150 chars).
-    description = None
-    for sel in [
-        '[data-q="ad-description"] *::text',
-        ".description *::text",
-        ".vip-ad-description *::text",
-        ".ad-description *::text",
-    ]:
-        parts = page.css(sel).getall()
-        if parts:
-            description = " ".join(t.strip() for t in parts if t.strip())
-            if description:
-                break
-    if not description:
-        description = page.css('meta[name="description"]::attr(content)').get()
-        if description:
-            description = description.strip()
-
-    # Location — JSON-LD Place schema is the most reliable source on current Gumtree
-    location = _extract_location_from_jsonld(body_text)
-    if not location:
-        for sel in ['[data-q="ad-location"]::text', ".location::text"]:
-            loc = page.css(sel).get()
-            if loc and loc.strip() and loc.strip() != ",":
-                location = loc.strip()
-                break
-
-    # Price
-    price = None
-    for sel in ['[data-q="ad-price"]::text', ".price::text"]:
-        price = page.css(sel).get()
-        if price and price.strip():
-            price = price.strip()
-            break
-
-    # Phone
-    # Priority: rendered tel: links (filtered) > data-phone > regex in description > body scan
-    # NOTE: Gumtree injects its own numbers (+27756035177, 0870220222) into every page
-    # via JS-rendered DOM elements. Skip these — they are not seller phones.
-    phone = None
-    for tel_href in page.css('a[href^="tel:"]::attr(href)').getall():
-        candidate = re.sub(r"[\s\-]", "", tel_href.replace("tel:", "").strip())
-        if candidate not in _GUMTREE_NUMBERS:
-            phone = candidate
-            if phone.startswith("0"):
-                phone = "+27" + phone[1:]
-            elif phone.startswith("27") and not phone.startswith("+"):
-                phone = "+" + phone
-            break
-    if not phone:
-        data_phone = page.css("[data-phone]::attr(data-phone)").get()
-        if data_phone:
-            phone = re.sub(r"[\s\-]", "", data_phone.strip())
-    if not phone:
-        phone = extract_phone(description)
-    if not phone and body_text:
-        # Seller phone is typically in description text at ~100K chars into the body.
-        # Scan up to 200K to capture it; avoid the related-ads section (~120K+).
-        phone = extract_phone(body_text[5000:200000])
-
-    # AdID
-    adid = extract_adid(page, url)
-
-    return {
-        "title": title,
-        "description": description,
-        "phone": phone,
-        "location": location,
-        "price": price,
-        "adid": adid,
-        "url": url,
-        "scraped_at": datetime.now(timezone.utc).isoformat(),
-    }
+        while finished < len(consumers) and yielded < max_ads:
+            ad = parsed.get()
+            if ad is _WORKER_DONE:
+                finished += 1
+                continue
+            if not ad:
+                continue
+
+            if ad["adid"] and ad["adid"] in seen_adids:
+                continue
+            if ad["adid"]:
+                seen_adids.add(ad["adid"])
+            if seen is not None:
+                already = seen.has_adid(ad["adid"])
+                seen.record(ad)
+                if already:
+                    with stats_lock:
+                        stats["skipped_seen"] += 1
+                    continue
+
+            yielded += 1
+            yield ad
+    finally:
+        stop.set()
+        urls.close(len(consumers))
+        for t in producers + consumers:
+            t.join()
 
 
 # ── Main ──────────────────────────────────────────────────────
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     today = datetime.now().strftime("%Y-%m-%d")
-    default_out = str(
-        Path(__file__).parent.parent / "memory" / f"gumtree-leads-{today}.json"
-    )
+    default_out = Path(__file__).parent.parent / "memory" / f"gumtree-leads-{today}.json"
     parser = argparse.ArgumentParser(
         description="Scrape Gumtree Wanted ads for vehicle trackers using Scrapling StealthyFetcher"
     )
     parser.add_argument("--max", type=int, default=15, dest="max_ads", help="Max ads to collect (default: 15)")
-    parser.add_argument("--out", type=str, default=default_out, help="Output JSON file path")
-    return parser.parse_args()
-
-
-def main() -> None:
-    args = parse_args()
+    parser.add_argument("--out", type=str, default=None, help="Output file path (default: memory/gumtree-leads-<date>.json|.ndjson)")
+    parser.add_argument("--ndjson", action="store_true", help="Stream leads to --out as NDJSON; stdout gets a summary only")
+    parser.add_argument("--concurrency", type=int, default=FETCH_CONCURRENCY, help=f"Max pages in flight per host (default: {FETCH_CONCURRENCY})")
+    parser.add_argument("--min-interval", type=float, default=FETCH_MIN_INTERVAL, help=f"Min seconds between requests per host, after each one finishes (default: {FETCH_MIN_INTERVAL})")
+    parser.add_argument("--jitter", type=float, default=FETCH_JITTER, help=f"Extra random delay per request, seconds (default: {FETCH_JITTER})")
+    parser.add_argument("--seen-db", type=str, default=str(SEEN_INDEX_PATH), help="Cross-run seen-ad index (SQLite)")
+    parser.add_argument("--no-seen", action="store_true", help="Don't skip ads handled in previous runs")
+    parser.add_argument("--cache-dir", type=str, default=str(HTTP_CACHE_DIR), help="HTTP response cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="Always fetch pages from the network")
+    parser.add_argument("--offline", action="store_true", help="Serve pages from the HTTP cache only (no network)")
+    args = parser.parse_args(argv)
+    if args.out is None:
+        args.out = str(default_out.with_suffix(".ndjson") if args.ndjson else default_out)
+    return args
+
+
+def run(args: argparse.Namespace, keep_leads: bool = False) -> dict:
+    """
+    Scrape and write --out; returns the stdout summary.
+    The summary carries the leads themselves in JSON mode, or in NDJSON
+    mode too when keep_leads is set (b2c_run.py's in-process mode hands
+    them straight to the bridge).
+    """
     max_ads: int = args.max_ads
     out_path: str = args.out
 
@@ -320,88 +350,80 @@ def main() -> None:
     # Lazy import so the error message is helpful if scrapling isn't installed
     try:
         from scrapling.fetchers import Fetcher
+        from scrapling.parser import Selector
     except ImportError:
         print(
             "[gumtree] ERROR: scrapling not installed.\n"
             "  Run: uv pip install 'scrapling[fetchers]>=0.4.2'",
             file=sys.stderr,
         )
-        print(json.dumps({"ok": False, "error": "scrapling not installed"}))
-        sys.exit(1)
+        return {"ok": False, "error": "scrapling not installed"}
 
     results: list[dict] = []
-    seen_urls: set[str] = set()
-    seen_adids: set[str] = set()
-
-    for search_url in SEARCH_URLS:
-        if len(results) >= max_ads:
-            break
-
-        print(f"[gumtree] Fetching listing: {search_url}", file=sys.stderr)
-
-        try:
-            listing_page = Fetcher.get(
-                search_url, stealthy_headers=True, retries=3, timeout=30,
-            )
-        except Exception as e:
-            print(f"[gumtree] FAILED listing page: {e}", file=sys.stderr)
-            continue
-
-        if is_blocked(listing_page):
-            print(f"[gumtree] BLOCKED on listing page", file=sys.stderr)
-            continue
-
-        ad_links = extract_ad_links(listing_page)
-        print(f"[gumtree] Found {len(ad_links)} ad links", file=sys.stderr)
-
-        if not ad_links:
-            print(f"[gumtree] Found 0 ad links on {search_url}", file=sys.stderr)
-            continue
-
-        for ad_url in ad_links:
-            if len(results) >= max_ads:
-                break
-            if ad_url in seen_urls:
-                continue
-            seen_urls.add(ad_url)
-
-            # Polite delay: 500–1200ms jitter
-            time.sleep(0.5 + random.random() * 0.7)
-
-            print(f"[gumtree] Fetching ad: {ad_url}", file=sys.stderr)
-
-            try:
-                ad_page = Fetcher.get(
-                    ad_url, stealthy_headers=True, retries=3, timeout=30,
-                )
-            except Exception as e:
-                print(f"[gumtree] fetch failed for {ad_url}: {e}", file=sys.stderr)
-                continue
-
-            ad = parse_ad_page(ad_page, ad_url)
-            if not ad:
-                continue
-
-            if ad["adid"] and ad["adid"] in seen_adids:
-                continue
-            if ad["adid"]:
-                seen_adids.add(ad["adid"])
+    count = 0
+    stats: dict = {}
+    # NDJSON: each lead hits disk (flushed) as soon as it is parsed, nothing is buffered
+    writer = NdjsonWriter(out_path) if args.ndjson else None
+    seen = None if args.no_seen else SeenIndex(args.seen_db)
+    cache = None if args.no_cache and not args.offline else HttpCache(args.cache_dir, offline=args.offline)
+    engine = FetchEngine(
+        Fetcher,
+        max_in_flight=args.concurrency,
+        min_interval=args.min_interval,
+        jitter=args.jitter,
+        cache=cache,
+        selector_cls=Selector,
+    )
 
-            results.append(ad)
+    try:
+        for ad in scrape_ads(engine, max_ads, seen=seen, stats=stats):
+            count += 1
+            if writer is not None:
+                writer.write(ad)
+            if writer is None or keep_leads:
+                results.append(ad)
             print(
                 f"[gumtree] ✓ \"{ad['title']}\" | phone: {ad['phone'] or 'none'} | loc: {ad['location'] or '?'}",
                 file=sys.stderr,
             )
+    finally:
+        if writer is not None:
+            writer.close()
+        if seen is not None:
+            seen.close()
+
+    if stats.get("skipped_seen"):
+        print(f"[gumtree] Skipped {stats['skipped_seen']} ads seen in previous runs", file=sys.stderr)
+    if cache is not None:
+        print(f"[gumtree] HTTP cache: {cache.stats}", file=sys.stderr)
 
-    # Write output file
-    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    # Write output file (already on disk in NDJSON mode)
+    if writer is None:
+        Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
 
-    print(f"[gumtree] Done — {len(results)} ads → {out_path}", file=sys.stderr)
+    print(f"[gumtree] Done — {count} ads → {out_path}", file=sys.stderr)
 
     # Stdout: structured result for shell piping / b2c_run.py integration
-    print(json.dumps({"ok": True, "count": len(results), "out": out_path, "leads": results}))
+    summary = {
+        "ok": True,
+        "count": count,
+        "skipped_seen": stats.get("skipped_seen", 0),
+        "cache": cache.stats if cache is not None else None,
+        "out": out_path,
+        "format": "ndjson" if writer is not None else "json",
+    }
+    if writer is None or keep_leads:
+        summary["leads"] = results
+    return summary
+
+
+def main() -> None:
+    summary = run(parse_args())
+    print(json.dumps(summary))
+    if not summary["ok"]:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
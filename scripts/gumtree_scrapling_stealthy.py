@@ -4,10 +4,13 @@
 # Uses Scrapling StealthyFetcher (patchright + Cloudflare solver)
 # to bypass bot protection that defeated curl-impersonate and
 # vanilla Playwright+stealth.
+# Page parsing is shared with gumtree_scrapling.py
+# (cogstack_leadgen/gumtree.py).
 # =============================================================
 # Usage:
 #   uv run python scripts/gumtree_scrapling.py
 #   uv run python scripts/gumtree_scrapling.py --max 20 --out /tmp/gumtree.json
+#   uv run python scripts/gumtree_scrapling_stealthy.py --no-seen   # ignore the cross-run seen index
 #
 # Requires (one-time setup on bigtorig):
 #   uv pip install "scrapling[fetchers]>=0.4.2"
@@ -20,277 +23,19 @@
 import argparse
 import json
 import random
-import re
 import sys
 import time
-from datetime import datetime, timezone
+from datetime import datetime
 from pathlib import Path
 
-# Gumtree-owned numbers injected site-wide (WhatsApp button, support links).
-# These appear in the rendered DOM on every ad page — not seller phones.
-_GUMTREE_NUMBERS = {"+27756035177", "27756035177", "0870220222", "+27870220222"}
-
 from dotenv import load_dotenv
 
-load_dotenv()
+sys.path.insert(0, str(Path(__file__).parent.parent))
 
-# ── Constants ─────────────────────────────────────────────────
-
-# NOTE: Gumtree removed the "Wanted Ads" top-level category (c9110) in 2025/2026.
-# All /s-wanted-ads/... paths now 301-redirect to /s-all-the-ads/v1b0p1 (losing the keyword).
-# Use buyer-intent keyword phrases (?q=) to surface people looking to BUY a tracker.
-# Category-level blocklist in extract_ad_links() further filters seller/job/car ads by URL.
-SEARCH_URLS = [
-    # Direct buyer-intent queries
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=need+car+tracker",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=want+car+tracker",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=car+tracker+wanted",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=looking+for+tracker",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=gps+tracker+needed",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=vehicle+tracker+wanted",
-    # Theft/crime-related — people who just experienced theft are hot tracker prospects
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=car+stolen+tracker",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=vehicle+stolen+need+tracker",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=hijacked+car+tracker",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=car+break+in+tracker",
-    # Vehicle security / anti-theft — adjacent intent
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=vehicle+security+tracking",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=car+theft+prevention+tracker",
-    # Installation / service requests — people seeking tracker installation
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=tracker+installation+wanted",
-    "https://www.gumtree.co.za/s-all-the-ads/v1b0p1?q=install+car+tracker",
-]
-
-# Gumtree URL path segments that NEVER contain tracker buyer-intent ads.
-# Keep this list NARROW — the bridge script (gumtree_to_b2c.py) handles
-# buyer vs seller classification via LLM. Only block categories where
-# a tracker buyer ad is structurally impossible.
-# Rule: any URL segment containing "-jobs/" is a job ad — blocked in extract_ad_links().
-_BLOCKED_CATEGORIES = [
-    # Vehicles for sale (sellers listing cars/trucks, not tracker buyers)
-    "/a-cars-bakkies/",
-    "/a-heavy-trucks-buses/",
-    # Pets (pet trackers, not vehicle trackers)
-    "/a-other-pets/",
-    # Property / removals (never tracker-related)
-    "/a-removals-storage/",
-    "/a-property-",
-    # Wearables (smart rings, fitness bands — not vehicle trackers)
-    "/a-wearable-technology/",
-]
-
-BLOCK_SIGNALS = ["The request is blocked", "Access Denied", "cf-challenge"]
-
-PHONE_RE = re.compile(r"(?:\+27|27|0)[6-8]\d[\s\-]?\d{3}[\s\-]?\d{4}")
-
-GUMTREE_BASE = "https://www.gumtree.co.za"
-
-
-# ── Helpers ───────────────────────────────────────────────────
-
-def extract_phone(text: str | None) -> str | None:
-    """Extract and normalise a SA phone number from text."""
-    if not text:
-        return None
-    match = PHONE_RE.search(text)
-    if not match:
-        return None
-    # Normalise: strip spaces and dashes
-    number = re.sub(r"[\s\-]", "", match.group(0))
-    # Ensure +27 prefix
-    if number.startswith("0"):
-        number = "+27" + number[1:]
-    elif number.startswith("27"):
-        number = "+" + number
-    return number
-
-
-def extract_ad_links(page) -> list[str]:
-    """
-    Extract individual ad URLs from a Gumtree listing page.
-    Accept:  URLs with /a- pattern (individual ads)
-    Reject:  /s-user/, /s-my-gumtree/
-    Dedupe via set, strip query params.
-    """
-    hrefs = page.css("a::attr(href)").getall()
-    seen = set()
-    links = []
-    for href in hrefs:
-        if not href:
-            continue
-        # Normalise to absolute URL
-        if href.startswith("/"):
-            href = GUMTREE_BASE + href
-        href = href.split("?")[0]  # strip query params
-        # Filter: only /a- pattern ad links
-        if "/a-" not in href:
-            continue
-        if "/s-user/" in href or "/s-my-gumtree/" in href:
-            continue
-        if not href.startswith(GUMTREE_BASE):
-            continue
-        if any(cat in href for cat in _BLOCKED_CATEGORIES):
-            continue
-        # Block all job listing categories (catches *-jobs/ patterns generically)
-        if "-jobs/" in href:
-            continue
-        if href not in seen:
-            seen.add(href)
-            links.append(href)
-    return links
-
-
-def extract_adid(page, url: str) -> str | None:
-    """
-    Try data-adid attribute first, fall back to last numeric URL segment.
-    """
-    # Try data-adid attribute
-    adid_els = page.css("[data-adid]::attr(data-adid)").getall()
-    if adid_els:
-        return adid_els[0]
-    # Fall back to last numeric segment of URL
-    parts = [p for p in url.rstrip("/").split("/") if p]
-    if parts and re.match(r"^\d+$", parts[-1]):
-        return parts[-1]
-    return None
-
-
-def is_blocked(page) -> bool:
-    """Check whether the page is a bot-block or Cloudflare shell."""
-    try:
-        body_text = page.body.decode("utf-8", errors="ignore") if isinstance(page.body, bytes) else str(page.body)
-    except Exception:
-        return True
-    # Very short response = JS shell (curl-impersonate used to return 98 bytes)
-    if len(body_text) < 500:
-        return True
-    for signal in BLOCK_SIGNALS:
-        if signal in body_text:
-            return True
-    return False
-
-
-def _extract_location_from_jsonld(body_text: str) -> str | None:
-    """
-    Parse JSON-LD Place schema embedded in page HTML.
-    Gumtree encodes location as addressLocality + addressRegion.
-    Returns e.g. "Cape Town" or "Johannesburg, Gauteng".
-    """
-    for m in re.finditer(
-        r'<script[^>]+type="application/ld\+json"[^>]*>(.*?)</script>',
-        body_text,
-        re.DOTALL,
-    ):
-        try:
-            data = json.loads(m.group(1))
-            items = data if isinstance(data, list) else [data]
-            for item in items:
-                if item.get("@type") == "Place":
-                    addr = item.get("address", {})
-                    locality = addr.get("addressLocality", "")
-                    region = addr.get("addressRegion", "")
-                    # "Other" is Gumtree's placeholder when locality is unknown
-                    parts = [p for p in [locality, region] if p and p.lower() != "other"]
-                    if parts:
-                        return ", ".join(parts)
-        except Exception:
-            pass
-    return None
-
-
-def parse_ad_page(page, url: str) -> dict | None:
-    """Extract lead fields from an individual Gumtree ad page."""
-    if is_blocked(page):
-        print(f"[gumtree] block page detected: {url}", file=sys.stderr)
-        return None
-
-    # Get raw body once — reused for JSON-LD, phone scan, etc.
-    try:
-        body_text = page.body.decode("utf-8", errors="ignore") if isinstance(page.body, bytes) else str(page.body)
-    except Exception:
-        body_text = ""
-
-    # Title
-    title = page.css("h1::text").get()
-    if title:
-        title = title.strip()
-
-    # Description
-    # Gumtree changed HTML structure in 2025/2026 — no more data-q attributes.
-    # Try multiple selectors with *::text (captures nested <p>/<span> content).
-    # Fall back to <meta name="description"> which is always present (truncated ~150 chars).
-    description = None
-    for sel in [
-        '[data-q="ad-description"] *::text',
-        ".description *::text",
-        ".vip-ad-description *::text",
-        ".ad-description *::text",
-    ]:
-        parts = page.css(sel).getall()
-        if parts:
-            description = " ".join(t.strip() for t in parts if t.strip())
-            if description:
-                break
-    if not description:
-        description = page.css('meta[name="description"]::attr(content)').get()
-        if description:
-            description = description.strip()
-
-    # Location — JSON-LD Place schema is the most reliable source on current Gumtree
-    location = _extract_location_from_jsonld(body_text)
-    if not location:
-        for sel in ['[data-q="ad-location"]::text', ".location::text"]:
-            loc = page.css(sel).get()
-            if loc and loc.strip() and loc.strip() != ",":
-                location = loc.strip()
-                break
-
-    # Price
-    price = None
-    for sel in ['[data-q="ad-price"]::text', ".price::text"]:
-        price = page.css(sel).get()
-        if price and price.strip():
-            price = price.strip()
-            break
-
-    # Phone
-    # Priority: rendered tel: links (filtered) > data-phone > regex in description > body scan
-    # NOTE: Gumtree injects its own numbers (+27756035177, 0870220222) into every page
-    # via JS-rendered DOM elements. Skip these — they are not seller phones.
-    phone = None
-    for tel_href in page.css('a[href^="tel:"]::attr(href)').getall():
-        candidate = re.sub(r"[\s\-]", "", tel_href.replace("tel:", "").strip())
-        if candidate not in _GUMTREE_NUMBERS:
-            phone = candidate
-            if phone.startswith("0"):
-                phone = "+27" + phone[1:]
-            elif phone.startswith("27") and not phone.startswith("+"):
-                phone = "+" + phone
-            break
-    if not phone:
-        data_phone = page.css("[data-phone]::attr(data-phone)").get()
-        if data_phone:
-            phone = re.sub(r"[\s\-]", "", data_phone.strip())
-    if not phone:
-        phone = extract_phone(description)
-    if not phone and body_text:
-        # Seller phone is typically in description text at ~100K chars into the body.
-        # Scan up to 200K to capture it; avoid the related-ads section (~120K+).
-        phone = extract_phone(body_text[5000:200000])
-
-    # AdID
-    adid = extract_adid(page, url)
-
-    return {
-        "title": title,
-        "description": description,
-        "phone": phone,
-        "location": location,
-        "price": price,
-        "adid": adid,
-        "url": url,
-        "scraped_at": datetime.now(timezone.utc).isoformat(),
-    }
+from cogstack_leadgen.gumtree import SEARCH_URLS, extract_ad_links, is_blocked, parse_ad_page
+from cogstack_leadgen.seen_index import DEFAULT_PATH as SEEN_INDEX_PATH, SeenIndex
+
+load_dotenv()
 
 
 # ── Main ──────────────────────────────────────────────────────
@@ -305,6 +50,8 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument("--max", type=int, default=15, dest="max_ads", help="Max ads to collect (default: 15)")
     parser.add_argument("--out", type=str, default=default_out, help="Output JSON file path")
+    parser.add_argument("--seen-db", type=str, default=str(SEEN_INDEX_PATH), help="Cross-run seen-ad index (SQLite)")
+    parser.add_argument("--no-seen", action="store_true", help="Don't skip ads handled in previous runs")
     return parser.parse_args()
 
 
@@ -331,6 +78,8 @@ def main() -> None:
     results: list[dict] = []
     seen_urls: set[str] = set()
     seen_adids: set[str] = set()
+    skipped_seen = 0
+    seen = None if args.no_seen else SeenIndex(args.seen_db)
 
     try:
         with StealthySession(
@@ -372,6 +121,9 @@ def main() -> None:
                     if ad_url in seen_urls:
                         continue
                     seen_urls.add(ad_url)
+                    if seen is not None and seen.check_url(ad_url):
+                        skipped_seen += 1
+                        continue
 
                     # Polite delay: 800–2000ms jitter (mirrors gumtree_scraper.js)
                     time.sleep(0.8 + random.random() * 1.2)
@@ -396,6 +148,12 @@ def main() -> None:
                         continue
                     if ad["adid"]:
                         seen_adids.add(ad["adid"])
+                    if seen is not None:
+                        already = seen.has_adid(ad["adid"])
+                        seen.record(ad)
+                        if already:
+                            skipped_seen += 1
+                            continue
 
                     results.append(ad)
                     print(
@@ -409,6 +167,12 @@ def main() -> None:
         print(f"[gumtree] Tip: if bigtorig IP is flagged, add a residential proxy via --proxy or env SCRAPLING_PROXY", file=sys.stderr)
         print(json.dumps({"ok": False, "error": err, "count": len(results), "leads": results}))
         sys.exit(1)
+    finally:
+        if seen is not None:
+            seen.close()
+
+    if skipped_seen:
+        print(f"[gumtree] Skipped {skipped_seen} ads seen in previous runs", file=sys.stderr)
 
     # Write output file
     Path(out_path).parent.mkdir(parents=True, exist_ok=True)
@@ -418,7 +182,13 @@ def main() -> None:
     print(f"[gumtree] Done — {len(results)} ads → {out_path}", file=sys.stderr)
 
     # Stdout: structured result for shell piping / b2c_run.py integration
-    print(json.dumps({"ok": True, "count": len(results), "out": out_path, "leads": results}))
+    print(json.dumps({
+        "ok": True,
+        "count": len(results),
+        "skipped_seen": skipped_seen,
+        "out": out_path,
+        "leads": results,
+    }))
 
 
 if __name__ == "__main__":
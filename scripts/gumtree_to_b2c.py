@@ -9,12 +9,24 @@
 #   uv run python scripts/gumtree_to_b2c.py
 #   uv run python scripts/gumtree_to_b2c.py --input memory/gumtree-leads-2026-03-17.json
 #   uv run python scripts/gumtree_to_b2c.py --dry-run
+#   uv run python scripts/gumtree_to_b2c.py --no-post --out logs/qualified.json   # POST later
 #   uv run python scripts/gumtree_to_b2c.py --skip-llm
+#   uv run python scripts/gumtree_to_b2c.py --batch-size 1      # one LLM request per ad
+#   uv run python scripts/gumtree_to_b2c.py --no-llm-cache      # reclassify ads seen on earlier runs
+#   uv run python scripts/gumtree_to_b2c.py --no-seen           # don't mark ads handled in the seen index
+#   uv run python scripts/gumtree_to_b2c.py --concurrency 8 --llm-rate 5
 #   uv run python scripts/gumtree_to_b2c.py --whatsapp          # enrich names via WhatsApp lookup service
 #   uv run python scripts/gumtree_to_b2c.py --whatsapp --whatsapp-url http://127.0.0.1:3457
 # =============================================================
+# Seen index (logs/gumtree-seen.sqlite): rejected ads are marked
+# handled once classified, buyers once the webhook accepted their
+# batch (with --no-post, b2c_run.py does that after its POST), so
+# the scraper skips them next run. Ads whose LLM call failed, or
+# whose POST failed, stay unhandled and are scraped again.
+# =============================================================
 
 import argparse
+import asyncio
 import html
 import json
 import logging
@@ -28,6 +40,19 @@ from pathlib import Path
 import httpx
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cogstack_leadgen.http import MAX_RETRIES, RETRY_DELAYS
+from cogstack_leadgen.identity import ENRICHED, IdentityIndex, lead_keys
+from cogstack_leadgen.keyword_matcher import KeywordMatcher
+from cogstack_leadgen.lead_io import read_leads
+from cogstack_leadgen.llm_cache import DEFAULT_PATH as LLM_CACHE_PATH, LlmCache, cache_key
+from cogstack_leadgen.logs import setup_logging as _setup_logging
+from cogstack_leadgen.seen_index import DEFAULT_PATH as SEEN_INDEX_PATH, SeenIndex
+from cogstack_leadgen.webhook import post_new_leads
+from cogstack_leadgen.whatsapp import LOOKUP_CONCURRENCY, WhatsAppLookup
+from cogstack_leadgen.whatsapp_cache import WhatsAppLookupCache
+
 load_dotenv()
 
 # ── Logging ──────────────────────────────────────────────────
@@ -36,42 +61,19 @@ log = logging.getLogger("bridge")
 
 
 def setup_logging() -> None:
-    """Configure console + file logging."""
-    log.setLevel(logging.DEBUG)
-
-    # Console: INFO level
-    console = logging.StreamHandler(sys.stderr)
-    console.setLevel(logging.INFO)
-    console.setFormatter(logging.Formatter("[%(name)s] %(levelname)s: %(message)s"))
-    log.addHandler(console)
-
-    # File: DEBUG level — logs/b2c-bridge-YYYY-MM-DD.log
-    log_dir = Path(__file__).parent.parent / "logs"
-    log_dir.mkdir(exist_ok=True)
-    today = datetime.now().strftime("%Y-%m-%d")
-    fh = logging.FileHandler(log_dir / f"b2c-bridge-{today}.log", encoding="utf-8")
-    fh.setLevel(logging.DEBUG)
-    fh.setFormatter(logging.Formatter("%(asctime)s [%(name)s] %(levelname)s: %(message)s"))
-    log.addHandler(fh)
+    """Configure console + file logging (logs/b2c-bridge-YYYY-MM-DD.log)."""
+    _setup_logging(log, "b2c-bridge")
 
 
 # ── Environment ──────────────────────────────────────────────
 
-B2C_WEBHOOK_URL = os.environ.get("B2C_WEBHOOK_URL")
-B2C_WEBHOOK_TOKEN = os.environ.get("B2C_WEBHOOK_TOKEN") or os.environ.get("WEBHOOK_TOKEN")
 OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY")
 OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
-WHATSAPP_LOOKUP_URL = os.environ.get("WHATSAPP_LOOKUP_URL", "http://127.0.0.1:3456")
-
-# ── Retry constants ──────────────────────────────────────────
-
-MAX_RETRIES = 3
-RETRY_DELAYS = [2, 5, 15]  # seconds — exponential backoff
 
 # ── Pre-filter keyword lists ─────────────────────────────────
 
 SELLER_SIGNALS = [
-    "for sale", "selling", "we are selling", "price:", "only r",
+    "for sale", "selling", "we are selling", "price:", "only r*",
     "includes sim", "no subscription", "subscription-free",
     "order now", "shop now", "visit our", "our range",
     "in stock", "available now", "special offer",
@@ -81,7 +83,7 @@ SELLER_SIGNALS = [
 ]
 
 IRRELEVANT_SIGNALS = [
-    "job", "hiring", "vacancy", "looking for a driver",
+    "job*", "hiring", "vacancy", "looking for a driver",
     "debt collector", "admin assistant", "coordinator",
     "field tracer", "recruitment", "onboarding",
     "pet tracker", "dog tracker", "cat tracker",
@@ -92,6 +94,10 @@ IRRELEVANT_SIGNALS = [
     "brand engagement", "social media marketing",
 ]
 
+# Whole-word matching ("job" no longer hits "jobless"); "*" marks a stem — see keyword_matcher.py
+SELLER_MATCHER = KeywordMatcher(SELLER_SIGNALS)
+IRRELEVANT_MATCHER = KeywordMatcher(IRRELEVANT_SIGNALS)
+
 # URL path segments that indicate non-buyer ads (mirrors gumtree_scrapling.py blocklist)
 BLOCKED_URL_SEGMENTS = [
     "/a-cars-bakkies/", "/a-heavy-trucks-buses/",
@@ -141,40 +147,6 @@ def infer_province(location: str | None) -> str | None:
     return None
 
 
-# ── WhatsApp name lookup ─────────────────────────────────────
-
-def whatsapp_lookup(phone: str, lookup_url: str | None = None) -> str | None:
-    """Look up WhatsApp profile name for a phone number.
-
-    Requires the lookup service at /opt/projects/whatsapp-lookup to be running.
-    Returns the profile name or None if not found / service unavailable.
-    Retries once on timeout (Baileys can be slow after idle).
-    """
-    base_url = lookup_url or WHATSAPP_LOOKUP_URL
-    for attempt in range(2):  # 1 retry on timeout
-        try:
-            resp = httpx.post(
-                f"{base_url}/lookup",
-                json={"phone": phone},
-                timeout=15.0,
-            )
-            data = resp.json()
-            if data.get("exists") and data.get("name"):
-                return data["name"]
-            log.debug("WhatsApp lookup for %s: exists=%s, name=%s", phone, data.get("exists"), data.get("name"))
-            return None  # exists but no name, or not on WhatsApp — don't retry
-        except httpx.TimeoutException:
-            if attempt == 0:
-                log.debug("WhatsApp lookup timeout for %s, retrying in 3s...", phone)
-                time.sleep(3)
-                continue
-            log.warning("WhatsApp lookup timeout for %s after retry", phone)
-        except httpx.HTTPError as e:
-            log.warning("WhatsApp lookup HTTP error for %s: %s", phone, e)
-            break
-    return None
-
-
 # ── Pre-filter ───────────────────────────────────────────────
 
 def pre_filter(ad: dict) -> str | None:
@@ -202,14 +174,14 @@ def pre_filter(ad: dict) -> str | None:
         return "job listing URL"
 
     # Seller signals
-    for signal in SELLER_SIGNALS:
-        if signal in text:
-            return f"seller signal: '{signal}'"
+    hit = SELLER_MATCHER.search(text)
+    if hit:
+        return f"seller signal: '{hit.keyword}'"
 
     # Irrelevant signals
-    for signal in IRRELEVANT_SIGNALS:
-        if signal in text:
-            return f"irrelevant signal: '{signal}'"
+    hit = IRRELEVANT_MATCHER.search(text)
+    if hit:
+        return f"irrelevant signal: '{hit.keyword}'"
 
     return None
 
@@ -241,83 +213,377 @@ Classification rules:
 - IRRELEVANT: job listing, pet tracker, unrelated product, vehicle for sale, service ad"""
 
 
-def llm_classify(ad: dict) -> dict | None:
-    """Classify and enrich a Gumtree ad via gpt-4o-mini on OpenRouter.
+LLM_BATCH_PROMPT_TEMPLATE = """You are classifying Gumtree ads to determine, for each one, if the poster is a BUYER seeking a vehicle tracker, or a SELLER/irrelevant ad.
 
-    Retries on 429 (rate limit with Retry-After) and 5xx errors.
-    """
-    if not OPENROUTER_API_KEY:
-        return None
+{ads}
+
+Respond with ONLY valid JSON (no markdown, no explanation) — one result per ad, keyed by the ad's id:
+{{
+  "results": [
+    {{
+      "adid": "<the ad's id, exactly as given>",
+      "classification": "BUYER" or "SELLER" or "IRRELEVANT",
+      "reason": "<one sentence explaining why>",
+      "full_name": "<name if visible in ad text, else 'Unknown'>",
+      "intent_signal": "<if BUYER: verbatim quote showing they WANT a tracker, max 300 chars. if not BUYER: null>",
+      "intent_strength": <integer 0-10, 0 if not a buyer>,
+      "urgency_score": <integer 0-10, 0 if not a buyer>,
+      "call_script_opener": "<if BUYER: personalized opener referencing their ad, max 200 chars. if not BUYER: null>",
+      "province": "<SA province if determinable from location, else null>"
+    }}
+  ]
+}}
+
+Classification rules:
+- BUYER: person explicitly says they WANT/NEED/are LOOKING FOR a vehicle tracker or tracking service
+- SELLER: person is OFFERING/SELLING a tracker, tracker product, or related accessory
+- IRRELEVANT: job listing, pet tracker, unrelated product, vehicle for sale, service ad"""
 
+LLM_BATCH_AD_TEMPLATE = """--- Ad id: {adid} ---
+Ad title: {title}
+Ad description: {description}
+Ad location: {location}
+Ad URL: {url}"""
+
+LLM_MODEL = "openai/gpt-4o-mini"
+# Bump whenever either prompt template or the enrichment schema changes —
+# it is part of the LLM cache key, so old classifications stop matching.
+LLM_PROMPT_VERSION = "1"
+LLM_MAX_TOKENS = 500
+# Output budget per ad in a batched call — the enrichment object itself is
+# ~200 tokens; the single-ad max_tokens of 500 is mostly unused headroom.
+LLM_BATCH_TOKENS_PER_AD = 300
+DEFAULT_BATCH_SIZE = 10
+LLM_FAILED = "LLM call failed"  # rejection reason that isn't a verdict — the ad is retried next run
+# Worker pool defaults — the limiter adapts the rate from 429s and rate-limit headers.
+DEFAULT_CONCURRENCY = 4
+DEFAULT_LLM_RATE = 2.0  # requests/s to start from
+LLM_DEADLINE = 120.0  # seconds per request, including retries and limiter waits
+
+
+def _prompt_fields(ad: dict) -> dict:
+    """Ad fields as they are substituted into the prompt templates."""
     # Decode HTML entities in description
     desc = html.unescape(ad.get("description") or "")
     # Truncate long descriptions to save tokens
     if len(desc) > 1500:
         desc = desc[:1500] + "..."
+    return {
+        "title": ad.get("title") or "",
+        "description": desc,
+        "location": ad.get("location") or "Unknown",
+        "url": ad.get("url") or "",
+    }
 
-    prompt = LLM_PROMPT_TEMPLATE.format(
-        title=ad.get("title") or "",
-        description=desc,
-        location=ad.get("location") or "Unknown",
-        url=ad.get("url") or "",
-    )
+
+# ── LLM rate limiting ────────────────────────────────────────
+
+def _parse_seconds(value: str | None) -> float | None:
+    """
+    Seconds until a rate-limit window resets / a retry is allowed.
+    Accepts plain seconds ("2"), epoch seconds or milliseconds (OpenRouter's
+    X-RateLimit-Reset), and Go-style durations ("1s", "250ms", "6m0s").
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        number = float(value)
+    except ValueError:
+        parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+        if not parts:
+            return None
+        scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        return sum(float(n) * scale[unit] for n, unit in parts)
+    if number > 1e12:  # epoch milliseconds
+        return max(0.0, number / 1000 - time.time())
+    if number > 1e9:  # epoch seconds
+        return max(0.0, number - time.time())
+    return max(0.0, number)
+
+
+def _header_value(headers, *names: str) -> str | None:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            return value
+    return None
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket shared by all LLM workers.
+    Starts at `rate` requests/s and adapts AIMD-style: every success nudges
+    the rate up, every 429 halves it and pauses all workers for Retry-After.
+    Rate-limit headers on successful responses cap the rate to what is left
+    of the current window, and pause until the reset when nothing is left.
+    """
+
+    def __init__(self, rate: float = 2.0, burst: int = 4, min_rate: float = 0.2, max_rate: float = 20.0):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self.stats = {"requests": 0, "rate_limited": 0}
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self.stats["requests"] += 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def on_success(self, headers) -> None:
+        self.rate = min(self.max_rate, self.rate + 0.1)
+        remaining = _header_value(headers, "x-ratelimit-remaining-requests", "x-ratelimit-remaining")
+        reset = _parse_seconds(_header_value(headers, "x-ratelimit-reset-requests", "x-ratelimit-reset"))
+        if remaining is None or reset is None:
+            return
+        try:
+            remaining_n = float(remaining)
+        except ValueError:
+            return
+        if remaining_n <= 0:
+            self._pause(reset)
+        elif reset > 0:
+            self.rate = max(self.min_rate, min(self.rate, remaining_n / reset))
+
+    def on_rate_limited(self, retry_after: float) -> None:
+        self.stats["rate_limited"] += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._pause(retry_after)
+
+    def _pause(self, seconds: float) -> None:
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0.0
+        self._updated = now
+
+
+# ── LLM requests ─────────────────────────────────────────────
+
+async def _openrouter_post(
+    client: httpx.AsyncClient,
+    limiter: AdaptiveRateLimiter,
+    prompt: str,
+    max_tokens: int,
+    json_mode: bool = False,
+    deadline: float = LLM_DEADLINE,
+) -> str | None:
+    """Send one chat completion to OpenRouter and return the message content.
+
+    Retries on 429 (pausing the shared limiter for Retry-After), 5xx and
+    transport errors. Gives up once `deadline` seconds have passed,
+    including time spent waiting for the limiter.
+    """
+    body = {
+        "model": LLM_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.1,
+        "max_tokens": max_tokens,
+    }
+    if json_mode:
+        body["response_format"] = {"type": "json_object"}
+    request_timeout = 30.0 if max_tokens <= LLM_MAX_TOKENS else 90.0
+    expires = time.monotonic() + deadline
 
     for attempt in range(MAX_RETRIES):
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            break
         try:
-            response = httpx.post(
+            await asyncio.wait_for(limiter.acquire(), remaining)
+            response = await client.post(
                 OPENROUTER_URL,
                 headers={
                     "Authorization": f"Bearer {OPENROUTER_API_KEY}",
                     "Content-Type": "application/json",
                 },
-                json={
-                    "model": "openai/gpt-4o-mini",
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": 0.1,
-                    "max_tokens": 500,
-                },
-                timeout=30.0,
+                json=body,
+                timeout=max(1.0, min(request_timeout, expires - time.monotonic())),
             )
 
             if response.status_code == 429:
-                # Rate limited — respect Retry-After header
-                retry_after = int(response.headers.get("Retry-After", RETRY_DELAYS[attempt]))
-                log.warning("LLM rate limited (429), retrying in %ds (attempt %d/%d)", retry_after, attempt + 1, MAX_RETRIES)
-                time.sleep(retry_after)
+                # Rate limited — every worker waits out Retry-After, then at half the rate
+                retry_after = _parse_seconds(response.headers.get("Retry-After"))
+                if retry_after is None:
+                    retry_after = RETRY_DELAYS[attempt]
+                limiter.on_rate_limited(retry_after)
+                log.warning("LLM rate limited (429), retrying in %.0fs (attempt %d/%d)", retry_after, attempt + 1, MAX_RETRIES)
                 continue
 
             if response.status_code >= 500:
                 # Server error — retry with backoff
                 delay = RETRY_DELAYS[attempt]
                 log.warning("LLM server error %d, retrying in %ds (attempt %d/%d)", response.status_code, delay, attempt + 1, MAX_RETRIES)
-                time.sleep(delay)
+                await asyncio.sleep(min(delay, max(0.0, expires - time.monotonic())))
                 continue
 
             if response.status_code != 200:
                 log.error("LLM API error: %d %s", response.status_code, response.text[:200])
                 return None
 
-            content = response.json()["choices"][0]["message"]["content"]
-            # Strip markdown code fences if present
-            content = content.strip()
-            if content.startswith("```"):
-                content = re.sub(r"^```(?:json)?\s*", "", content)
-                content = re.sub(r"\s*```$", "", content)
+            limiter.on_success(response.headers)
+            return response.json()["choices"][0]["message"]["content"]
 
-            return json.loads(content)
-
-        except (json.JSONDecodeError, KeyError, IndexError) as e:
+        except asyncio.TimeoutError:
+            break
+        except (json.JSONDecodeError, KeyError, IndexError, TypeError) as e:
             log.error("LLM response parse error: %s", e)
             return None
         except httpx.HTTPError as e:
             delay = RETRY_DELAYS[attempt]
             log.warning("LLM request failed: %s, retrying in %ds (attempt %d/%d)", e, delay, attempt + 1, MAX_RETRIES)
-            time.sleep(delay)
+            await asyncio.sleep(min(delay, max(0.0, expires - time.monotonic())))
 
-    log.error("LLM classify failed after %d retries", MAX_RETRIES)
+    if time.monotonic() >= expires:
+        log.error("LLM request exceeded its %.0fs deadline", deadline)
+    else:
+        log.error("LLM request failed after %d retries", MAX_RETRIES)
     return None
 
 
+def _parse_llm_json(content: str):
+    """json.loads the model output, tolerating markdown code fences."""
+    content = (content or "").strip()
+    if content.startswith("```"):
+        content = re.sub(r"^```(?:json)?\s*", "", content)
+        content = re.sub(r"\s*```$", "", content)
+    return json.loads(content)
+
+
+def llm_cache_key(ad: dict) -> str:
+    """Cache key for an ad's classification — only the fields the prompt depends on."""
+    fields = _prompt_fields(ad)
+    return cache_key(LLM_PROMPT_VERSION, LLM_MODEL, fields["title"], fields["description"], fields["location"])
+
+
+async def _classify_one(client, limiter, ad: dict, deadline: float) -> dict | None:
+    prompt = LLM_PROMPT_TEMPLATE.format(**_prompt_fields(ad))
+    content = await _openrouter_post(client, limiter, prompt, LLM_MAX_TOKENS, deadline=deadline)
+    if content is None:
+        return None
+    try:
+        return _parse_llm_json(content)
+    except json.JSONDecodeError as e:
+        log.error("LLM response parse error: %s", e)
+        return None
+
+
+def _batch_keys(ads: list[dict]) -> list[str]:
+    """Unique id per ad for a batched prompt — adid, or its position if missing/duplicated."""
+    keys: list[str] = []
+    for i, ad in enumerate(ads):
+        key = str(ad.get("adid") or "")
+        if not key or key in keys:
+            key = f"ad-{i + 1}"
+        keys.append(key)
+    return keys
+
+
+async def _classify_batch(client, limiter, ads: list[dict], deadline: float) -> list[dict | None]:
+    """Classify several ads in one request; ads the response doesn't cover are retried alone."""
+    if len(ads) == 1:
+        return [await _classify_one(client, limiter, ads[0], deadline)]
+
+    keys = _batch_keys(ads)
+    blocks = "\n\n".join(
+        LLM_BATCH_AD_TEMPLATE.format(adid=key, **_prompt_fields(ad)) for key, ad in zip(keys, ads)
+    )
+    prompt = LLM_BATCH_PROMPT_TEMPLATE.format(ads=blocks)
+    content = await _openrouter_post(
+        client, limiter, prompt, LLM_BATCH_TOKENS_PER_AD * len(ads), json_mode=True, deadline=deadline
+    )
+
+    by_key: dict[str, dict] = {}
+    if content is not None:
+        try:
+            parsed = _parse_llm_json(content)
+            items = parsed.get("results") if isinstance(parsed, dict) else parsed
+            for item in items or []:
+                if isinstance(item, dict) and item.get("classification"):
+                    by_key[str(item.get("adid"))] = item
+        except (json.JSONDecodeError, AttributeError, TypeError) as e:
+            log.warning("Batched LLM response unparseable (%s) — falling back to per-ad calls", e)
+
+    missing = [i for i, key in enumerate(keys) if key not in by_key]
+    for i in missing:
+        log.info('  [llm] No batched result for "%s" — classifying alone', (ads[i].get("title") or "?")[:50])
+    retried = await asyncio.gather(*(_classify_one(client, limiter, ads[i], deadline) for i in missing))
+
+    results: list[dict | None] = []
+    for key in keys:
+        enrichment = by_key.get(key)
+        if enrichment is not None:
+            enrichment.pop("adid", None)
+        results.append(enrichment)
+    for i, enrichment in zip(missing, retried):
+        results[i] = enrichment
+    return results
+
+
+async def classify_ads(
+    ads: list[dict],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate: float = DEFAULT_LLM_RATE,
+    deadline: float = LLM_DEADLINE,
+    limiter: AdaptiveRateLimiter | None = None,
+) -> list[dict | None]:
+    """
+    Classify ads with a pool of `concurrency` workers sharing one rate limiter.
+    Returns one enrichment (or None on failure) per ad, in input order.
+    """
+    results: list[dict | None] = [None] * len(ads)
+    if not OPENROUTER_API_KEY or not ads:
+        return results
+
+    batch_size = max(1, batch_size)
+    limiter = limiter or AdaptiveRateLimiter(rate=rate)
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for start in range(0, len(ads), batch_size):
+        queue.put_nowait(start)
+    total_batches = queue.qsize()
+
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=max(1, concurrency))) as client:
+
+        async def worker() -> None:
+            while True:
+                try:
+                    start = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                batch = ads[start:start + batch_size]
+                if len(batch) == 1:
+                    log.info('LLM classifying (%d/%d): "%s"', start + 1, len(ads), batch[0].get('title', '?')[:50])
+                else:
+                    log.info("LLM classifying ads %d-%d of %d", start + 1, start + len(batch), len(ads))
+                results[start:start + len(batch)] = await _classify_batch(client, limiter, batch, deadline)
+
+        await asyncio.gather(*(worker() for _ in range(min(max(1, concurrency), total_batches))))
+    return results
+
+
+def llm_classify(ad: dict) -> dict | None:
+    """Classify and enrich a single Gumtree ad via gpt-4o-mini on OpenRouter."""
+    return asyncio.run(classify_ads([ad], batch_size=1, concurrency=1))[0]
+
+
 # ── Lead assembly ────────────────────────────────────────────
 
 def gumtree_ad_to_lead(ad: dict, enrichment: dict) -> dict:
@@ -342,61 +608,9 @@ def gumtree_ad_to_lead(ad: dict, enrichment: dict) -> dict:
     }
 
 
-# ── Webhook POST ─────────────────────────────────────────────
-
-def post_to_webhook(leads: list[dict], batch_id: str) -> dict | None:
-    """POST the B2C batch to the n8n webhook. Returns response JSON or None.
-
-    Retries on 5xx and timeout errors with exponential backoff.
-    4xx errors fail immediately (client error — don't retry).
-    """
-    if not B2C_WEBHOOK_URL:
-        log.error("B2C_WEBHOOK_URL not set in .env")
-        return None
-    if not B2C_WEBHOOK_TOKEN:
-        log.error("B2C_WEBHOOK_TOKEN not set in .env")
-        return None
-
-    payload = {
-        "batch_id": batch_id,
-        "segment": "B2C",
-        "leads": leads,
-    }
-
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = httpx.post(
-                B2C_WEBHOOK_URL,
-                json=payload,
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {B2C_WEBHOOK_TOKEN}",
-                },
-                timeout=60.0,
-            )
-            log.info("Webhook response: %d", response.status_code)
-            if response.status_code == 200:
-                return response.json()
-            if response.status_code >= 500:
-                delay = RETRY_DELAYS[attempt]
-                log.warning("Webhook server error %d, retrying in %ds (attempt %d/%d)", response.status_code, delay, attempt + 1, MAX_RETRIES)
-                time.sleep(delay)
-                continue
-            # 4xx — client error, don't retry
-            log.error("Webhook error %d: %s", response.status_code, response.text[:500])
-            return None
-        except (httpx.HTTPError, httpx.TimeoutException) as e:
-            delay = RETRY_DELAYS[attempt]
-            log.warning("Webhook request failed: %s, retrying in %ds (attempt %d/%d)", e, delay, attempt + 1, MAX_RETRIES)
-            time.sleep(delay)
-
-    log.error("Webhook POST failed after %d retries", MAX_RETRIES)
-    return None
-
-
 # ── CLI + Main ───────────────────────────────────────────────
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     today = datetime.now().strftime("%Y-%m-%d")
     default_input = str(
         Path(__file__).parent.parent / "memory" / f"gumtree-leads-{today}.json"
@@ -407,16 +621,56 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument(
         "--input", type=str, default=default_input,
-        help="Input JSON file from gumtree_scrapling.py (default: today's file)"
+        help="Input JSON or NDJSON file from gumtree_scrapling.py (default: today's file)"
     )
     parser.add_argument(
         "--dry-run", action="store_true",
         help="Classify and enrich but don't POST to webhook"
     )
+    parser.add_argument(
+        "--no-post", action="store_true",
+        help="Classify and enrich (API key required) but leave the POST to the caller — use with --out"
+    )
+    parser.add_argument(
+        "--out", type=str, default=None,
+        help="Write the qualified leads to this JSON file"
+    )
     parser.add_argument(
         "--skip-llm", action="store_true",
         help="Apply pre-filter only, no LLM classification"
     )
+    parser.add_argument(
+        "--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+        help=f"Ads per LLM request (default: {DEFAULT_BATCH_SIZE}; 1 = one request per ad)"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+        help=f"LLM requests in flight at once (default: {DEFAULT_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--llm-rate", type=float, default=DEFAULT_LLM_RATE,
+        help=f"Starting LLM request rate per second; adapts to 429s (default: {DEFAULT_LLM_RATE})"
+    )
+    parser.add_argument(
+        "--llm-deadline", type=float, default=LLM_DEADLINE,
+        help=f"Seconds before an LLM request is abandoned, retries included (default: {LLM_DEADLINE:.0f})"
+    )
+    parser.add_argument(
+        "--llm-cache", type=str, default=str(LLM_CACHE_PATH),
+        help="Persistent LLM classification cache (SQLite)"
+    )
+    parser.add_argument(
+        "--no-llm-cache", action="store_true",
+        help="Always call the LLM, ignoring cached classifications"
+    )
+    parser.add_argument(
+        "--seen-db", type=str, default=str(SEEN_INDEX_PATH),
+        help="Gumtree seen-ad index to mark handled ads in (SQLite)"
+    )
+    parser.add_argument(
+        "--no-seen", action="store_true",
+        help="Don't mark ads handled in the seen index"
+    )
     parser.add_argument(
         "--whatsapp", action="store_true",
         help="Enrich leads with WhatsApp profile names (requires lookup service running)"
@@ -425,41 +679,48 @@ def parse_args() -> argparse.Namespace:
         "--whatsapp-url", type=str, default=None,
         help="Override WHATSAPP_LOOKUP_URL (e.g. http://127.0.0.1:3457 for Phone 1 fallback)"
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--wa-concurrency", type=int, default=LOOKUP_CONCURRENCY,
+        help=f"WhatsApp lookups in flight at once (default: {LOOKUP_CONCURRENCY})"
+    )
+    return parser.parse_args(argv)
 
 
-def main() -> None:
-    setup_logging()
-    args = parse_args()
+def run(args: argparse.Namespace, ads: list[dict] | None = None) -> dict:
+    """Filter, classify and POST; returns the stdout summary.
 
-    # ── Override WhatsApp URL if specified ──
-    global WHATSAPP_LOOKUP_URL
+    ads: scraper output already in memory (b2c_run.py's in-process mode);
+    when None the ads are read from --input.
+    """
     if args.whatsapp_url:
-        WHATSAPP_LOOKUP_URL = args.whatsapp_url
-        log.info("WhatsApp URL overridden to %s", WHATSAPP_LOOKUP_URL)
+        log.info("WhatsApp URL overridden to %s", args.whatsapp_url)
 
     # ── Load input ──
-    input_path = args.input
-    if not Path(input_path).exists():
-        log.error("Input file not found: %s", input_path)
-        log.error("Run gumtree_scrapling.py first, or use --input to specify a file")
-        sys.exit(1)
-
-    with open(input_path, encoding="utf-8") as f:
-        ads = json.load(f)
+    if ads is not None:
+        log.info("Received %d ads in memory", len(ads))
+    else:
+        input_path = args.input
+        if not Path(input_path).exists() and Path(input_path).with_suffix(".ndjson").exists():
+            input_path = str(Path(input_path).with_suffix(".ndjson"))
+        if not Path(input_path).exists():
+            log.error("Input file not found: %s", input_path)
+            log.error("Run gumtree_scrapling.py first, or use --input to specify a file")
+            return {"ok": False, "error": f"input file not found: {input_path}"}
 
-    if not isinstance(ads, list):
-        log.error("Expected JSON array, got %s", type(ads).__name__)
-        sys.exit(1)
+        try:
+            ads = read_leads(input_path)
+        except ValueError as e:
+            log.error("%s", e)
+            return {"ok": False, "error": str(e)}
+        log.info("Loaded %d ads from %s", len(ads), input_path)
 
     total = len(ads)
-    log.info("Loaded %d ads from %s", total, input_path)
 
     # ── Check env for non-dry-run ──
     if not args.dry_run and not args.skip_llm and not OPENROUTER_API_KEY:
         log.error("OPENROUTER_API_KEY not set in .env")
         log.error("Set it or use --skip-llm to run without LLM classification")
-        sys.exit(1)
+        return {"ok": False, "error": "OPENROUTER_API_KEY not set"}
 
     # ── Phase 1: Pre-filter ──
     pre_filtered: list[dict] = []
@@ -481,25 +742,51 @@ def main() -> None:
         for ad in pre_filtered:
             log.debug('  [?] "%s" | phone: %s', ad.get('title', '?')[:60], ad.get('phone') or 'none')
 
-        result = {"ok": True, "total": total, "pre_filtered": len(pre_rejected), "passed": len(pre_filtered)}
-        print(json.dumps(result))
-        return
+        return {"ok": True, "total": total, "pre_filtered": len(pre_rejected), "passed": len(pre_filtered)}
 
     # ── Phase 2: LLM classification + enrichment ──
     buyers: list[dict] = []
     llm_rejected: list[tuple[dict, str]] = []
     wa_resolved = 0
     wa_attempted = 0
-
+    wa_known = 0
+    # A WhatsApp name found on an earlier run (or by outreach) isn't looked up again,
+    # and a number /lookup answered recently (even "not on WhatsApp") isn't re-asked
+    identities = IdentityIndex() if args.whatsapp else None
+    wa_lookups = WhatsAppLookup(
+        args.whatsapp_url, WhatsAppLookupCache(), concurrency=args.wa_concurrency,
+    ) if args.whatsapp else None
+
+    # Ads classified on an earlier run (same prompt version + content) come from the cache
+    llm_cache = None if args.no_llm_cache else LlmCache(args.llm_cache)
+    enrichments: list[dict | None] = [None] * len(pre_filtered)
+    uncached: list[int] = []
     for i, ad in enumerate(pre_filtered):
-        if i > 0:
-            time.sleep(0.2)  # Rate limit: 200ms between LLM calls
-
-        log.info('LLM classifying (%d/%d): "%s"', i + 1, len(pre_filtered), ad.get('title', '?')[:50])
-
-        enrichment = llm_classify(ad)
+        cached = llm_cache.get(llm_cache_key(ad)) if llm_cache is not None else None
+        if cached is not None:
+            enrichments[i] = cached
+        else:
+            uncached.append(i)
+    if llm_cache is not None:
+        log.info("LLM cache: %d hits, %d to classify", len(pre_filtered) - len(uncached), len(uncached))
+
+    limiter = AdaptiveRateLimiter(rate=args.llm_rate)
+    to_classify = [pre_filtered[i] for i in uncached]
+    results = asyncio.run(classify_ads(
+        to_classify,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        deadline=args.llm_deadline,
+        limiter=limiter,
+    ))
+    for i, enrichment in zip(uncached, results):
+        enrichments[i] = enrichment
+        if enrichment and llm_cache is not None:
+            llm_cache.put(llm_cache_key(pre_filtered[i]), enrichment)
+
+    for ad, enrichment in zip(pre_filtered, enrichments):
         if not enrichment:
-            llm_rejected.append((ad, "LLM call failed"))
+            llm_rejected.append((ad, LLM_FAILED))
             continue
 
         classification = enrichment.get("classification", "IRRELEVANT")
@@ -511,25 +798,36 @@ def main() -> None:
                 llm_rejected.append((ad, f"BUYER but score too low ({composite:.1f})"))
                 log.info("  [~] BUYER but composite %.1f < 5 — skipped", composite)
             else:
-                lead = gumtree_ad_to_lead(ad, enrichment)
-
-                # WhatsApp name enrichment (if enabled and lead has a phone)
-                if args.whatsapp and lead.get("phone"):
-                    wa_attempted += 1
-                    wa_name = whatsapp_lookup(lead["phone"], args.whatsapp_url)
-                    if wa_name:
-                        lead["full_name"] = wa_name
-                        wa_resolved += 1
-                        log.info("  [wa] Resolved name: %s", wa_name)
-                    else:
-                        log.info("  [wa] No WhatsApp name for %s", lead['phone'])
-
-                buyers.append(lead)
+                buyers.append(gumtree_ad_to_lead(ad, enrichment))
                 log.info("  [+] BUYER (score %.1f): %s", composite, reason)
         else:
             llm_rejected.append((ad, f"{classification}: {reason}"))
             log.debug("  [-] %s: %s", classification, reason)
 
+    # WhatsApp name enrichment (if enabled): names known to the identity index
+    # first, then cached / concurrent /lookup calls for the rest
+    if args.whatsapp:
+        to_lookup: list[tuple[dict, int | None]] = []
+        for lead in buyers:
+            if not lead.get("phone"):
+                continue
+            identity = identities.resolve(lead_keys(lead, "gumtree"), "gumtree")
+            wa_name = identities.detail(identity, ENRICHED)
+            if wa_name:
+                wa_known += 1
+                lead["full_name"] = wa_name
+            else:
+                to_lookup.append((lead, identity))
+        wa_attempted = len(to_lookup)
+        for (lead, identity), wa_name in wa_lookups.lookup_iter(to_lookup, phone=lambda t: t[0]["phone"]):
+            if wa_name:
+                identities.record(identity, ENRICHED, wa_name)
+                wa_resolved += 1
+                lead["full_name"] = wa_name
+                log.info("  [wa] Resolved name: %s", wa_name)
+            else:
+                log.info("  [wa] No WhatsApp name for %s", lead['phone'])
+
     # ── Report ──
     log.info("")
     log.info("=" * 60)
@@ -537,22 +835,50 @@ def main() -> None:
     log.info("  Total ads loaded:      %d", total)
     log.info("  Pre-filter rejected:   %d", len(pre_rejected))
     log.info("  LLM classified:        %d", len(pre_filtered))
+    log.info(
+        "  LLM requests:          %d (%d rate-limited, final rate %.1f/s)",
+        limiter.stats["requests"], limiter.stats["rate_limited"], limiter.rate,
+    )
+    if llm_cache is not None:
+        log.info(
+            "  LLM cache:             %d hits, %d misses, %d evicted",
+            llm_cache.stats["hits"], llm_cache.stats["misses"], llm_cache.stats["evicted"],
+        )
+        llm_cache.close()
     log.info("  LLM rejected:          %d", len(llm_rejected))
     log.info("  Qualified buyers:      %d", len(buyers))
     if args.whatsapp:
-        log.info("  WhatsApp:              %d/%d resolved", wa_resolved, wa_attempted)
+        log.info(
+            "  WhatsApp:              %d/%d resolved, %d already known, %d from lookup cache",
+            wa_resolved, wa_attempted, wa_known, wa_lookups.stats["cached"],
+        )
+        identities.close()
+        wa_lookups.cache.close()
     log.info("=" * 60)
 
+    # Rejections are final (a failed LLM call isn't one); buyers are handled once POSTed
+    if not args.dry_run and not args.no_seen:
+        rejected = [ad.get("url") for ad, _ in pre_rejected]
+        rejected += [ad.get("url") for ad, reason in llm_rejected if reason != LLM_FAILED]
+        with SeenIndex(args.seen_db) as seen:
+            log.info("Seen index: %d rejected ads marked handled", seen.mark_handled(rejected))
+
+    out = {}
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(buyers, f, indent=2, ensure_ascii=False)
+        log.info("Qualified leads → %s", args.out)
+        out["out"] = args.out
+
     if not buyers:
         log.info("No qualified buyer leads found. Nothing to POST.")
-        result = {
+        return {
             "ok": True, "total": total,
             "pre_filtered": len(pre_rejected),
             "llm_rejected": len(llm_rejected),
-            "qualified": 0, "posted": False,
+            "qualified": 0, "posted": False, **out,
         }
-        print(json.dumps(result))
-        return
 
     # Print qualified leads
     for lead in buyers:
@@ -568,41 +894,54 @@ def main() -> None:
         log.debug("    Opener:   %s...", (lead['call_script_opener'] or '')[:100])
 
     # ── Phase 3: POST to webhook ──
-    if args.dry_run:
-        log.info("--dry-run: %d leads would be POSTed (skipped)", len(buyers))
-        result = {
+    if args.dry_run or args.no_post:
+        if args.dry_run:
+            log.info("--dry-run: %d leads would be POSTed (skipped)", len(buyers))
+        else:
+            log.info("--no-post: %d leads left for the caller to POST", len(buyers))
+        return {
             "ok": True, "total": total,
             "pre_filtered": len(pre_rejected),
             "llm_rejected": len(llm_rejected),
-            "qualified": len(buyers), "posted": False, "dry_run": True,
+            "qualified": len(buyers), "posted": False, "dry_run": args.dry_run, **out,
         }
-        print(json.dumps(result))
-        return
 
     batch_id = f"B2C-BATCH-{datetime.now().strftime('%Y-%m-%d')}-GUMTREE-001"
     log.info("POSTing %d leads as batch %s", len(buyers), batch_id)
 
-    webhook_result = post_to_webhook(buyers, batch_id)
-    if webhook_result:
-        log.info("Webhook result: %s", json.dumps(webhook_result, indent=2))
-        result = {
+    webhook_result = post_new_leads(buyers, batch_id, "gumtree")
+    if webhook_result is not None:
+        if not args.no_seen:
+            with SeenIndex(args.seen_db) as seen:
+                seen.mark_handled(lead["intent_source_url"] for lead in buyers)
+        if webhook_result["response"] is not None:
+            log.info("Webhook result: %s", json.dumps(webhook_result["response"], indent=2))
+        return {
             "ok": True, "total": total,
             "pre_filtered": len(pre_rejected),
             "llm_rejected": len(llm_rejected),
-            "qualified": len(buyers), "posted": True,
-            "webhook_response": webhook_result,
-        }
-    else:
-        log.error("Webhook POST failed")
-        result = {
-            "ok": False, "total": total,
-            "pre_filtered": len(pre_rejected),
-            "llm_rejected": len(llm_rejected),
-            "qualified": len(buyers), "posted": False,
-            "error": "webhook POST failed",
+            "qualified": len(buyers), "posted": webhook_result["posted"] > 0,
+            "already_posted": webhook_result["skipped"],
+            "already_in_notion": webhook_result["in_notion"],
+            "webhook_response": webhook_result["response"], **out,
         }
 
+    log.error("Webhook POST failed")
+    return {
+        "ok": False, "total": total,
+        "pre_filtered": len(pre_rejected),
+        "llm_rejected": len(llm_rejected),
+        "qualified": len(buyers), "posted": False,
+        "error": "webhook POST failed", **out,
+    }
+
+
+def main() -> None:
+    setup_logging()
+    result = run(parse_args())
     print(json.dumps(result))
+    if not result["ok"]:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -4,26 +4,42 @@
 # Pulls negative reviews from Cartrack competitors (Netstar,
 # Tracker Connect) via Hellopeter's public API. These are people
 # unhappy with their current tracker — prime Cartrack prospects.
+# Competitors, their page budgets, rating thresholds and scoring
+# weights live in hellopeter_competitors.json.
 # =============================================================
 # Usage:
 #   uv run python scripts/hellopeter_scraper.py
 #   uv run python scripts/hellopeter_scraper.py --max 50 --days 30
 #   uv run python scripts/hellopeter_scraper.py --out /tmp/hellopeter-leads.json
 #   uv run python scripts/hellopeter_scraper.py --post          # POST to B2C webhook
+#   uv run python scripts/hellopeter_scraper.py --offline       # replay API pages from the HTTP cache
+#   uv run python scripts/hellopeter_scraper.py --ndjson        # stream leads to disk as they qualify, ranked at the end
+#   uv run python scripts/hellopeter_scraper.py --days 7 --concurrency 2   # stops paging at the 7-day cutoff
+#   uv run python scripts/hellopeter_scraper.py --incremental   # fetch only reviews newer than the last sync
+#   uv run python scripts/hellopeter_scraper.py --competitors /tmp/competitors.json --max-requests 40
 # =============================================================
 
 import argparse
 import json
 import logging
-import os
 import sys
-import time
+import threading
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
 
-import httpx
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cogstack_leadgen.host_budget import HostBudget
+from cogstack_leadgen.http_cache import DEFAULT_DIR as HTTP_CACHE_DIR, HttpCache
+from cogstack_leadgen.keyword_matcher import KeywordMatcher
+from cogstack_leadgen.lead_io import NdjsonWriter, write_ndjson
+from cogstack_leadgen.review_store import DEFAULT_PATH as REVIEW_STORE_PATH, ReviewStore
+from cogstack_leadgen.logs import setup_logging as _setup_logging
+from cogstack_leadgen.identity import normalise_name
+from cogstack_leadgen.webhook import post_new_leads
+
 load_dotenv()
 
 # ── Logging ──────────────────────────────────────────────────
@@ -32,72 +48,194 @@ log = logging.getLogger("hellopeter")
 
 
 def setup_logging() -> None:
-    """Configure console + file logging."""
-    log.setLevel(logging.DEBUG)
-
-    console = logging.StreamHandler(sys.stderr)
-    console.setLevel(logging.INFO)
-    console.setFormatter(logging.Formatter("[%(name)s] %(levelname)s: %(message)s"))
-    log.addHandler(console)
-
-    log_dir = Path(__file__).parent.parent / "logs"
-    log_dir.mkdir(exist_ok=True)
-    today = datetime.now().strftime("%Y-%m-%d")
-    fh = logging.FileHandler(log_dir / f"b2c-hellopeter-{today}.log", encoding="utf-8")
-    fh.setLevel(logging.DEBUG)
-    fh.setFormatter(logging.Formatter("%(asctime)s [%(name)s] %(levelname)s: %(message)s"))
-    log.addHandler(fh)
-
+    """Configure console + file logging (logs/b2c-hellopeter-YYYY-MM-DD.log)."""
+    _setup_logging(log, "b2c-hellopeter")
 
-# ── Retry constants ──────────────────────────────────────────
-
-MAX_RETRIES = 3
-RETRY_DELAYS = [2, 5, 15]  # seconds
 
 # ── Config ───────────────────────────────────────────────────
 
 HELLOPETER_API = "https://api.hellopeter.com/consumer/business"
 
-# Cartrack competitors — slug must match Hellopeter URL
-COMPETITORS = [
-    {"slug": "netstar", "name": "Netstar"},
-    {"slug": "tracker-connect", "name": "Tracker Connect"},
-]
+# HTTP cache freshness for review pages — the twice-daily runs are 12h
+# apart, so a cached page only helps re-runs within the same hour.
+REVIEWS_TTL = 60 * 60
+
+# Review pages in flight at once (every competitor shares the API host),
+# and the minimum spacing between request starts — the old serial delay.
+# hellopeter_competitors.json's request_budget overrides both.
+FETCH_CONCURRENCY = 4
+PAGE_INTERVAL = 0.3
+
+# Competitor registry — slugs (must match the Hellopeter URL) with their
+# own page budget, rating threshold and scoring weights, plus the global
+# request budget for the whole run.
+COMPETITORS_CONFIG = Path(__file__).parent.parent / "hellopeter_competitors.json"
+
+COMPETITOR_DEFAULTS = {
+    "max_pages": None,  # None: sized from --max (11 reviews/page, most filtered out)
+    "max_rating": 2,
+    "min_composite": 4,
+    "weights": {"intent": 0.6, "urgency": 0.4},
+}
+
+
+def load_competitors(path: Path | str = COMPETITORS_CONFIG) -> tuple[list[dict], dict]:
+    """Read the registry; returns (enabled competitors with defaults filled in, request_budget)."""
+    config = json.loads(Path(path).read_text(encoding="utf-8"))
+    defaults = {**COMPETITOR_DEFAULTS, **config.get("defaults", {})}
+    competitors = []
+    for entry in config.get("competitors", []):
+        if not entry.get("slug") or not entry.get("name"):
+            raise ValueError(f"competitor entry needs a slug and a name: {entry}")
+        if not entry.get("enabled", True):
+            continue
+        comp = {**defaults, **entry}
+        comp["weights"] = {**COMPETITOR_DEFAULTS["weights"], **defaults.get("weights", {}), **entry.get("weights", {})}
+        competitors.append(comp)
+    return competitors, config.get("request_budget", {})
+
+
+def composite_score(lead: dict, weights: dict) -> float:
+    return lead["intent_strength"] * weights["intent"] + lead["urgency_score"] * weights["urgency"]
 
-B2C_WEBHOOK_URL = os.environ.get("B2C_WEBHOOK_URL")
-B2C_WEBHOOK_TOKEN = os.environ.get("B2C_WEBHOOK_TOKEN") or os.environ.get("WEBHOOK_TOKEN")
 
 # ── Scraper ──────────────────────────────────────────────────
 
-def fetch_reviews(slug: str, max_pages: int = 20) -> list[dict]:
-    """Fetch reviews from Hellopeter API. Returns raw review dicts."""
-    from scrapling.fetchers import Fetcher
+def _review_date(review: dict) -> datetime | None:
+    try:
+        return datetime.strptime(review.get("created_at", ""), "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
 
-    all_reviews = []
-    for page_num in range(1, max_pages + 1):
-        url = f"{HELLOPETER_API}/{slug}/reviews?page={page_num}"
-        try:
-            resp = Fetcher.get(url, stealthy_headers=True, timeout=20, retries=2)
-            body = resp.body.decode("utf-8", errors="ignore") if isinstance(resp.body, bytes) else str(resp.body)
-            data = json.loads(body)
-        except Exception as e:
-            log.warning("Error fetching page %d for %s: %s", page_num, slug, e)
-            break
 
-        reviews = data.get("data", [])
-        if not reviews:
-            break
+class RequestBudgetExhausted(Exception):
+    """Raised instead of a fetch once the run's max_requests have been spent."""
 
-        all_reviews.extend(reviews)
 
-        last_page = data.get("last_page", page_num)
-        if page_num >= last_page:
-            break
+def fetch_reviews(
+    max_pages: dict[str, int],
+    cache: HttpCache | None = None,
+    cutoffs: dict[str, datetime] | None = None,
+    concurrency: int = FETCH_CONCURRENCY,
+    min_interval: float = PAGE_INTERVAL,
+    max_requests: int | None = None,
+) -> tuple[dict[str, list[dict]], set[str]]:
+    """
+    Fetch review pages for every slug (slug → its page budget) concurrently.
+    Returns (slug → raw review dicts newest first, slugs fetched completely).
+
+    max_requests caps API requests across all slugs (cache hits are free);
+    pages are handed out round-robin, so the budget is shared evenly and a
+    new competitor costs pages, not another serial pass.
+
+    Reviews come back newest-first, so once a page's oldest review is at
+    or before the slug's cutoff (the --days window, or its sync mark) no
+    later page is needed and the slug stops there. Pages already in
+    flight past that point (at most concurrency-1) are discarded, as is
+    everything after a page that failed to fetch. A slug is complete when
+    it stopped at its cutoff or the last page — not on an error, its page
+    budget or the request budget.
+    """
+    cutoffs = cutoffs or {}
+    from scrapling.fetchers import Fetcher
 
-        # Polite delay
-        time.sleep(0.3)
+    # All slugs live on one API host: one politeness budget (cache hits skip it)
+    budget = HostBudget(max(1, concurrency), min_interval, 0)
+    requests = 0
+    exhausted = threading.Event()
+
+    lock = threading.Lock()  # guards requests, next_task, limit, ended_by, pages
+
+    def fetch(url: str, headers: dict):
+        nonlocal requests
+        with lock:
+            if max_requests is not None and requests >= max_requests:
+                exhausted.set()
+                raise RequestBudgetExhausted(url)
+            requests += 1
+        kwargs = {"headers": headers} if headers else {}
+        with budget.slot():
+            return Fetcher.get(url, stealthy_headers=True, timeout=20, retries=2, **kwargs)
+
+    # Round-robin over slugs, page 1 first, so every competitor progresses together
+    slugs = list(max_pages)
+    tasks = [
+        (slug, page)
+        for page in range(1, max(max_pages.values(), default=0) + 1)
+        for slug in slugs
+        if page <= max_pages[slug]
+    ]
+    limit = dict(max_pages)  # last page still worth fetching
+    ended_by = {slug: "max_pages" for slug in slugs}  # why limit has its current value
+    pages: dict[str, dict[int, list[dict]]] = {slug: {} for slug in slugs}
+    next_task = 0
+
+    def worker() -> None:
+        nonlocal next_task
+        while not exhausted.is_set():
+            with lock:
+                while next_task < len(tasks) and tasks[next_task][1] > limit[tasks[next_task][0]]:
+                    next_task += 1
+                if next_task >= len(tasks):
+                    return
+                slug, page_num = tasks[next_task]
+                next_task += 1
+
+            url = f"{HELLOPETER_API}/{slug}/reviews?page={page_num}"
+            try:
+                if cache is not None:
+                    resp = cache.get(url, fetch, REVIEWS_TTL, cacheable=lambda b: b.lstrip().startswith(b"{"))
+                else:
+                    resp = fetch(url, {})
+                body = resp.body.decode("utf-8", errors="ignore") if isinstance(resp.body, bytes) else str(resp.body)
+                data = json.loads(body)
+            except Exception as e:
+                reason = "budget" if isinstance(e, RequestBudgetExhausted) else "error"
+                if reason == "error":
+                    log.warning("Error fetching page %d for %s: %s", page_num, slug, e)
+                with lock:
+                    if page_num - 1 < limit[slug]:
+                        limit[slug], ended_by[slug] = page_num - 1, reason
+                continue
 
-    return all_reviews
+            reviews = data.get("data", [])
+            with lock:
+                if not reviews:
+                    if page_num - 1 <= limit[slug]:
+                        limit[slug], ended_by[slug] = page_num - 1, "end"
+                    continue
+                pages[slug][page_num] = reviews
+                if data.get("last_page", page_num) <= limit[slug]:
+                    limit[slug], ended_by[slug] = data.get("last_page", page_num), "end"
+                oldest = _review_date(reviews[-1])
+                cutoff = cutoffs.get(slug)
+                if cutoff is not None and oldest is not None and oldest <= cutoff and page_num <= limit[slug]:
+                    log.debug("%s: page %d reaches the cutoff — not fetching further", slug, page_num)
+                    limit[slug], ended_by[slug] = page_num, "cutoff"
+
+    workers = [
+        threading.Thread(target=worker, name=f"hellopeter-fetch-{i}", daemon=True)
+        for i in range(max(1, min(concurrency, len(tasks))))
+    ]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    if exhausted.is_set():
+        log.warning("Request budget of %d spent — remaining pages skipped", max_requests)
+    log.info("Review pages: %d API requests", requests)
+
+    result = {}
+    complete = set()
+    for slug in slugs:
+        fetched = sorted(p for p in pages[slug] if p <= limit[slug])
+        # A gap means an earlier page failed; keep only the unbroken run from page 1
+        kept = [p for i, p in enumerate(fetched, 1) if p == i]
+        result[slug] = [r for p in kept for r in pages[slug][p]]
+        if ended_by[slug] in ("end", "cutoff") and len(kept) == limit[slug]:
+            complete.add(slug)
+        log.debug("%s: %d pages kept, %d fetched, ended by %s", slug, len(kept), len(pages[slug]), ended_by[slug])
+    return result, complete
 
 
 def filter_negative_reviews(
@@ -116,12 +254,8 @@ def filter_negative_reviews(
             continue
 
         # Date filter
-        created = r.get("created_at", "")
-        try:
-            review_date = datetime.strptime(created, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
-            if review_date < cutoff:
-                continue
-        except ValueError:
+        review_date = _review_date(r)
+        if review_date is None or review_date < cutoff:
             continue
 
         filtered.append(r)
@@ -131,9 +265,10 @@ def filter_negative_reviews(
 
 # ── Churn signal keywords ────────────────────────────────────
 
+# Whole-word matching; "*" marks a stem ("cancel*" covers cancelled/cancelling)
 CHURN_KEYWORDS = [
-    "cancel", "cancellation", "want to cancel",
-    "switch", "switching", "moving to",
+    "cancel*", "cancellation", "want to cancel",
+    "switch*", "switching", "moving to",
     "terrible", "worst", "disgusted", "furious",
     "stolen", "car was stolen", "vehicle stolen",
     "no response", "no one answers", "ignored",
@@ -142,6 +277,14 @@ CHURN_KEYWORDS = [
     "uninstall", "remove tracker",
     "looking for alternative", "another company",
 ]
+CHURN_MATCHER = KeywordMatcher(CHURN_KEYWORDS)
+
+_LEAVING = {"cancel*", "cancellation", "want to cancel", "switch*", "switching", "moving to", "another company"}
+_THEFT = {"stolen", "car was stolen", "vehicle stolen"}
+_ANGRY = {"furious", "disgusted", "worst", "terrible"}
+# Call opener "considering alternatives": any cancel/switch hit. Stems are reported
+# as "cancel*"/"switch*", so test the keywords as listed, never the bare word.
+_CONSIDERING = {"cancel*", "cancellation", "want to cancel", "switch*", "switching"}
 
 
 def score_churn_intent(review: dict) -> tuple[int, int, list[str]]:
@@ -149,23 +292,25 @@ def score_churn_intent(review: dict) -> tuple[int, int, list[str]]:
     Score a review for churn intent and urgency.
     Returns (intent_strength 0-10, urgency_score 0-10, matched_keywords).
     """
-    text = f"{review.get('review_title', '')} {review.get('review_content', '')}".lower()
+    text = f"{review.get('review_title', '')} {review.get('review_content', '')}"
 
-    matched = [kw for kw in CHURN_KEYWORDS if kw in text]
+    # Overlapping: "car was stolen" also reports "stolen", as the boosts below expect
+    matched = CHURN_MATCHER.matched(text, overlapping=True)
+    found = set(matched)
 
     # Intent: how clearly do they want to leave?
     intent = min(10, 3 + len(matched) * 2)
-    if any(kw in text for kw in ["cancel", "cancellation", "switch", "moving to", "another company"]):
+    if found & _LEAVING:
         intent = max(intent, 8)
-    if any(kw in text for kw in ["stolen", "car was stolen"]):
+    if found & _THEFT:
         intent = max(intent, 9)  # Theft = urgent need for better tracker
 
     # Urgency: how recent/heated?
     rating = review.get("review_rating", 3)
     urgency = max(0, 8 - rating * 2)  # 1-star = 6, 2-star = 4
-    if any(kw in text for kw in ["furious", "disgusted", "worst", "terrible"]):
+    if found & _ANGRY:
         urgency = max(urgency, 8)
-    if "stolen" in text:
+    if found & _THEFT:
         urgency = 10
 
     return intent, urgency, matched
@@ -206,7 +351,7 @@ def build_call_opener(review: dict, matched_keywords: list[str]) -> str:
             f"after a vehicle theft. Cartrack has a 90%+ recovery rate — "
             f"would you like to hear how we could help?"
         )
-    if any(kw in matched_keywords for kw in ["cancel", "cancellation", "switch"]):
+    if _CONSIDERING.intersection(matched_keywords):
         return (
             f"Hi {name}, I understand you've been considering alternatives to {company}. "
             f"Cartrack offers hassle-free switching with no installation fee — "
@@ -253,140 +398,195 @@ def review_to_lead(review: dict) -> dict:
     }
 
 
-# ── Webhook POST ─────────────────────────────────────────────
-
-def post_to_webhook(leads: list[dict], batch_id: str) -> dict | None:
-    """POST the B2C batch to the n8n webhook.
-
-    Retries on 5xx and timeout errors with exponential backoff.
-    4xx errors fail immediately.
-    """
-    if not B2C_WEBHOOK_URL or not B2C_WEBHOOK_TOKEN:
-        log.error("B2C_WEBHOOK_URL / B2C_WEBHOOK_TOKEN not set")
-        return None
-
-    payload = {
-        "batch_id": batch_id,
-        "segment": "B2C",
-        "leads": leads,
-    }
-
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = httpx.post(
-                B2C_WEBHOOK_URL,
-                json=payload,
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {B2C_WEBHOOK_TOKEN}",
-                },
-                timeout=60.0,
-            )
-            log.info("Webhook response: %d", response.status_code)
-            if response.status_code == 200:
-                return response.json()
-            if response.status_code >= 500:
-                delay = RETRY_DELAYS[attempt]
-                log.warning("Webhook server error %d, retrying in %ds (attempt %d/%d)", response.status_code, delay, attempt + 1, MAX_RETRIES)
-                time.sleep(delay)
-                continue
-            # 4xx — client error, don't retry
-            log.error("Webhook error %d: %s", response.status_code, response.text[:500])
-            return None
-        except (httpx.HTTPError, httpx.TimeoutException) as e:
-            delay = RETRY_DELAYS[attempt]
-            log.warning("Webhook request failed: %s, retrying in %ds (attempt %d/%d)", e, delay, attempt + 1, MAX_RETRIES)
-            time.sleep(delay)
-
-    log.error("Webhook POST failed after %d retries", MAX_RETRIES)
-    return None
-
-
 # ── CLI + Main ───────────────────────────────────────────────
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     today = datetime.now().strftime("%Y-%m-%d")
-    default_out = str(
-        Path(__file__).parent.parent / "memory" / f"hellopeter-leads-{today}.json"
-    )
+    default_out = Path(__file__).parent.parent / "memory" / f"hellopeter-leads-{today}.json"
 
     parser = argparse.ArgumentParser(
         description="Scrape Hellopeter for competitor churn leads (Netstar, Tracker Connect)"
     )
     parser.add_argument("--max", type=int, default=50, dest="max_leads", help="Max leads to collect (default: 50)")
     parser.add_argument("--days", type=int, default=90, help="Only reviews from last N days (default: 90)")
-    parser.add_argument("--max-rating", type=int, default=2, help="Max star rating to include (default: 2)")
-    parser.add_argument("--out", type=str, default=default_out, help="Output JSON file path")
+    parser.add_argument(
+        "--max-rating", type=int, default=None,
+        help="Max star rating to include, for every competitor (default: per competitor in the registry)",
+    )
+    parser.add_argument("--out", type=str, default=None, help="Output file path (default: memory/hellopeter-leads-<date>.json|.ndjson)")
+    parser.add_argument("--ndjson", action="store_true", help="Stream leads to --out as NDJSON as they qualify; rewritten in score order at the end")
     parser.add_argument("--post", action="store_true", help="POST leads to B2C webhook")
-    return parser.parse_args()
-
-
-def main() -> None:
-    setup_logging()
-    args = parse_args()
+    parser.add_argument(
+        "--competitors", type=str, default=str(COMPETITORS_CONFIG),
+        help="Competitor registry JSON (default: hellopeter_competitors.json)",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=None,
+        help=f"Review pages in flight at once (default: registry request_budget, else {FETCH_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--max-requests", type=int, default=None,
+        help="API requests allowed across all competitors (default: registry request_budget)",
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Only fetch reviews newer than each competitor's last sync; score the window from the review store",
+    )
+    parser.add_argument("--review-store", type=str, default=str(REVIEW_STORE_PATH), help="Local review store (SQLite)")
+    parser.add_argument("--cache-dir", type=str, default=str(HTTP_CACHE_DIR), help="HTTP response cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="Always fetch review pages from the API")
+    parser.add_argument("--offline", action="store_true", help="Serve review pages from the HTTP cache only (no network)")
+    args = parser.parse_args(argv)
+    if args.out is None:
+        args.out = str(default_out.with_suffix(".ndjson") if args.ndjson else default_out)
+    return args
+
+
+def run(args: argparse.Namespace) -> dict:
+    """Scrape, write --out and optionally POST; returns the stdout summary."""
+    try:
+        competitors, request_budget = load_competitors(args.competitors)
+    except (OSError, ValueError) as e:
+        log.error("Can't load competitor registry %s: %s", args.competitors, e)
+        return {"ok": False, "error": f"competitor registry: {e}"}
+    if args.max_rating is not None:
+        for comp in competitors:
+            comp["max_rating"] = args.max_rating
+    log.info(
+        "Starting — max %d leads, last %d days, %d competitors: %s",
+        args.max_leads, args.days, len(competitors), ", ".join(c["slug"] for c in competitors),
+    )
 
-    log.info("Starting — max %d leads, last %d days, ≤%d★", args.max_leads, args.days, args.max_rating)
+    # Qualifying leads with their composite score; the loop stops at --max, so this is the
+    # output in both formats, ranked below
+    scored: list[tuple[float, dict]] = []
+    count = 0
+    per_competitor = {c["name"]: 0 for c in competitors}
+    seen_authors: set[str] = set()  # Dedup by normalised author name
+    # NDJSON: leads go to disk (flushed) as they qualify, so a killed run keeps them;
+    # the file is rewritten ranked once the run completes
+    writer = NdjsonWriter(args.out) if args.ndjson else None
+    cache = None if args.no_cache and not args.offline else HttpCache(args.cache_dir, offline=args.offline)
+
+    # Page budget per competitor; the default heuristic assumes 11 reviews per page, most filtered out
+    default_pages = min(50, (args.max_leads * 3) // 11 + 1)
+    max_pages = {c["slug"]: c["max_pages"] or default_pages for c in competitors}
+    cutoff = datetime.now(timezone.utc) - timedelta(days=args.days)
+
+    slugs = list(max_pages)
+    store = ReviewStore(args.review_store)
+
+    # --incremental: page each slug only back to its high-water mark, if that's inside the
+    # window and the store is complete from the mark back past the window's start
+    since = cutoff.strftime("%Y-%m-%d %H:%M:%S")  # created_at format
+    marks = {slug: store.mark(slug) for slug in slugs}
+    cutoffs = {slug: cutoff for slug in slugs}
+    if args.incremental:
+        for slug in slugs:
+            mark = marks[slug]
+            mark_date = _review_date({"created_at": mark[1]}) if mark else None
+            if mark_date is None or mark_date <= cutoff:
+                continue
+            if mark[2] is None or mark[2] > since:
+                log.info(
+                    "%s: incremental — store only complete back to %s, fetching the whole %d-day window",
+                    slug, mark[2] or "(unknown)", args.days,
+                )
+                continue
+            cutoffs[slug] = mark_date
+            log.info("%s: incremental — fetching back to %s", slug, mark[1])
 
-    all_leads: list[dict] = []
-    seen_authors: set[str] = set()  # Dedup by author name
+    max_requests = args.max_requests if args.max_requests is not None else request_budget.get("max_requests")
+    log.info(
+        "Fetching reviews (up to %d pages, %s requests)...",
+        sum(max_pages.values()), max_requests if max_requests is not None else "unlimited",
+    )
+    reviews_by_slug, complete = fetch_reviews(
+        max_pages,
+        cache=cache,
+        cutoffs=cutoffs,
+        concurrency=args.concurrency or request_budget.get("concurrency", FETCH_CONCURRENCY),
+        min_interval=request_budget.get("min_interval", PAGE_INTERVAL),
+        max_requests=max_requests,
+    )
 
-    for comp in COMPETITORS:
-        if len(all_leads) >= args.max_leads:
+    new_reviews = 0
+    for slug in slugs:
+        fetched = reviews_by_slug[slug]
+        new_reviews += store.add(slug, fetched)
+        mark = marks[slug]
+        if slug in complete and (fetched or mark):
+            # This fetch covers now back to its cutoff; if it reached the old mark it
+            # joins up with the old coverage
+            covered_from = cutoffs[slug].strftime("%Y-%m-%d %H:%M:%S")
+            if mark is not None and mark[2] is not None and covered_from <= mark[1]:
+                covered_from = min(covered_from, mark[2])
+            newest = max(fetched, key=lambda r: r.get("created_at") or "") if fetched else None
+            if newest is None or (mark is not None and (newest.get("created_at") or "") <= mark[1]):
+                newest = {"id": mark[0], "created_at": mark[1]}
+            store.set_mark(slug, newest, covered_from)
+        elif slug not in complete:
+            log.warning("%s: fetch stopped early (error, page or request budget) — sync mark not advanced", slug)
+        if args.incremental:
+            # Score the whole window from the store, not just the pages fetched this run
+            reviews_by_slug[slug] = store.reviews(slug, since=since)
+    log.info("Review store: %d new reviews, %d stored", new_reviews, len(store))
+    store.close()
+
+    for comp in competitors:
+        if count >= args.max_leads:
             break
 
         slug = comp["slug"]
         name = comp["name"]
 
-        # Calculate pages needed (11 reviews per page, but many will be filtered)
-        max_pages = min(50, (args.max_leads * 3) // 11 + 1)
-
-        log.info("Fetching %s reviews (up to %d pages)...", name, max_pages)
-        reviews = fetch_reviews(slug, max_pages=max_pages)
-        log.info("%s: %d raw reviews fetched", name, len(reviews))
+        reviews = reviews_by_slug[slug]
+        log.info("%s: %d raw reviews %s", name, len(reviews), "in window (store)" if args.incremental else "fetched")
 
         # Filter
-        negative = filter_negative_reviews(reviews, max_rating=args.max_rating, days=args.days)
+        negative = filter_negative_reviews(reviews, max_rating=comp["max_rating"], days=args.days)
         log.info("%s: %d negative reviews in last %d days", name, len(negative), args.days)
 
         # Convert to leads
         for review in negative:
-            if len(all_leads) >= args.max_leads:
+            if count >= args.max_leads:
                 break
 
-            # Dedup by author
-            author = review.get("author") or review.get("authorDisplayName") or ""
-            if not author or author.lower() == "anonymous":
-                continue
-            if author in seen_authors:
+            # Dedup by author ("Jane Smith" / "jane  smith" are one reviewer)
+            author = normalise_name(review.get("author") or review.get("authorDisplayName"))
+            if not author or author in seen_authors:
                 continue
             seen_authors.add(author)
 
             lead = review_to_lead(review)
 
             # Only include leads with meaningful churn intent
-            composite = lead["intent_strength"] * 0.6 + lead["urgency_score"] * 0.4
-            if composite < 4:
+            composite = composite_score(lead, comp["weights"])
+            if composite < comp["min_composite"]:
                 continue
 
-            all_leads.append(lead)
+            count += 1
+            per_competitor[name] += 1
+            if writer is not None:
+                writer.write(lead)
+            scored.append((composite, lead))
 
-    # Sort by composite score (highest first)
-    all_leads.sort(
-        key=lambda l: l["intent_strength"] * 0.6 + l["urgency_score"] * 0.4,
-        reverse=True,
-    )
+    if writer is not None:
+        writer.close()
+    if cache is not None:
+        log.info("HTTP cache: %s", cache.stats)
 
-    # Trim to max
-    all_leads = all_leads[: args.max_leads]
+    # Sort by composite score (highest first), each lead weighted by its competitor's weights
+    scored.sort(key=lambda pair: pair[0], reverse=True)  # stable: ties keep discovery order
+    all_leads = [lead for _, lead in scored]
 
     # Report
     log.info("")
     log.info("=" * 60)
-    log.info("RESULTS: %d qualified churn leads", len(all_leads))
+    log.info("RESULTS: %d qualified churn leads", count)
     log.info("=" * 60)
 
-    for i, lead in enumerate(all_leads[:10], 1):  # Show top 10
-        composite = lead["intent_strength"] * 0.6 + lead["urgency_score"] * 0.4
+    for i, (composite, lead) in enumerate(scored[:10], 1):  # Show top 10
         log.info("")
         log.info("  #%d %s (%s, %d★)", i, lead['full_name'], lead['competitor'], lead['review_rating'])
         log.info("     Score: %.1f (intent=%d, urgency=%d)", composite, lead['intent_strength'], lead['urgency_score'])
@@ -396,27 +596,40 @@ def main() -> None:
     if len(all_leads) > 10:
         log.info("  ... and %d more leads", len(all_leads) - 10)
 
-    # Write output file
-    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
-    with open(args.out, "w", encoding="utf-8") as f:
-        json.dump(all_leads, f, indent=2, ensure_ascii=False)
+    # Write output file (NDJSON: replace the discovery-order stream with the ranked leads)
+    if writer is None:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(all_leads, f, indent=2, ensure_ascii=False)
+    else:
+        write_ndjson(args.out, all_leads)
     log.info("Saved → %s", args.out)
 
     # POST to webhook
+    posted = False
     if args.post:
         batch_id = f"B2C-BATCH-{datetime.now().strftime('%Y-%m-%d')}-HELLOPETER-001"
         log.info("POSTing %d leads as batch %s", len(all_leads), batch_id)
-        result = post_to_webhook(all_leads, batch_id)
-        if result:
-            log.info("Webhook result: %s", json.dumps(result, indent=2))
+        result = post_new_leads(all_leads, batch_id, "hellopeter")
+        if result is not None and result["response"] is not None:
+            posted = True
+            log.info("Webhook result: %s", json.dumps(result["response"], indent=2))
 
     # Stdout: structured result
-    print(json.dumps({
+    return {
         "ok": True,
-        "count": len(all_leads),
+        "count": count,
         "out": args.out,
-        "competitors": {c["name"]: sum(1 for l in all_leads if l.get("competitor") == c["name"]) for c in COMPETITORS},
-    }))
+        "format": "ndjson" if writer is not None else "json",
+        "competitors": per_competitor,
+        "new_reviews": new_reviews,
+        "posted": posted,
+    }
+
+
+def main() -> None:
+    setup_logging()
+    print(json.dumps(run(parse_args())))
 
 
 if __name__ == "__main__":
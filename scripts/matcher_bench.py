@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# =============================================================
+# matcher_bench.py — KeywordMatcher vs the old substring loops
+# Runs the Gumtree pre-filter signals, Hellopeter churn keywords
+# and WhatsApp response keywords over the memory/*.json lead
+# files, once with the previous `kw in text` loops and once with
+# KeywordMatcher. Reports µs/record for each and how many records
+# get a different outcome (reject or not / keyword set / label) —
+# word-boundary fixes are expected to change some. No network.
+# Also checks pinned cases for code that consumes the matched
+# keywords (Hellopeter call openers): any mismatch → "ok": false.
+# =============================================================
+# Usage:
+#   uv run python scripts/matcher_bench.py
+#   uv run python scripts/matcher_bench.py --repeat 200 --show-diffs
+#   uv run python scripts/matcher_bench.py --pinned-only     # pinned cases, no corpus needed
+# =============================================================
+
+import argparse
+import html
+import json
+import sys
+import time
+from pathlib import Path
+
+from gumtree_to_b2c import IRRELEVANT_MATCHER, IRRELEVANT_SIGNALS, SELLER_MATCHER, SELLER_SIGNALS
+from hellopeter_scraper import CHURN_KEYWORDS, CHURN_MATCHER, build_call_opener
+from whatsapp_responses import (
+    MAYBE_KEYWORDS,
+    NO_KEYWORDS,
+    RESPONSE_MATCHER,
+    YES_KEYWORDS,
+    classify_response,
+)
+
+MEMORY_DIR = Path(__file__).parent.parent / "memory"
+
+
+def load_texts(memory_dir: Path) -> dict[str, list[str]]:
+    """Record texts per corpus: Gumtree ads (title + description), Hellopeter leads (intent signal)."""
+    corpora: dict[str, list[str]] = {"gumtree": [], "hellopeter": []}
+    for path in sorted(memory_dir.glob("*.json")):
+        try:
+            records = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if not isinstance(records, list):
+            continue
+        for record in records:
+            if not isinstance(record, dict):
+                continue
+            if path.name.startswith("gumtree"):
+                corpora["gumtree"].append(
+                    f"{record.get('title') or ''} {html.unescape(record.get('description') or '')}"
+                )
+            elif path.name.startswith("hellopeter"):
+                corpora["hellopeter"].append(record.get("intent_signal") or "")
+    return corpora
+
+
+# ── Previous implementations (substring scans) ────────────────
+
+def _legacy_signal(signals: list[str], text: str) -> str | None:
+    lower = text.lower()
+    for signal in signals:
+        if signal.rstrip("*") in lower:
+            return signal
+    return None
+
+
+def legacy_pre_filter(text: str) -> str | None:
+    return _legacy_signal(SELLER_SIGNALS, text) or _legacy_signal(IRRELEVANT_SIGNALS, text)
+
+
+def legacy_churn(text: str) -> list[str]:
+    lower = text.lower()
+    return [kw for kw in CHURN_KEYWORDS if kw.rstrip("*") in lower]
+
+
+def legacy_response(text: str) -> str:
+    lower = text.lower()
+    for label, keywords in (("Yes", YES_KEYWORDS), ("No", NO_KEYWORDS), ("Maybe", MAYBE_KEYWORDS)):
+        if any(kw in lower for kw in keywords):
+            return label
+    return "Unclear"
+
+
+def matcher_pre_filter(text: str) -> str | None:
+    hit = SELLER_MATCHER.search(text) or IRRELEVANT_MATCHER.search(text)
+    return hit.keyword if hit else None
+
+
+def matcher_churn(text: str) -> list[str]:
+    return CHURN_MATCHER.matched(text, overlapping=True)
+
+
+# ── Pinned cases ──────────────────────────────────────────────
+
+# Matched churn keywords (or review text, matched first) → the call opener they must
+# produce, identified by a phrase from it. Stems come back as "cancel*"/"switch*".
+PINNED_OPENERS = [
+    (["want to cancel", "cancel*", "switching"], "considering alternatives"),
+    (["cancel*"], "considering alternatives"),
+    (["switch*"], "considering alternatives"),
+    (["car was stolen", "stolen", "cancel*"], "vehicle theft"),
+    (["billing", "moving to"], "rated 4.6"),
+    ("I want to cancel my contract, I'm switching to Cartrack", "considering alternatives"),
+    ("They cancelled my policy after the switchover", "considering alternatives"),
+]
+
+
+def check_pinned() -> list[dict]:
+    """Pinned cases whose opener doesn't contain the expected phrase."""
+    review = {"author": "Jane Smith", "business_name": "Netstar"}
+    failures = []
+    for hits, expected in PINNED_OPENERS:
+        keywords = matcher_churn(hits) if isinstance(hits, str) else hits
+        opener = build_call_opener(review, keywords)
+        if expected not in opener:
+            failures.append({"keywords": keywords, "expected": expected, "opener": opener})
+    return failures
+
+
+# ── Benchmark ─────────────────────────────────────────────────
+
+def _time(fn, texts: list[str], repeat: int) -> float:
+    """Mean µs per record."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            fn(text)
+    return (time.perf_counter() - start) * 1e6 / (repeat * len(texts))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark KeywordMatcher against substring loops")
+    parser.add_argument("--memory-dir", type=Path, default=MEMORY_DIR, help="Directory of lead JSON files")
+    parser.add_argument("--repeat", type=int, default=100, help="Passes over each corpus (default: 100)")
+    parser.add_argument("--show-diffs", action="store_true", help="Print records where the results differ")
+    parser.add_argument("--pinned-only", action="store_true", help="Only check the pinned cases")
+    args = parser.parse_args()
+
+    failures = check_pinned()
+    for failure in failures:
+        print(f"[bench] pinned opener mismatch: {failure}", file=sys.stderr)
+    print(f"[bench] pinned openers: {len(PINNED_OPENERS) - len(failures)}/{len(PINNED_OPENERS)} ok", file=sys.stderr)
+    if args.pinned_only:
+        print(json.dumps({"ok": not failures, "pinned": {"cases": len(PINNED_OPENERS), "failures": failures}}))
+        sys.exit(0 if not failures else 1)
+
+    corpora = load_texts(args.memory_dir)
+    all_texts = corpora["gumtree"] + corpora["hellopeter"]
+    if not all_texts:
+        print(f"[bench] No lead files in {args.memory_dir}", file=sys.stderr)
+        print(json.dumps({"ok": False, "error": "no corpus"}))
+        sys.exit(1)
+
+    # name: (texts, legacy fn, matcher fn, what to compare for "differs")
+    cases = {
+        "pre_filter": (corpora["gumtree"], legacy_pre_filter, matcher_pre_filter, bool),
+        "churn_keywords": (corpora["hellopeter"], legacy_churn, matcher_churn, set),
+        "classify_response": (all_texts, legacy_response, classify_response, str),
+    }
+    repeat = max(1, args.repeat)
+    results: dict[str, dict] = {}
+    for name, (texts, legacy, matcher, outcome) in cases.items():
+        if not texts:
+            continue
+        diffs = [(t, legacy(t), matcher(t)) for t in texts if outcome(legacy(t)) != outcome(matcher(t))]
+        legacy_us = _time(legacy, texts, repeat)
+        matcher_us = _time(matcher, texts, repeat)
+        results[name] = {
+            "records": len(texts),
+            "legacy_us": round(legacy_us, 2),
+            "matcher_us": round(matcher_us, 2),
+            "speedup": round(legacy_us / matcher_us, 2) if matcher_us else None,
+            "differs": len(diffs),
+        }
+        print(
+            f"[bench] {name:<18} {len(texts):>4} records  legacy {legacy_us:8.2f} µs"
+            f"  matcher {matcher_us:8.2f} µs  differs on {len(diffs)}",
+            file=sys.stderr,
+        )
+        if args.show_diffs:
+            for text, before, after in diffs:
+                print(f"    {before!r} → {after!r}  | {text[:100]!r}", file=sys.stderr)
+
+    print(json.dumps({
+        "ok": not failures,
+        "pinned": {"cases": len(PINNED_OPENERS), "failures": failures},
+        "repeat": repeat,
+        "keywords": {
+            "pre_filter": len(SELLER_MATCHER.keywords) + len(IRRELEVANT_MATCHER.keywords),
+            "churn_keywords": len(CHURN_MATCHER.keywords),
+            "classify_response": len(RESPONSE_MATCHER.keywords),
+        },
+        "results": results,
+    }))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
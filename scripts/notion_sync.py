@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# =============================================================
+# notion_sync.py — Bring the local Notion mirror up to date
+# Syncs B2C Leads, B2C Batches and Claire-Prospects into
+# logs/notion-mirror.sqlite (cogstack_leadgen/notion_mirror.py):
+# one query per database for the pages edited since the last
+# sync. webhook.post_new_leads() and backfill_batch_relations.py
+# sync on their own; run this for reporting, or nightly with
+# --full to drop pages deleted in Notion.
+# =============================================================
+# Usage:
+#   uv run python scripts/notion_sync.py                    # incremental, all databases
+#   uv run python scripts/notion_sync.py --full             # refetch everything, drop deleted pages
+#   uv run python scripts/notion_sync.py --db b2c_leads     # one database
+#   uv run python scripts/notion_sync.py --report           # + page counts by Status
+#
+# Database ids: B2C_LEADS_DB_ID, B2C_BATCHES_DB_ID,
+# CLAIRE_PROSPECTS_DB_ID in .env, else notion_config.json.
+# =============================================================
+
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cogstack_leadgen.logs import setup_logging as _setup_logging
+from cogstack_leadgen.notion import NotionWriter
+from cogstack_leadgen.notion_mirror import MIRRORED_DATABASES, NotionMirror, database_ids
+
+load_dotenv()
+
+# ── Logging ──────────────────────────────────────────────────
+
+log = logging.getLogger("notion_sync")
+
+
+def setup_logging() -> None:
+    _setup_logging(log, "notion-sync")
+
+
+# ── Config ────────────────────────────────────────────────────
+
+NOTION_API_KEY = os.environ.get("NOTION_API_KEY")
+
+# Property counted per database by --report
+REPORT_PROPERTY = "Status"
+
+
+# ── CLI ───────────────────────────────────────────────────────
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Sync Notion databases into the local mirror")
+    p.add_argument("--db", action="append", choices=sorted(MIRRORED_DATABASES),
+                   help="Database to sync (repeatable; default: all configured)")
+    p.add_argument("--full", action="store_true",
+                   help="Refetch every page and drop pages no longer in Notion")
+    p.add_argument("--report", action="store_true",
+                   help=f"Include page counts by {REPORT_PROPERTY} in the summary")
+    return p.parse_args()
+
+
+# ── Main ──────────────────────────────────────────────────────
+
+def main():
+    setup_logging()
+    args = parse_args()
+
+    if not NOTION_API_KEY:
+        log.error("NOTION_API_KEY not set in .env")
+        sys.exit(1)
+    ids = database_ids(args.db)
+    if not ids:
+        log.error("No database ids configured — set them in .env or notion_config.json")
+        sys.exit(1)
+
+    databases: dict[str, dict] = {}
+    ok = True
+    with NotionMirror() as mirror, NotionWriter(NOTION_API_KEY) as notion:
+        for name, db_id in ids.items():
+            try:
+                fetched = mirror.sync(notion, db_id, full=args.full)
+            except RuntimeError as e:
+                log.error("%s: sync failed — %s", name, e)
+                databases[name] = {"ok": False, "error": str(e)}
+                ok = False
+                continue
+            databases[name] = {"ok": True, "fetched": fetched, "pages": mirror.count(db_id)}
+            if args.report:
+                databases[name][f"by_{REPORT_PROPERTY.lower()}"] = mirror.count_by(db_id, REPORT_PROPERTY)
+            log.info("%s: %d fetched, %d pages mirrored", name, fetched, databases[name]["pages"])
+
+        print(json.dumps({
+            "ok": ok,
+            "full": args.full,
+            "mirror": str(mirror.path),
+            "databases": databases,
+            "notion": notion.report(),
+        }))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# =============================================================
+# parser_bench.py — Offline benchmark for the Gumtree parsers
+# Replays the recorded fixture corpus (record_fixtures.py)
+# through extract_ad_links, parse_ad_page,
+# _extract_location_from_jsonld and extract_phone. Reports
+# pages/sec, p50/p99 latency and peak memory per parser, and
+# checks outputs against fixtures/gumtree/expected.json.
+# No network.
+# =============================================================
+# Usage:
+#   uv run python scripts/parser_bench.py                          # fixtures/gumtree
+#   uv run python scripts/parser_bench.py --from-cache             # pages in logs/http-cache (no expected output)
+#   uv run python scripts/parser_bench.py --repeat 50
+#   uv run python scripts/parser_bench.py --save-baseline logs/parser-baseline.json
+#   uv run python scripts/parser_bench.py --baseline logs/parser-baseline.json --tolerance 0.25
+#
+# Exit code 1 when a parser output differs from expected.json or
+# a p50 regresses past --tolerance against --baseline.
+# =============================================================
+
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cogstack_leadgen.gumtree import _extract_location_from_jsonld, extract_ad_links, parse_ad_page
+from cogstack_leadgen.http_cache import DEFAULT_DIR as HTTP_CACHE_DIR
+from cogstack_leadgen.phone import extract_phone
+from gumtree_scrapling import CachedPage
+from record_fixtures import FIXTURES_DIR, KINDS, fixture_name, load_corpus, load_expected, page_kind
+
+
+def load_cached_pages(cache_dir: Path) -> dict[str, list[tuple[str, str, bytes]]]:
+    """Same shape as load_corpus, built from the scraper's HTTP cache."""
+    corpus: dict[str, list[tuple[str, str, bytes]]] = {kind: [] for kind in KINDS}
+    for meta_path in sorted(cache_dir.glob("*/*.json")):
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            body = meta_path.with_suffix(".body").read_bytes()
+        except (OSError, ValueError):
+            continue
+        url = meta.get("url", "")
+        kind = page_kind(url)
+        if kind is not None:
+            corpus[kind].append((fixture_name(url), url, body))
+    return corpus
+
+
+def _decode(body: bytes) -> str:
+    return body.decode("utf-8", errors="ignore")
+
+
+# ── Benchmarks ────────────────────────────────────────────────
+
+def build_cases(corpus: dict, selector_cls) -> dict[str, tuple[list, callable]]:
+    """
+    {parser name: (inputs, fn)} — fn(input) is what gets timed.
+    Listing pages are wrapped fresh on every call so the Selector parse is
+    counted, exactly as it is on a live fetch.
+    """
+    listings = [(url, body) for _, url, body in corpus["listings"]]
+    ads = [(url, body) for _, url, body in corpus["ads"]]
+    ad_texts = [_decode(body) for _, body in ads]
+    return {
+        "extract_ad_links": (
+            listings,
+            lambda item: extract_ad_links(CachedPage(item[1], item[0], selector_cls)),
+        ),
+        "parse_ad_page": (
+            ads,
+            lambda item: parse_ad_page(CachedPage(item[1], item[0], selector_cls), item[0]),
+        ),
+        "_extract_location_from_jsonld": (ad_texts, _extract_location_from_jsonld),
+        # The body-scan phone fallback — the largest input extract_phone sees.
+        "extract_phone": ([text[5000:200000] for text in ad_texts], extract_phone),
+    }
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def time_parser(inputs: list, fn, repeat: int) -> dict:
+    for item in inputs:  # warm-up
+        fn(item)
+    latencies = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            fn(item)
+            latencies.append(time.perf_counter() - start)
+    total = sum(latencies)
+    return {
+        "pages": len(inputs),
+        "calls": len(latencies),
+        "pages_per_sec": round(len(latencies) / total, 1) if total else None,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+    }
+
+
+def peak_memory_kb(inputs: list, fn) -> float:
+    """Peak Python-heap allocation (tracemalloc) of a single pass over the inputs."""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        for item in inputs:
+            fn(item)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+# ── Correctness ───────────────────────────────────────────────
+
+def check_expected(corpus: dict, expected: dict, selector_cls) -> list[str]:
+    """File names whose current parser output differs from expected.json."""
+    mismatches = []
+    for name, url, body in corpus["listings"]:
+        want = expected.get("listings", {}).get(name)
+        if want is not None and extract_ad_links(CachedPage(body, url, selector_cls)) != want["links"]:
+            mismatches.append(f"listings/{name}")
+    for name, url, body in corpus["ads"]:
+        want = expected.get("ads", {}).get(name)
+        if want is None:
+            continue
+        ad = parse_ad_page(CachedPage(body, url, selector_cls), url)
+        if ad is not None:
+            ad.pop("scraped_at", None)
+        if ad != want["ad"]:
+            mismatches.append(f"ads/{name}")
+    return mismatches
+
+
+def check_baseline(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, row in results.items():
+        before = baseline.get(name, {}).get("p50_ms")
+        if before and row["p50_ms"] > before * (1 + tolerance):
+            regressions.append(f"{name}: p50 {before} → {row['p50_ms']} ms")
+    return regressions
+
+
+# ── Main ──────────────────────────────────────────────────────
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the Gumtree parsers over recorded HTML")
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES_DIR, help="Fixture corpus directory")
+    parser.add_argument("--from-cache", action="store_true", help="Use pages from the HTTP cache instead of fixtures")
+    parser.add_argument("--cache-dir", type=Path, default=HTTP_CACHE_DIR, help="HTTP cache to read pages from")
+    parser.add_argument("--repeat", type=int, default=20, help="Passes over the corpus per parser (default: 20)")
+    parser.add_argument("--baseline", type=Path, default=None, help="Previous --save-baseline output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p50 slowdown vs baseline (default: 0.25)")
+    parser.add_argument("--save-baseline", type=Path, default=None, help="Write this run's timings for later --baseline")
+    args = parser.parse_args()
+
+    try:
+        from scrapling.parser import Selector
+    except ImportError:
+        print(
+            "[bench] ERROR: scrapling not installed.\n"
+            "  Run: uv pip install 'scrapling[fetchers]>=0.4.2'",
+            file=sys.stderr,
+        )
+        print(json.dumps({"ok": False, "error": "scrapling not installed"}))
+        sys.exit(1)
+
+    source = args.cache_dir if args.from_cache else args.fixtures
+    corpus = load_cached_pages(args.cache_dir) if args.from_cache else load_corpus(args.fixtures)
+    if not corpus["listings"] and not corpus["ads"]:
+        print(f"[bench] No pages found in {source} — run record_fixtures.py first", file=sys.stderr)
+        print(json.dumps({"ok": False, "error": "no fixtures"}))
+        sys.exit(1)
+    print(
+        f"[bench] {len(corpus['listings'])} listings, {len(corpus['ads'])} ads from {source}",
+        file=sys.stderr,
+    )
+
+    results: dict[str, dict] = {}
+    for name, (inputs, fn) in build_cases(corpus, Selector).items():
+        if not inputs:
+            continue
+        row = time_parser(inputs, fn, max(1, args.repeat))
+        row["peak_kb"] = peak_memory_kb(inputs, fn)
+        results[name] = row
+        print(
+            f"[bench] {name:<30} {row['pages_per_sec'] or 0:>9.1f} pages/s"
+            f"  p50 {row['p50_ms']:>8.3f} ms  p99 {row['p99_ms']:>8.3f} ms  peak {row['peak_kb']:>9.1f} KB",
+            file=sys.stderr,
+        )
+
+    mismatches = [] if args.from_cache else check_expected(corpus, load_expected(args.fixtures), Selector)
+    for name in mismatches:
+        print(f"[bench] ✗ output differs from expected.json: {name}", file=sys.stderr)
+
+    regressions: list[str] = []
+    if args.baseline:
+        try:
+            baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"[bench] Could not read baseline {args.baseline}: {e}", file=sys.stderr)
+            baseline = {}
+        regressions = check_baseline(results, baseline.get("parsers", {}), args.tolerance)
+        for line in regressions:
+            print(f"[bench] ✗ slower than baseline — {line}", file=sys.stderr)
+
+    summary = {
+        "ok": not mismatches and not regressions,
+        "repeat": args.repeat,
+        "parsers": results,
+        "mismatches": mismatches,
+        "regressions": regressions,
+    }
+    if args.save_baseline:
+        args.save_baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.save_baseline.write_text(json.dumps(summary, indent=2) + "\n", encoding="utf-8")
+
+    print(json.dumps(summary))
+    if not summary["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# =============================================================
+# record_fixtures.py — Record a Gumtree HTML fixture corpus
+# Saves listing and ad pages to fixtures/gumtree/ together with
+# the parser output for each page (expected.json), so
+# parser_bench.py can measure throughput and catch extraction
+# regressions without touching gumtree.co.za.
+# =============================================================
+# Usage:
+#   uv run python scripts/record_fixtures.py --from-cache            # export pages from logs/http-cache
+#   uv run python scripts/record_fixtures.py --ads 30                # live: listings + up to 30 ads
+#   uv run python scripts/record_fixtures.py --refresh-expected      # re-snapshot parser output only
+#
+# Layout:
+#   fixtures/gumtree/listings/<sha16>.html
+#   fixtures/gumtree/ads/<sha16>.html
+#   fixtures/gumtree/expected.json   { "listings": {file: {url, links}}, "ads": {file: {url, ad}} }
+#
+# Only refresh expected.json after checking a parser change is
+# intended — it is the reference parser_bench.py compares against.
+# =============================================================
+
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cogstack_leadgen.http_cache import DEFAULT_DIR as HTTP_CACHE_DIR
+from gumtree_scrapling import (
+    SEARCH_URLS,
+    CachedPage,
+    FetchEngine,
+    extract_ad_links,
+    is_blocked,
+    parse_ad_page,
+)
+
+FIXTURES_DIR = Path(__file__).parent.parent / "fixtures" / "gumtree"
+KINDS = ("listings", "ads")
+
+
+def fixture_name(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:16] + ".html"
+
+
+def page_kind(url: str) -> str | None:
+    """'ads' for an individual ad URL, 'listings' for any other Gumtree page."""
+    if "gumtree.co.za" not in url:
+        return None
+    return "ads" if "/a-" in url else "listings"
+
+
+# ── Corpus ────────────────────────────────────────────────────
+
+def load_expected(root: Path) -> dict:
+    try:
+        return json.loads((root / "expected.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {kind: {} for kind in KINDS}
+
+
+def load_corpus(root: Path = FIXTURES_DIR) -> dict[str, list[tuple[str, str, bytes]]]:
+    """{kind: [(file name, url, body), ...]} for every recorded page."""
+    expected = load_expected(root)
+    corpus: dict[str, list[tuple[str, str, bytes]]] = {}
+    for kind in KINDS:
+        pages = []
+        for path in sorted((root / kind).glob("*.html")):
+            url = expected.get(kind, {}).get(path.name, {}).get("url", path.name)
+            pages.append((path.name, url, path.read_bytes()))
+        corpus[kind] = pages
+    return corpus
+
+
+def snapshot(kind: str, url: str, body: bytes, selector_cls) -> dict:
+    """Current parser output for one page, in expected.json form."""
+    if kind == "listings":
+        return {"url": url, "links": extract_ad_links(CachedPage(body, url, selector_cls))}
+    ad = parse_ad_page(CachedPage(body, url, selector_cls), url)
+    if ad is not None:
+        ad.pop("scraped_at", None)
+    return {"url": url, "ad": ad}
+
+
+def save_page(root: Path, kind: str, url: str, body: bytes, expected: dict, selector_cls) -> None:
+    name = fixture_name(url)
+    path = root / kind / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(body)
+    expected.setdefault(kind, {})[name] = snapshot(kind, url, body, selector_cls)
+
+
+def write_expected(root: Path, expected: dict) -> None:
+    root.mkdir(parents=True, exist_ok=True)
+    (root / "expected.json").write_text(
+        json.dumps(expected, indent=2, ensure_ascii=False, sort_keys=True) + "\n",
+        encoding="utf-8",
+    )
+
+
+# ── Sources ───────────────────────────────────────────────────
+
+def record_from_cache(root: Path, cache_dir: Path, expected: dict, selector_cls, max_ads: int) -> int:
+    """Copy Gumtree pages out of the scraper's HTTP cache. No network."""
+    saved = {kind: 0 for kind in KINDS}
+    for meta_path in sorted(cache_dir.glob("*/*.json")):
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            body = meta_path.with_suffix(".body").read_bytes()
+        except (OSError, ValueError):
+            continue
+        url = meta.get("url", "")
+        kind = page_kind(url)
+        if kind is None or meta.get("status", 200) != 200:
+            continue
+        if kind == "ads" and saved["ads"] >= max_ads:
+            continue
+        save_page(root, kind, url, body, expected, selector_cls)
+        saved[kind] += 1
+    print(f"[fixtures] From cache: {saved['listings']} listings, {saved['ads']} ads", file=sys.stderr)
+    return sum(saved.values())
+
+
+def _fetch_page(engine: FetchEngine, url: str) -> bytes | None:
+    try:
+        page = engine.get(url)
+    except Exception as e:
+        print(f"[fixtures] fetch failed: {url} — {e}", file=sys.stderr)
+        return None
+    if is_blocked(page):
+        print(f"[fixtures] block page, not recorded: {url}", file=sys.stderr)
+        return None
+    return page.body if isinstance(page.body, bytes) else str(page.body).encode("utf-8")
+
+
+def record_live(root: Path, expected: dict, fetcher, selector_cls, max_ads: int) -> int:
+    """Fetch every search listing and up to max_ads of the ads they link to."""
+    engine = FetchEngine(fetcher, max_in_flight=2, selector_cls=selector_cls)
+    saved = 0
+    ad_urls: list[str] = []
+    for url in SEARCH_URLS:
+        body = _fetch_page(engine, url)
+        if body is None:
+            continue
+        save_page(root, "listings", url, body, expected, selector_cls)
+        saved += 1
+        for link in expected["listings"][fixture_name(url)]["links"]:
+            if link not in ad_urls:
+                ad_urls.append(link)
+
+    for url in ad_urls[:max_ads]:
+        body = _fetch_page(engine, url)
+        if body is None:
+            continue
+        save_page(root, "ads", url, body, expected, selector_cls)
+        saved += 1
+        print(f"[fixtures] ✓ {url}", file=sys.stderr)
+    return saved
+
+
+def refresh_expected(root: Path, selector_cls) -> dict:
+    expected: dict = {kind: {} for kind in KINDS}
+    for kind, pages in load_corpus(root).items():
+        for name, url, body in pages:
+            expected[kind][name] = snapshot(kind, url, body, selector_cls)
+    return expected
+
+
+# ── Main ──────────────────────────────────────────────────────
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Record Gumtree listing/ad pages as parser fixtures")
+    parser.add_argument("--dir", type=Path, default=FIXTURES_DIR, help="Fixture corpus directory")
+    parser.add_argument("--ads", type=int, default=25, help="Max ad pages to record (default: 25)")
+    parser.add_argument("--from-cache", action="store_true", help="Export pages from the HTTP cache instead of fetching")
+    parser.add_argument("--cache-dir", type=Path, default=HTTP_CACHE_DIR, help="HTTP cache to export from")
+    parser.add_argument("--refresh-expected", action="store_true", help="Re-run the parsers over recorded pages only")
+    args = parser.parse_args()
+
+    try:
+        from scrapling.fetchers import Fetcher
+        from scrapling.parser import Selector
+    except ImportError:
+        print(
+            "[fixtures] ERROR: scrapling not installed.\n"
+            "  Run: uv pip install 'scrapling[fetchers]>=0.4.2'",
+            file=sys.stderr,
+        )
+        print(json.dumps({"ok": False, "error": "scrapling not installed"}))
+        sys.exit(1)
+
+    if args.refresh_expected:
+        expected = refresh_expected(args.dir, Selector)
+        saved = 0
+    else:
+        expected = load_expected(args.dir)
+        if args.from_cache:
+            saved = record_from_cache(args.dir, args.cache_dir, expected, Selector, args.ads)
+        else:
+            saved = record_live(args.dir, expected, Fetcher, Selector, args.ads)
+
+    write_expected(args.dir, expected)
+    counts = {kind: len(expected.get(kind, {})) for kind in KINDS}
+    print(f"[fixtures] Done — {counts['listings']} listings, {counts['ads']} ads in {args.dir}", file=sys.stderr)
+    print(json.dumps({"ok": True, "saved": saved, "corpus": counts, "dir": str(args.dir)}))
+
+
+if __name__ == "__main__":
+    main()
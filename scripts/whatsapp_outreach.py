@@ -1,14 +1,17 @@
 #!/usr/bin/env python3
 # =============================================================
 # whatsapp_outreach.py — Claire WhatsApp Outreach Sender
-# Reads unsent leads from ClaireLeads/CarTrackSubmissions.xlsx,
-# sends personalised WhatsApp messages via Phone 3 (Baileys),
-# and creates records in the Claire-Prospects Notion database.
+# Streams unsent leads from ClaireLeads/CarTrackSubmissions.xlsx
+# (or any .xlsx / .csv lead sheet), sends personalised WhatsApp
+# messages via Phone 3 (Baileys), and creates records in the
+# Claire-Prospects Notion database. Rows already handled are
+# remembered in logs/lead-sheets.sqlite.
 # =============================================================
 # Usage:
 #   uv run python scripts/whatsapp_outreach.py
 #   uv run python scripts/whatsapp_outreach.py --dry-run
 #   uv run python scripts/whatsapp_outreach.py --max 5
+#   uv run python scripts/whatsapp_outreach.py --file memory/claire-top50-leads-2026-03-19.xlsx
 #   uv run python scripts/whatsapp_outreach.py --whatsapp-url http://127.0.0.1:3456
 # =============================================================
 
@@ -17,16 +20,26 @@ import json
 import logging
 import os
 import random
-import re
 import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Iterator
 
-import httpx
-import openpyxl
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cogstack_leadgen.identity import ENRICHED, MESSAGED, IdentityIndex, lead_keys
+from cogstack_leadgen.logs import setup_logging as _setup_logging
+from cogstack_leadgen.notion import NotionWriter
+from cogstack_leadgen.phone import normalise_phone
+from cogstack_leadgen.sheet_index import SheetIndex
+from cogstack_leadgen.sheets import iter_sheet_rows, row_hash
+from cogstack_leadgen.state import OutreachStore
+from cogstack_leadgen.whatsapp import LOOKUP_CONCURRENCY, WhatsAppLookup, send_whatsapp
+from cogstack_leadgen.whatsapp_cache import WhatsAppLookupCache
+
 load_dotenv()
 
 # ── Logging ──────────────────────────────────────────────────
@@ -35,64 +48,23 @@ log = logging.getLogger("whatsapp_outreach")
 
 
 def setup_logging() -> None:
-    """Configure console + file logging."""
-    log.setLevel(logging.DEBUG)
-
-    console = logging.StreamHandler(sys.stderr)
-    console.setLevel(logging.INFO)
-    console.setFormatter(logging.Formatter(
-        "%(asctime)s [%(name)s] %(levelname)s: %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    ))
-    log.addHandler(console)
-
-    log_dir = Path(__file__).parent.parent / "logs"
-    log_dir.mkdir(exist_ok=True)
-    today = datetime.now().strftime("%Y-%m-%d")
-    fh = logging.FileHandler(log_dir / f"whatsapp-outreach-{today}.log", encoding="utf-8")
-    fh.setLevel(logging.DEBUG)
-    fh.setFormatter(logging.Formatter("%(asctime)s [%(name)s] %(levelname)s: %(message)s"))
-    log.addHandler(fh)
+    """Configure console + file logging (logs/whatsapp-outreach-YYYY-MM-DD.log)."""
+    _setup_logging(log, "whatsapp-outreach", timestamps=True)
 
 
 # ── Environment ──────────────────────────────────────────────
 
 NOTION_API_KEY = os.environ.get("NOTION_API_KEY")
-NOTION_VERSION = "2022-06-28"
-NOTION_BASE_URL = "https://api.notion.com/v1"
 
 WHATSAPP_LOOKUP_URL = os.environ.get("WHATSAPP_LOOKUP_URL", "http://127.0.0.1:3456")
 
 PROJECT_ROOT = Path(__file__).parent.parent
 EXCEL_PATH = PROJECT_ROOT / "ClaireLeads" / "CarTrackSubmissions.xlsx"
-STATE_FILE = PROJECT_ROOT / "logs" / "outreach-state.json"
 NOTION_CONFIG = PROJECT_ROOT / "notion_config.json"
 
-# ── Phone normalisation ───────────────────────────────────────
-
-PHONE_RE = re.compile(r"(?:\+27|27|0)[6-8]\d[\s\-]?\d{3}[\s\-]?\d{4}")
-
-
-def normalise_phone(raw) -> str | None:
-    """Normalise any SA phone format to +27XXXXXXXXX.
-
-    Handles openpyxl reading phone as integer (drops leading zero).
-    """
-    if raw is None:
-        return None
-    # Handle integer from openpyxl (e.g., 827712303 → "0827712303")
-    if isinstance(raw, (int, float)):
-        raw = str(int(raw)).zfill(10)
-    phone = str(raw).strip().replace(" ", "").replace("-", "")
-    if phone.startswith("+27"):
-        return phone
-    if phone.startswith("27") and len(phone) == 11:
-        return f"+{phone}"
-    if phone.startswith("0") and len(phone) == 10:
-        return f"+27{phone[1:]}"
-    log.warning("Unrecognised phone format: %r", raw)
-    return None
-
+# Seconds between one send finishing and the next starting (the Baileys
+# server adds its own 30–60s jitter inside each send)
+SEND_GAP = (3.0, 5.0)
 
 # ── Message template ─────────────────────────────────────────
 
@@ -117,182 +89,109 @@ def build_message(name: str, expressed_interest: str, motivation: str) -> str:
     return MESSAGE_TEMPLATE.format(name=name, business_line=business_line)
 
 
-# ── WhatsApp helpers ─────────────────────────────────────────
-
-def whatsapp_lookup(phone: str, lookup_url: str) -> str | None:
-    """Look up WhatsApp profile name. Returns name or None."""
-    for attempt in range(2):
-        try:
-            resp = httpx.post(
-                f"{lookup_url}/lookup",
-                json={"phone": phone},
-                timeout=15.0,
-            )
-            data = resp.json()
-            if data.get("exists") and data.get("name"):
-                return data["name"]
-            log.debug("WA lookup %s: exists=%s name=%s", phone, data.get("exists"), data.get("name"))
-            return None
-        except httpx.TimeoutException:
-            if attempt == 0:
-                log.debug("WA lookup timeout for %s, retrying in 3s...", phone)
-                time.sleep(3)
-                continue
-            log.warning("WA lookup timeout for %s after retry", phone)
-        except httpx.HTTPError as e:
-            log.warning("WA lookup HTTP error for %s: %s", phone, e)
-            break
-    return None
-
-
-def send_whatsapp(phone: str, message: str, lookup_url: str) -> bool:
-    """Send a WhatsApp message via Baileys /send endpoint. Returns True on success."""
-    try:
-        resp = httpx.post(
-            f"{lookup_url}/send",
-            json={"phone": phone, "message": message},
-            timeout=90.0,  # server adds 30–60s jitter before sending
-        )
-        data = resp.json()
-        if data.get("sent"):
-            log.info("Sent to %s", phone)
-            return True
-        log.warning("Send failed for %s: %s", phone, data.get("error", "unknown"))
-        return False
-    except httpx.HTTPError as e:
-        log.warning("Send HTTP error for %s: %s", phone, e)
-        return False
+# ── Notion helpers ────────────────────────────────────────────
 
+# Outreach store status → Claire-Prospects "Response Status"
+NOTION_STATUS = {"pending": "Pending", "yes": "Yes", "no": "No", "maybe": "Maybe", "no_reply": "No Reply"}
 
-# ── Notion helpers ────────────────────────────────────────────
 
-def notion_create_record(
-    client: httpx.Client,
-    db_id: str,
-    display_name: str,
-    phone: str,
-    email: str | None,
-    business: str,
-    motivation: str,
-    message: str,
-) -> str | None:
-    """Create a Claire-Prospects Notion page. Returns page_id or None."""
+def notion_record_properties(entry: dict) -> dict:
+    """Claire-Prospects page properties for an outreach store entry."""
     now = datetime.now(timezone.utc).isoformat()
     properties: dict = {
-        "Full Name":    {"title": [{"text": {"content": display_name}}]},
-        "Phone":        {"phone_number": phone},
-        "Business":     {"rich_text": [{"text": {"content": business[:2000]}}]},
-        "Motivation":   {"rich_text": [{"text": {"content": motivation[:2000]}}]},
-        "Outreach Message": {"rich_text": [{"text": {"content": message[:2000]}}]},
-        "Outreach Sent At": {"date": {"start": now}},
-        "Response Status":  {"select": {"name": "Pending"}},
+        "Full Name":    {"title": [{"text": {"content": entry["display_name"]}}]},
+        "Phone":        {"phone_number": entry["phone"]},
+        "Business":     {"rich_text": [{"text": {"content": (entry.get("interest") or "")[:2000]}}]},
+        "Motivation":   {"rich_text": [{"text": {"content": (entry.get("motivation") or "")[:2000]}}]},
+        "Outreach Message": {"rich_text": [{"text": {"content": (entry.get("message") or "")[:2000]}}]},
+        "Outreach Sent At": {"date": {"start": entry.get("sent_at") or now}},
+        "Response Status":  {"select": {"name": NOTION_STATUS.get(entry.get("status"), "Pending")}},
         "Submitted to Pipeline": {"checkbox": False},
         "Date Added":   {"date": {"start": now}},
     }
-    if email:
-        properties["Email"] = {"email": email}
-
-    payload = {
-        "parent": {"database_id": db_id},
-        "properties": properties,
-    }
+    if entry.get("email"):
+        properties["Email"] = {"email": entry["email"]}
+    return properties
 
-    resp = client.post(f"{NOTION_BASE_URL}/pages", json=payload)
-    if resp.status_code == 200:
-        page_id = resp.json()["id"]
-        log.debug("Created Notion record %s for %s", page_id, phone)
-        return page_id
-    log.error("Notion create failed %d: %s", resp.status_code, resp.text[:300])
-    return None
-
-
-# ── State file helpers ────────────────────────────────────────
-
-def load_state() -> list[dict]:
-    if STATE_FILE.exists():
-        return json.loads(STATE_FILE.read_text())
-    return []
 
+def queue_notion_record(notion: NotionWriter, db_id: str, store: OutreachStore, entry: dict) -> None:
+    """
+    Queue the entry's Claire-Prospects record on the shared writer, so a
+    send never waits on Notion. The page id is written back to the
+    outreach store; an entry still without one is picked up again by
+    the next run.
+    """
+    def done(page: dict | None) -> None:
+        if page is None:
+            log.error("Notion record creation failed for %s — will retry next run", entry["phone"])
+            return
+        store.update(entry["phone"], notion_page_id=page["id"])
+        log.info("Notion: %s (%s) → %s", entry["display_name"], entry["phone"], page["id"])
 
-def save_state(state: list[dict]) -> None:
-    STATE_FILE.parent.mkdir(exist_ok=True)
-    STATE_FILE.write_text(json.dumps(state, indent=2))
+    notion.create(db_id, notion_record_properties(entry), on_done=done)
 
 
-def already_sent(state: list[dict], phone: str) -> bool:
-    return any(e["phone"] == phone for e in state)
+# ── Lead sheet reader ─────────────────────────────────────────
 
+# Placeholder some sheets put in Expressed Interest — reads worse than the generic line
+GENERIC_INTEREST = {"potential interest in tracking services"}
 
-# ── Excel reader ──────────────────────────────────────────────
 
 def _clean(val) -> str:
     return str(val).strip() if val else ""
 
 
-def read_leads(excel_path: Path) -> list[dict]:
-    """Read unsent leads from an Excel file.
+def read_leads(path: Path, sheets: SheetIndex, stats: dict) -> Iterator[dict]:
+    """Stream unsent leads from an XLSX / CSV lead sheet.
 
-    Auto-detects two formats by column count:
-      Format A (16+ cols) — CarTrackSubmissions.xlsx:
-        C=name, D=phone, E=email, F=interest, G=motivation, P=status
-        Skip if status == 'sent'
-      Format B (10 cols) — CarTrackSubmission2.xlsx:
-        A=source/business, B=name, C=phone, D=email, E=interest, F=motivation, G=status
-        Skip if status == 'sent' or 'sent'
+    Columns are found by header (cogstack_leadgen.sheets), so
+    CarTrackSubmissions.xlsx, CarTrackSubmission2.xlsx and exports like
+    memory/claire-top50-leads-*.xlsx all work. Rows whose status column
+    says 'sent' (or is blank) are skipped; a sheet with no status column
+    has every row eligible. Rows an earlier run already handled are
+    skipped by content hash (stats["unchanged"]); each lead carries its
+    "row_hash" for the caller to mark once it's done with it.
     """
-    wb = openpyxl.load_workbook(excel_path, read_only=True, data_only=True)
-    ws = wb.active
-    if ws is None:
-        wb.close()
-        return []
-
-    leads = []
-    for i, row in enumerate(ws.iter_rows(values_only=True)):
-        if i == 0:
-            continue  # skip header
-        row = list(row)
-        if not any(row):
+    for row in iter_sheet_rows(path):
+        digest = row_hash(row)
+        if sheets.handled(digest):
+            stats["unchanged"] += 1
             continue
 
-        # Auto-detect format by column count
-        if len(row) >= 16:
-            # Format A: CarTrackSubmissions.xlsx
-            name     = _clean(row[2])
-            phone    = row[3]
-            email    = _clean(row[4])
-            interest = _clean(row[5])
-            motiv    = _clean(row[6])
-            status   = _clean(row[15]).lower()
-            business = name
-        else:
-            # Format B: CarTrackSubmission2.xlsx
-            business = _clean(row[0])
-            name     = _clean(row[1])
-            phone    = row[2]
-            email    = _clean(row[3])
-            interest = ""  # generic placeholder — use business name instead
-            motiv    = _clean(row[5])
-            status   = _clean(row[6]).lower()
-
-        if status in ("sent", ""):
+        if "status" in row and _clean(row["status"]).lower() in ("sent", ""):
+            sheets.mark(digest, "skipped")
             continue
 
+        phone = row["phone"]
         norm_phone = normalise_phone(phone)
         if not norm_phone:
-            log.warning("Row %d: unparseable phone %r — skipped", i + 1, phone)
+            if phone:
+                log.warning("%s row %d: unparseable phone %r — skipped", row["_sheet"], row["_row"], phone)
+            else:
+                log.debug("%s row %d: no phone — skipped", row["_sheet"], row["_row"])
+            sheets.mark(digest, "bad_phone")
             continue
 
-        leads.append({
+        name = _clean(row.get("name"))
+        business = _clean(row.get("business"))
+        interest = _clean(row.get("interest"))
+        if interest.lower() in GENERIC_INTEREST:
+            interest = ""
+            # CarTrackSubmission2.xlsx: placeholder interest, business name under "Source Platform"
+            business = business or _clean(row.get("source"))
+        # CarTrackSubmissions.xlsx: "Source Platform" is a lead-source label — the lead name stands in
+        business = business or name
+        email = _clean(row.get("email"))
+
+        yield {
             "name": name or business or "there",
             "business": business,
             "phone": norm_phone,
             "email": email if email.lower() not in ("none", "n/a", "") else None,
             "interest": interest,
-            "motivation": motiv,
-        })
-
-    wb.close()
-    return leads
+            "motivation": _clean(row.get("motivation")),
+            "row_hash": digest,
+        }
 
 
 # ── CLI ───────────────────────────────────────────────────────
@@ -302,7 +201,9 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--dry-run", action="store_true", help="Print composed messages, no sends or Notion writes")
     p.add_argument("--max", type=int, default=None, metavar="N", help="Process at most N leads")
     p.add_argument("--whatsapp-url", default=WHATSAPP_LOOKUP_URL, metavar="URL", help="Baileys service URL")
-    p.add_argument("--file", type=Path, default=EXCEL_PATH, metavar="PATH", help="Excel file to read leads from")
+    p.add_argument("--wa-concurrency", type=int, default=LOOKUP_CONCURRENCY, metavar="N",
+                   help=f"WhatsApp lookups in flight at once (default: {LOOKUP_CONCURRENCY})")
+    p.add_argument("--file", type=Path, default=EXCEL_PATH, metavar="PATH", help="Lead sheet (.xlsx / .csv) to read leads from")
     return p.parse_args()
 
 
@@ -326,100 +227,135 @@ def main():
         log.error("NOTION_API_KEY not set in .env")
         sys.exit(1)
 
-    notion_headers = {
-        "Authorization": f"Bearer {NOTION_API_KEY}",
-        "Content-Type": "application/json",
-        "Notion-Version": NOTION_VERSION,
-    }
-
-    # Read Excel
     excel_path = args.file
     if not excel_path.exists():
-        log.error("Excel file not found: %s", excel_path)
+        log.error("Lead sheet not found: %s", excel_path)
         sys.exit(1)
 
-    log.info("Reading leads from %s", excel_path)
-    leads = read_leads(excel_path)
-    log.info("Found %d unsent leads", len(leads))
-
-    # Load state (skip already-sent numbers)
-    state = load_state()
+    # Outreach store (skip already-sent numbers) and the identity index, which
+    # also knows people messaged under another phone/email or enriched elsewhere
+    store = OutreachStore()
+    identities = IdentityIndex()
+    sheets = SheetIndex(read_only=args.dry_run)
     sent_count = 0
     skipped_count = 0
     error_count = 0
+    read_stats = {"unchanged": 0}
 
     if args.dry_run:
         log.info("DRY-RUN mode — no sends or Notion writes")
+        notion = None
+    else:
+        notion = NotionWriter(NOTION_API_KEY)
+        # Sends whose Notion record failed on an earlier run
+        backlog = store.without("notion_page_id")
+        if backlog:
+            log.info("Creating %d Notion records left over from earlier runs", len(backlog))
+        for entry in backlog:
+            queue_notion_record(notion, claire_db_id, store, entry)
+
+    # Lead sheet — skipped outright if a previous run finished this exact content
+    unchanged_file = sheets.unchanged(excel_path)
+    if unchanged_file:
+        log.info("%s unchanged since the last complete run — nothing to send", excel_path)
+        leads = iter(())
+    else:
+        log.info("Streaming leads from %s", excel_path)
+        leads = read_leads(excel_path, sheets, read_stats)
 
-    with httpx.Client(headers=notion_headers, timeout=30.0) as notion:
+    def unsent():
+        """(lead, identity, WhatsApp name already known) for leads not yet messaged."""
+        nonlocal skipped_count
         for lead in leads:
-            if args.max is not None and sent_count >= args.max:
-                break
-
-            phone = lead["phone"]
-
-            # Skip if already in state file (idempotency)
-            if already_sent(state, phone):
-                log.debug("Already sent to %s — skipping", phone)
+            # Skip if already messaged (idempotency)
+            identity = identities.resolve(lead_keys(lead, "excel"), "excel")
+            if store.has(lead["phone"]) or identities.done(identity, MESSAGED):
+                log.debug("Already sent to %s — skipping", lead["phone"])
+                sheets.mark(lead["row_hash"], "messaged")
                 skipped_count += 1
                 continue
+            yield lead, identity, identities.detail(identity, ENRICHED)
+
+    # Pipeline: lookups run a few leads ahead, Notion records are written in the
+    # background, so the only wait between sends is the pacing gap itself.
+    # Numbers /lookup answered recently (even "not on WhatsApp") aren't re-asked.
+    wa_lookups = WhatsAppLookup(args.whatsapp_url, WhatsAppLookupCache(), concurrency=args.wa_concurrency)
+    lookups = wa_lookups.lookup_iter(unsent(), phone=lambda t: None if t[2] else t[0]["phone"])
+    next_send_at = 0.0
+    finished = True
+    for (lead, identity, known_name), looked_up in lookups:
+        if args.max is not None and sent_count >= args.max:
+            finished = False
+            break
 
-            # WhatsApp name lookup
-            wa_name = whatsapp_lookup(phone, args.whatsapp_url)
-            display_name = wa_name or lead["name"] or "there"
-
-            # Build message
-            message = build_message(display_name, lead["interest"], lead["motivation"])
+        phone = lead["phone"]
+        wa_name = known_name or looked_up
+        if looked_up:
+            identities.record(identity, ENRICHED, looked_up)
+        display_name = wa_name or lead["name"] or "there"
 
-            if args.dry_run:
-                print(f"\n--- {display_name} ({phone}) ---")
-                print(message)
-                sent_count += 1
-                continue
-
-            # Send message
-            ok = send_whatsapp(phone, message, args.whatsapp_url)
-            if not ok:
-                log.warning("Message not sent to %s — skipping Notion record", phone)
-                error_count += 1
-                continue
+        # Build message
+        message = build_message(display_name, lead["interest"], lead["motivation"])
 
-            # Create Notion record — use business name as context if interest is generic
-            notion_business = lead.get("business") or lead["interest"]
-            page_id = notion_create_record(
-                notion, claire_db_id,
-                display_name, phone,
-                lead["email"], notion_business, lead["motivation"],
-                message,
-            )
-            if not page_id:
-                log.error("Notion record creation failed for %s", phone)
-                error_count += 1
-                continue
-
-            # Append to state file
-            state.append({
-                "phone": phone,
-                "display_name": display_name,
-                "email": lead["email"],
-                "interest": notion_business,
-                "motivation": lead["motivation"],
-                "notion_page_id": page_id,
-                "sent_at": datetime.now(timezone.utc).isoformat(),
-                "status": "pending",
-            })
-            save_state(state)
+        if args.dry_run:
+            print(f"\n--- {display_name} ({phone}) ---")
+            print(message)
             sent_count += 1
-            log.info("✅ %s (%s) — Notion: %s", display_name, phone, page_id)
+            continue
 
-            # Rate limit: 3–5s jitter between sends
-            time.sleep(3 + random.random() * 2)
+        # Send message — SEND_GAP after the previous one finished
+        wait = next_send_at - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        ok = send_whatsapp(phone, message, args.whatsapp_url)
+        next_send_at = time.monotonic() + random.uniform(*SEND_GAP)
+        if not ok:
+            log.warning("Message not sent to %s — skipping Notion record", phone)
+            error_count += 1
+            continue
 
+        # Record the send before anything else can fail, then queue the Notion
+        # record — use business name as context if interest is generic
+        entry = {
+            "phone": phone,
+            "display_name": display_name,
+            "email": lead["email"],
+            "interest": lead.get("business") or lead["interest"],
+            "motivation": lead["motivation"],
+            "message": message,
+            "sent_at": datetime.now(timezone.utc).isoformat(),
+            "status": "pending",
+        }
+        store.add(entry)
+        identities.record(identity, MESSAGED, entry["sent_at"])
+        sheets.mark(lead["row_hash"], "sent")
+        queue_notion_record(notion, claire_db_id, store, entry)
+        sent_count += 1
+        log.info("✅ %s (%s)", display_name, phone)
+
+    # Every row handled: the next run can skip this file until it changes
+    if finished and error_count == 0 and not unchanged_file:
+        sheets.complete(excel_path)
+
+    lookups.close()
+    if notion is not None:
+        log.info("Waiting for Notion records to finish")
+        notion.close()
+    identities.close()
+    store.close()
+    sheets.close()
+    wa_lookups.cache.close()
+    notion_stats = notion.report() if notion else {"created": 0, "errors": 0}
+    notion_errors = notion_stats["errors"]
     summary = {
-        "ok": error_count == 0,
+        "ok": error_count == 0 and notion_errors == 0,
         "sent": sent_count,
         "skipped": skipped_count,
+        "unchanged_rows": read_stats["unchanged"],
+        "unchanged_file": unchanged_file,
         "errors": error_count,
+        "notion_created": notion_stats["created"],
+        "notion_errors": notion_errors,
         "dry_run": args.dry_run,
     }
     print(json.dumps(summary))
@@ -15,15 +15,23 @@ import argparse
 import json
 import logging
 import os
-import re
 import sys
-import time
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
 
-import httpx
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cogstack_leadgen.http import get_client
+from cogstack_leadgen.identity import REPLIED, IdentityIndex
+from cogstack_leadgen.keyword_matcher import KeywordMatcher
+from cogstack_leadgen.logs import setup_logging as _setup_logging
+from cogstack_leadgen.notion import NotionWriter
+from cogstack_leadgen.phone import normalise_phone
+from cogstack_leadgen.state import OutreachStore
+from cogstack_leadgen.webhook import post_new_leads
+
 load_dotenv()
 
 # ── Logging ──────────────────────────────────────────────────
@@ -32,42 +40,19 @@ log = logging.getLogger("whatsapp_responses")
 
 
 def setup_logging() -> None:
-    """Configure console + file logging."""
-    log.setLevel(logging.DEBUG)
-
-    console = logging.StreamHandler(sys.stderr)
-    console.setLevel(logging.INFO)
-    console.setFormatter(logging.Formatter(
-        "%(asctime)s [%(name)s] %(levelname)s: %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    ))
-    log.addHandler(console)
-
-    log_dir = Path(__file__).parent.parent / "logs"
-    log_dir.mkdir(exist_ok=True)
-    today = datetime.now().strftime("%Y-%m-%d")
-    fh = logging.FileHandler(log_dir / f"whatsapp-responses-{today}.log", encoding="utf-8")
-    fh.setLevel(logging.DEBUG)
-    fh.setFormatter(logging.Formatter("%(asctime)s [%(name)s] %(levelname)s: %(message)s"))
-    log.addHandler(fh)
+    """Configure console + file logging (logs/whatsapp-responses-YYYY-MM-DD.log)."""
+    _setup_logging(log, "whatsapp-responses", timestamps=True)
 
 
 # ── Environment ──────────────────────────────────────────────
 
 NOTION_API_KEY = os.environ.get("NOTION_API_KEY")
-NOTION_VERSION = "2022-06-28"
-NOTION_BASE_URL = "https://api.notion.com/v1"
 
-B2C_WEBHOOK_URL = os.environ.get("B2C_WEBHOOK_URL")
-B2C_WEBHOOK_TOKEN = os.environ.get("B2C_WEBHOOK_TOKEN") or os.environ.get("WEBHOOK_TOKEN")
 WHATSAPP_LOOKUP_URL = os.environ.get("WHATSAPP_LOOKUP_URL", "http://127.0.0.1:3456")
 
 PROJECT_ROOT = Path(__file__).parent.parent
-STATE_FILE = PROJECT_ROOT / "logs" / "outreach-state.json"
 NOTION_CONFIG = PROJECT_ROOT / "notion_config.json"
 
-MAX_RETRIES = 3
-RETRY_DELAYS = [2, 5, 15]
 NO_REPLY_HOURS = 48
 
 # ── Classification keyword lists ──────────────────────────────
@@ -87,61 +72,34 @@ MAYBE_KEYWORDS = [
 ]
 
 
+# One matcher over all three lists: whole words only ("no" ≠ "know"), and the
+# longest phrase wins, so "not interested" / "not sure" aren't read as Yes.
+_RESPONSE_LABELS = {
+    **{kw: "Maybe" for kw in MAYBE_KEYWORDS},
+    **{kw: "No" for kw in NO_KEYWORDS},
+    **{kw: "Yes" for kw in YES_KEYWORDS},
+}
+RESPONSE_MATCHER = KeywordMatcher(_RESPONSE_LABELS)
+
+
 def classify_response(text: str) -> str:
     """Classify a response text as Yes / No / Maybe / Unclear."""
-    lower = text.lower()
-    for kw in YES_KEYWORDS:
-        if kw in lower:
-            return "Yes"
-    for kw in NO_KEYWORDS:
-        if kw in lower:
-            return "No"
-    for kw in MAYBE_KEYWORDS:
-        if kw in lower:
-            return "Maybe"
+    labels = {_RESPONSE_LABELS[hit.keyword] for hit in RESPONSE_MATCHER.finditer(text)}
+    for label in ("Yes", "No", "Maybe"):
+        if label in labels:
+            return label
     return "Unclear"
 
 
-# ── Phone normalisation ───────────────────────────────────────
-
-def normalise_phone(raw: str) -> str | None:
-    """Normalise any SA phone format to +27XXXXXXXXX."""
-    phone = str(raw).strip().replace(" ", "").replace("-", "")
-    if phone.startswith("+27"):
-        return phone
-    if phone.startswith("27") and len(phone) == 11:
-        return f"+{phone}"
-    if phone.startswith("0") and len(phone) == 10:
-        return f"+27{phone[1:]}"
-    # Baileys returns JID without + e.g. "27827712303"
-    if re.match(r"^27[6-8]\d{8}$", phone):
-        return f"+{phone}"
-    return None
-
-
-# ── State file helpers ────────────────────────────────────────
-
-def load_state() -> list[dict]:
-    if STATE_FILE.exists():
-        return json.loads(STATE_FILE.read_text())
-    return []
-
-
-def save_state(state: list[dict]) -> None:
-    STATE_FILE.write_text(json.dumps(state, indent=2))
-
-
 # ── Notion helpers ────────────────────────────────────────────
 
-def notion_update_record(
-    client: httpx.Client,
-    page_id: str,
+def notion_response_properties(
     classification: str,
     response_text: str,
     responded_at: str,
     submitted: bool = False,
-) -> bool:
-    """PATCH a Claire-Prospects Notion page with response data."""
+) -> dict:
+    """Claire-Prospects page properties recording a response."""
     properties: dict = {
         "Response":        {"rich_text": [{"text": {"content": response_text[:2000]}}]},
         "Response Status": {"select": {"name": classification}},
@@ -149,91 +107,43 @@ def notion_update_record(
     }
     if submitted:
         properties["Submitted to Pipeline"] = {"checkbox": True}
-
-    resp = client.patch(f"{NOTION_BASE_URL}/pages/{page_id}", json={"properties": properties})
-    if resp.status_code == 200:
-        log.debug("Updated Notion page %s → %s", page_id, classification)
-        return True
-    log.error("Notion update failed %d: %s", resp.status_code, resp.text[:300])
-    return False
+    return properties
 
 
 # ── Webhook POST ──────────────────────────────────────────────
 
-def post_to_webhook(lead: dict, batch_id: str) -> bool:
-    """POST a single Yes lead to the B2C webhook. Returns True on success."""
-    if not B2C_WEBHOOK_URL:
-        log.error("B2C_WEBHOOK_URL not set in .env")
-        return False
-    if not B2C_WEBHOOK_TOKEN:
-        log.error("B2C_WEBHOOK_TOKEN not set in .env")
-        return False
-
+def yes_lead(lead: dict) -> dict:
+    """B2C webhook lead for a prospect who replied Yes."""
     responded_at = lead.get("responded_at", datetime.now(timezone.utc).isoformat())
     interest = lead.get("interest", "")
     motivation = lead.get("motivation", "")
     name = lead.get("display_name", "there")
     phone = lead["phone"]
-    email = lead.get("email")
-
-    payload = {
-        "batch_id": batch_id,
-        "segment": "B2C",
-        "leads": [{
-            "full_name": name,
-            "phone": phone,
-            "email": email,
-            "province": None,
-            "city": None,
-            "intent_signal": (
-                f"Responded YES to WhatsApp outreach. "
-                f"Business: {interest}. Motivation: {motivation}."
-            ),
-            "intent_source": "WhatsApp Outreach",
-            "intent_source_url": f"https://wa.me/{phone.replace('+', '')}",
-            "intent_date": responded_at[:10],
-            "vehicle_make_model": None,
-            "vehicle_year": None,
-            "call_script_opener": (
-                f"Hi {name}, you replied YES to our WhatsApp message about vehicle tracking — great! "
-                f"We'd love to get you a quick quote. When is a good time to call?"
-            ),
-            "data_confidence": "High",
-            "sources_used": "CarTrackSubmissions Excel + WhatsApp outreach (Phone 3)",
-            "intent_strength": 9,
-            "urgency_score": 8,
-        }],
+    return {
+        "full_name": name,
+        "phone": phone,
+        "email": lead.get("email"),
+        "province": None,
+        "city": None,
+        "intent_signal": (
+            f"Responded YES to WhatsApp outreach. "
+            f"Business: {interest}. Motivation: {motivation}."
+        ),
+        "intent_source": "WhatsApp Outreach",
+        "intent_source_url": f"https://wa.me/{phone.replace('+', '')}",
+        "intent_date": responded_at[:10],
+        "vehicle_make_model": None,
+        "vehicle_year": None,
+        "call_script_opener": (
+            f"Hi {name}, you replied YES to our WhatsApp message about vehicle tracking — great! "
+            f"We'd love to get you a quick quote. When is a good time to call?"
+        ),
+        "data_confidence": "High",
+        "sources_used": "CarTrackSubmissions Excel + WhatsApp outreach (Phone 3)",
+        "intent_strength": 9,
+        "urgency_score": 8,
     }
 
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = httpx.post(
-                B2C_WEBHOOK_URL,
-                json=payload,
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {B2C_WEBHOOK_TOKEN}",
-                },
-                timeout=60.0,
-            )
-            log.info("Webhook response: %d", response.status_code)
-            if response.status_code == 200:
-                return True
-            if response.status_code >= 500:
-                delay = RETRY_DELAYS[attempt]
-                log.warning("Webhook 5xx, retrying in %ds", delay)
-                time.sleep(delay)
-                continue
-            log.error("Webhook error %d: %s", response.status_code, response.text[:300])
-            return False
-        except (httpx.HTTPError, httpx.TimeoutException) as e:
-            delay = RETRY_DELAYS[attempt]
-            log.warning("Webhook request failed: %s, retrying in %ds", e, delay)
-            time.sleep(delay)
-
-    log.error("Webhook POST failed after %d retries", MAX_RETRIES)
-    return False
-
 
 # ── CLI ───────────────────────────────────────────────────────
 
@@ -264,21 +174,15 @@ def main():
         log.error("NOTION_API_KEY not set in .env")
         sys.exit(1)
 
-    notion_headers = {
-        "Authorization": f"Bearer {NOTION_API_KEY}",
-        "Content-Type": "application/json",
-        "Notion-Version": NOTION_VERSION,
-    }
-
-    # Load state
-    state = load_state()
-    pending = {e["phone"]: e for e in state if e.get("status") == "pending"}
+    # Load pending leads
+    store = OutreachStore()
+    pending = {e["phone"]: e for e in store.by_status("pending")}
     log.info("Loaded %d pending leads", len(pending))
 
     # Fetch inbox — save raw before processing (crash safety)
     log.info("Fetching inbox from %s", args.whatsapp_url)
     try:
-        resp = httpx.get(f"{args.whatsapp_url}/inbox", timeout=15.0)
+        resp = get_client().get(f"{args.whatsapp_url}/inbox", timeout=15.0)
         inbox = resp.json().get("messages", [])
     except Exception as e:
         log.error("Failed to fetch inbox: %s", e)
@@ -301,8 +205,11 @@ def main():
     already_processed: set[str] = set()
 
     counts = {"processed": 0, "yes": 0, "no": 0, "maybe": 0, "unclear": 0, "submitted": 0, "expired": 0}
+    identities = IdentityIndex()
 
-    with httpx.Client(headers=notion_headers, timeout=30.0) as notion:
+    # Notion updates are queued and written concurrently under the rate limit;
+    # leaving the block waits for all of them
+    with NotionWriter(NOTION_API_KEY) as notion:
 
         # ── Process inbound messages ──────────────────────────
         for msg in inbox:
@@ -341,7 +248,7 @@ def main():
 
             if classification == "Yes" and not args.dry_run:
                 lead_with_ts = {**lead, "responded_at": responded_at}
-                ok = post_to_webhook(lead_with_ts, batch_id)
+                ok = post_new_leads([yes_lead(lead_with_ts)], batch_id, "whatsapp", identities) is not None
                 if ok:
                     submitted = True
                     counts["submitted"] += 1
@@ -352,30 +259,27 @@ def main():
                 log.info("[DRY-RUN] Would submit %s to B2C webhook", norm_phone)
 
             if not args.dry_run:
-                notion_update_record(
-                    notion,
-                    lead["notion_page_id"],
-                    classification,
-                    text,
-                    responded_at,
-                    submitted=submitted,
+                identities.record(identities.resolve({"phone": norm_phone}, "whatsapp"), REPLIED, classification)
+                if lead.get("notion_page_id"):
+                    notion.update(
+                        lead["notion_page_id"],
+                        notion_response_properties(classification, text, responded_at, submitted=submitted),
+                    )
+                else:
+                    # Outreach creates the record on its next run, with this status
+                    log.warning("%s has no Notion record yet — Notion not updated", norm_phone)
+                store.update(
+                    norm_phone,
+                    status=classification.lower(),
+                    responded_at=responded_at,
+                    response_text=text,
                 )
-                # Update state
-                for entry in state:
-                    if entry["phone"] == norm_phone:
-                        entry["status"] = classification.lower()
-                        entry["responded_at"] = responded_at
-                        entry["response_text"] = text
-                        break
-                save_state(state)
             else:
-                log.info("[DRY-RUN] Would update Notion %s → %s", lead["notion_page_id"], classification)
+                log.info("[DRY-RUN] Would update Notion %s → %s", lead.get("notion_page_id"), classification)
 
         # ── Expire 48h no-replies ─────────────────────────────
         cutoff = datetime.now(timezone.utc) - timedelta(hours=NO_REPLY_HOURS)
-        for entry in state:
-            if entry.get("status") != "pending":
-                continue
+        for entry in store.by_status("pending"):
             sent_at_str = entry.get("sent_at", "")
             try:
                 sent_at = datetime.fromisoformat(sent_at_str)
@@ -388,18 +292,18 @@ def main():
                 log.info("Expiring no-reply: %s (sent %s)", entry["phone"], sent_at_str)
                 counts["expired"] += 1
                 if not args.dry_run:
-                    notion_update_record(
-                        notion,
-                        entry["notion_page_id"],
-                        "No Reply",
-                        "",
-                        datetime.now(timezone.utc).isoformat(),
-                    )
-                    entry["status"] = "no_reply"
-                    save_state(state)
+                    if entry.get("notion_page_id"):
+                        notion.update(
+                            entry["notion_page_id"],
+                            notion_response_properties("No Reply", "", datetime.now(timezone.utc).isoformat()),
+                        )
+                    store.update(entry["phone"], status="no_reply")
                 else:
                     log.info("[DRY-RUN] Would mark %s as No Reply", entry["phone"])
 
+    counts["notion_errors"] = notion.stats["errors"]
+    identities.close()
+    store.close()
     print(json.dumps(counts))
 
 